@@ -1,11 +1,6 @@
 import streamlit as st
-import pandas as pd
 import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime, timedelta
-import time
-import json
+import os
 
 from models.learner_profiler import LearnerProfiler
 from models.content_adapter import ContentAdapter
@@ -13,6 +8,20 @@ from data.quiz_content import QuizContent
 from utils.feedback_generator import FeedbackGenerator
 from utils.analytics import Analytics
 from utils.ai_chatbot import AIChatbot
+from models.quiz_engine import build_quiz_result
+from models.quiz_session import QuizSession
+from models.review_scheduler import ReviewScheduler
+from models.knowledge_tracing import KnowledgeTracer
+from models.peer_index import PeerIndex
+from models.catalog import LEARNING_STYLES, TOPICS
+from utils.lazy import LazyComponent
+from utils.student_registry import StudentRegistry
+from utils.charts import accuracy_figure
+from utils.llm_client import LLMUnavailableError, RateLimitedError
+from utils.prefetcher import TutorPrefetcher
+from utils.tracing import tracer, traced
+from utils.memory import footprint, shared_ids, student_footprint
+from utils.event_log import EventJournal, LearningState
 
 # Configure page
 st.set_page_config(
@@ -23,8 +32,6 @@ st.set_page_config(
 )
 
 # Initialize session state
-if 'user_data' not in st.session_state:
-    st.session_state.user_data = {}
 if 'quiz_history' not in st.session_state:
     st.session_state.quiz_history = []
 if 'current_quiz' not in st.session_state:
@@ -39,21 +46,100 @@ if 'chat_history' not in st.session_state:
     st.session_state.chat_history = {}
 if 'current_page' not in st.session_state:
     st.session_state.current_page = 'quiz'
+if 'last_quiz_result' not in st.session_state:
+    st.session_state.last_quiz_result = None
+if 'view_cache' not in st.session_state:
+    st.session_state.view_cache = {}
+
+# Written after every rerun while tracing is on, for Prometheus' textfile collector
+METRICS_FILE = os.environ.get("SMARTEDU_METRICS_FILE")
+
+def traced_component(factory, name):
+    # Public methods are timed as '<name>.<method>' while tracing is enabled
+    return LazyComponent(lambda: tracer.instrument(factory(), name))
 
 # Initialize components
 @st.cache_resource
 def initialize_components():
-    quiz_content = QuizContent()
-    learner_profiler = LearnerProfiler()
-    content_adapter = ContentAdapter()
-    feedback_generator = FeedbackGenerator()
-    analytics = Analytics()
-    ai_chatbot = AIChatbot()
+    # Each component (and the heavy libraries behind it, e.g. openai for the
+    # chatbot) is only built when a page first uses it
+    quiz_content = traced_component(QuizContent, 'quiz_content')
+    learner_profiler = traced_component(LearnerProfiler, 'learner_profiler')
+    content_adapter = traced_component(ContentAdapter, 'content_adapter')
+    feedback_generator = traced_component(FeedbackGenerator, 'feedback_generator')
+    analytics = traced_component(Analytics, 'analytics')
+    # The tutor answers from the question bank first when it can
+    ai_chatbot = traced_component(lambda: AIChatbot(knowledge=quiz_content), 'ai_chatbot')
     return quiz_content, learner_profiler, content_adapter, feedback_generator, analytics, ai_chatbot
 
 components = initialize_components()
 quiz_content, learner_profiler, content_adapter, feedback_generator, analytics, ai_chatbot = components
 
+@st.cache_resource
+def get_student_registry():
+    # Shared by every browser session, so the Teacher Dashboard sees all students
+    return StudentRegistry()
+
+registry = get_student_registry()
+
+@st.cache_resource
+def get_tutor_prefetcher():
+    # Fetches tutor suggestions and starters on background threads
+    return TutorPrefetcher(ai_chatbot)
+
+prefetcher = get_tutor_prefetcher()
+
+@st.cache_resource
+def get_review_scheduler():
+    # Spaced-repetition schedule of every student's answered questions
+    return ReviewScheduler()
+
+review_scheduler = get_review_scheduler()
+
+@st.cache_resource
+def get_knowledge_tracer():
+    # Per-answer mastery of every (topic, difficulty), used to adapt difficulty
+    return KnowledgeTracer(quiz_content.get_available_topics())
+
+knowledge_tracer = get_knowledge_tracer()
+
+@st.cache_resource
+def get_peer_index():
+    # Nearest-neighbour index of learners, for "students like you" evidence
+    return PeerIndex(learner_profiler)
+
+peer_index = get_peer_index()
+
+@st.cache_resource
+def get_event_journal():
+    # Append-only log of answers and finished quizzes, if SMARTEDU_EVENT_LOG names a
+    # directory; histories, reviews and mastery are recovered from it on startup
+    directory = os.environ.get("SMARTEDU_EVENT_LOG")
+    if not directory:
+        return None
+    journal = EventJournal(directory, LearningState(registry, review_scheduler, knowledge_tracer), quiz_content)
+    journal.recover()
+    peer_index.build(registry.snapshot())
+    return journal
+
+event_journal = get_event_journal()
+
+def cached_view(name, key, version, compute):
+    """Return compute() memoized per (name, key) until the data version changes"""
+    cache = st.session_state.view_cache
+    entry = cache.get((name, key))
+    if entry is None or entry[0] != version:
+        with tracer.span(f"view.{name}"):
+            entry = (version, compute())
+        cache[(name, key)] = entry
+    return entry[1]
+
+def get_cached_profile(user_name, user_data):
+    """Learner profile for a student, recomputed only when their quiz data changes"""
+    return cached_view('profile', user_name, user_data['version'],
+                       lambda: learner_profiler.get_learner_profile(user_data['quiz_history']))
+
+@traced('render.main')
 def main():
     st.title("🎓 AI Personalized Learning Platform")
     st.markdown("---")
@@ -77,27 +163,26 @@ def main():
             user_name = st.text_input("Enter your name:", value=st.session_state.get('selected_user', ''))
             if user_name and user_name != st.session_state.get('selected_user'):
                 st.session_state.selected_user = user_name
-                if user_name not in st.session_state.user_data:
-                    st.session_state.user_data[user_name] = {
-                        'quiz_history': [],
-                        'performance_metrics': {},
-                        'learning_style': 'unknown',
-                        'current_level': 'beginner'
-                    }
+                registry.ensure_user(user_name)
                 st.rerun()
     
     if page == "Student Portal":
         student_portal()
     else:
         teacher_dashboard()
+    
+    if METRICS_FILE and tracer.enabled:
+        tracer.write_prometheus(METRICS_FILE)
 
+@traced('render.student_portal')
 def student_portal():
     if not st.session_state.selected_user:
         st.info("👈 Please enter your name in the sidebar to get started!")
         return
     
     user_name = st.session_state.selected_user
-    user_data = st.session_state.user_data[user_name]
+    registry.ensure_user(user_name)
+    user_data = registry.get_user_data(user_name)
     
     # Initialize chat history for this user if not exists
     if user_name not in st.session_state.chat_history:
@@ -110,8 +195,11 @@ def student_portal():
         
         # Display current learning profile
         if user_data['quiz_history']:
-            profile = learner_profiler.get_learner_profile(user_data['quiz_history'])
+            profile = get_cached_profile(user_name, user_data)
             st.session_state.learner_profile = profile
+            if ai_chatbot.is_built:
+                # Have suggestions for the new profile ready before the chat page opens
+                prefetcher.warm(profile)
             
             st.info(f"**Learning Profile:** {profile['learning_style'].title()} | **Level:** {profile['current_level'].title()}")
         
@@ -121,40 +209,40 @@ def student_portal():
         else:
             # Quiz section
             st.subheader("📝 Practice Quiz")
-            display_quiz_section(user_data)
+            display_quiz_section(user_name)
     
     with col2:
         # Progress visualization
         st.subheader("📊 Your Progress")
         if user_data['quiz_history']:
-            display_student_progress(user_data)
+            display_student_progress(user_name)
         else:
             st.info("Complete a quiz to see your progress!")
 
+@traced('render.display_quiz')
 def display_quiz():
     quiz = st.session_state.current_quiz
-    current_q = quiz['current_question']
-    question = quiz['questions'][current_q]
+    current_q = quiz.current_question
+    question = quiz_content.get_question(int(quiz.question_ids[current_q]))
     
-    st.subheader(f"Question {current_q + 1} of {len(quiz['questions'])}")
+    st.subheader(f"Question {current_q + 1} of {quiz.num_questions}")
     
     # Progress bar
-    progress = (current_q) / len(quiz['questions'])
+    progress = (current_q) / quiz.num_questions
     st.progress(progress)
     
     # Question display
     st.markdown(f"**{question['question']}**")
     
     # Answer options
-    answer = st.radio("Select your answer:", question['options'], key=f"q_{current_q}")
+    st.radio("Select your answer:", question['options'], key=f"q_{current_q}")
     
     col1, col2, col3 = st.columns([1, 1, 1])
     
     with col1:
         if current_q > 0:
-            if st.button("⬅️ Previous"):
-                quiz['current_question'] -= 1
-                st.rerun()
+            # Callbacks run before the fragment reruns, so no st.rerun is needed
+            st.button("⬅️ Previous", on_click=go_to_previous_question)
     
     with col2:
         if st.button("💡 Hint"):
@@ -162,99 +250,130 @@ def display_quiz():
             st.info(f"💡 **Hint:** {hint}")
     
     with col3:
-        if current_q < len(quiz['questions']) - 1:
-            if st.button("➡️ Next"):
-                # Record answer and timing
-                quiz['answers'].append({
-                    'question_id': current_q,
-                    'answer': answer,
-                    'correct': answer == question['correct_answer'],
-                    'time_taken': time.time() - quiz['question_start_times'][-1]
-                })
-                quiz['current_question'] += 1
-                quiz['question_start_times'].append(time.time())
-                st.rerun()
+        if current_q < quiz.num_questions - 1:
+            st.button("➡️ Next", on_click=go_to_next_question)
         else:
             if st.button("✅ Finish Quiz", type="primary"):
                 # Record final answer
-                quiz['answers'].append({
-                    'question_id': current_q,
-                    'answer': answer,
-                    'correct': answer == question['correct_answer'],
-                    'time_taken': time.time() - quiz['question_start_times'][-1]
-                })
+                record_current_answer()
                 finish_quiz()
 
+def go_to_previous_question():
+    quiz = st.session_state.current_quiz
+    quiz.go_to(quiz.current_question - 1)
+
+def record_current_answer():
+    """Record the selected option and timing for the current question"""
+    quiz = st.session_state.current_quiz
+    current_q = quiz.current_question
+    question = quiz_content.get_question(int(quiz.question_ids[current_q]))
+    answer = st.session_state[f"q_{current_q}"]
+    quiz.record_answer(current_q, question['options'].index(answer))
+    if event_journal is not None:
+        event_journal.record_answer(st.session_state.selected_user, question['id'], current_q,
+                                    question['options'].index(answer), answer == question['correct_answer'],
+                                    float(quiz.timings[current_q]))
+
+def go_to_next_question():
+    record_current_answer()
+    quiz = st.session_state.current_quiz
+    quiz.current_question += 1
+
+def start_quiz(topic, difficulty, review_ids=None):
+    questions = quiz_content.get_questions(topic, difficulty, num_questions=5, review_ids=review_ids)
+    st.session_state.current_quiz = QuizSession.from_questions(topic, difficulty, questions)
+
+def review_topic(due_ids):
+    """Topic and difficulty of a review quiz: where most of the due questions are"""
+    levels = [quiz_content.get_question_level(q) for q in due_ids]
+    topics = [topic for topic, _ in levels]
+    topic = max(set(topics), key=topics.count)
+    return topic, next(difficulty for t, difficulty in levels if t == topic)
+
+@traced('render.finish_quiz')
 def finish_quiz():
     quiz = st.session_state.current_quiz
     user_name = st.session_state.selected_user
     
-    # Calculate quiz metrics
-    total_time = time.time() - quiz['start_time']
-    correct_answers = sum(1 for ans in quiz['answers'] if ans['correct'])
-    accuracy = correct_answers / len(quiz['answers'])
-    avg_time_per_question = total_time / len(quiz['answers'])
-    
-    # Create quiz result
-    quiz_result = {
-        'timestamp': datetime.now(),
-        'topic': quiz['topic'],
-        'difficulty': quiz['difficulty'],
-        'total_questions': len(quiz['questions']),
-        'correct_answers': correct_answers,
-        'accuracy': accuracy,
-        'total_time': total_time,
-        'avg_time_per_question': avg_time_per_question,
-        'answers': quiz['answers']
-    }
-    
-    # Store in user data
-    st.session_state.user_data[user_name]['quiz_history'].append(quiz_result)
+    # Score the quiz the same way the headless service does; answers are kept
+    # packed, as the registry holds every student's history in memory
+    quiz_result = build_quiz_result(
+        quiz.topic, quiz.difficulty, quiz.num_questions,
+        quiz.to_compact_answers(quiz_content), quiz.start_time
+    )
+    
+    # Store in user data, and schedule reviews of the questions just answered
+    if event_journal is not None:
+        # Logged first, so a restart recovers it
+        event_journal.record_quiz(user_name, quiz_result)
+    else:
+        registry.append_quiz(user_name, quiz_result)
+        review_scheduler.record_quiz(user_name, quiz_result)
+        knowledge_tracer.observe_quiz(user_name, quiz_result)
+    peer_index.update_student(user_name, registry.get_quiz_history(user_name))
     
     # Generate personalized feedback
     feedback = feedback_generator.generate_feedback(quiz_result, st.session_state.learner_profile)
     
+    # Clear current quiz and keep the result around for display_quiz_results
+    st.session_state.current_quiz = None
+    st.session_state.last_quiz_result = (quiz_result, feedback)
+    
+    # Full rerun (not just the quiz fragment) so the profile and progress panels
+    # pick up the new result
+    st.rerun()
+
+def display_quiz_results():
+    quiz_result, feedback = st.session_state.last_quiz_result
+    
     # Display results
     st.success("🎉 Quiz completed!")
     
     col1, col2 = st.columns(2)
     with col1:
-        st.metric("Score", f"{correct_answers}/{len(quiz['questions'])}", f"{accuracy:.1%}")
-        st.metric("Time Taken", f"{total_time:.1f}s", f"{avg_time_per_question:.1f}s avg")
+        st.metric("Score", f"{quiz_result['correct_answers']}/{quiz_result['total_questions']}", f"{quiz_result['accuracy']:.1%}")
+        st.metric("Time Taken", f"{quiz_result['total_time']:.1f}s", f"{quiz_result['avg_time_per_question']:.1f}s avg")
     
     with col2:
         st.subheader("📝 Personalized Feedback")
         st.write(feedback)
     
-    # Clear current quiz
-    st.session_state.current_quiz = None
-    
-    if st.button("🔄 Take Another Quiz"):
-        st.rerun()
+    st.button("🔄 Take Another Quiz", on_click=clear_quiz_results)
 
-def display_student_progress(user_data):
+def clear_quiz_results():
+    st.session_state.last_quiz_result = None
+
+@st.fragment
+@traced('render.display_student_progress')
+def display_student_progress(user_name):
+    user_data = registry.get_user_data(user_name)
     quiz_history = user_data['quiz_history']
     
     if len(quiz_history) == 0:
         return
     
-    # Accuracy over time
-    accuracies = [quiz['accuracy'] for quiz in quiz_history]
-    dates = [quiz['timestamp'] for quiz in quiz_history]
+    def build_progress():
+        # Accuracy over time
+        accuracies = [quiz['accuracy'] for quiz in quiz_history]
+        dates = [quiz['timestamp'] for quiz in quiz_history]
+        
+        fig = accuracy_figure(accuracies, x=dates, title="Accuracy Over Time")
+        recent_avg = np.mean(accuracies[-3:]) if len(quiz_history) >= 3 else None
+        return fig, recent_avg
     
-    fig = px.line(x=dates, y=accuracies, title="Accuracy Over Time")
-    fig.update_layout(yaxis=dict(range=[0, 1], tickformat='.0%'))
+    fig, recent_avg = cached_view('progress', user_name, user_data['version'], build_progress)
     st.plotly_chart(fig, use_container_width=True)
     
     # Recent performance metrics
-    if len(quiz_history) >= 3:
-        recent_avg = np.mean(accuracies[-3:])
+    if recent_avg is not None:
         st.metric("Recent Performance", f"{recent_avg:.1%}")
 
+@traced('render.teacher_dashboard')
 def teacher_dashboard():
     st.header("👩‍🏫 Teacher Dashboard")
     
-    if not st.session_state.user_data:
+    students = registry.snapshot()
+    if not students:
         st.info("No student data available yet. Students need to complete quizzes first.")
         return
     
@@ -263,14 +382,14 @@ def teacher_dashboard():
     
     with col1:
         st.subheader("📊 Class Overview")
-        total_students = len(st.session_state.user_data)
-        active_students = len([user for user, data in st.session_state.user_data.items() if data['quiz_history']])
+        total_students = len(students)
+        active_students = len([user for user, data in students.items() if data['quiz_history']])
         
         st.metric("Total Students", total_students)
         st.metric("Active Students", active_students)
         
         # Student selection
-        student_names = list(st.session_state.user_data.keys())
+        student_names = list(students.keys())
         selected_student = st.selectbox("Select Student for Details:", student_names)
     
     with col2:
@@ -280,11 +399,76 @@ def teacher_dashboard():
     # Class performance analytics
     st.subheader("📈 Class Performance Analytics")
     display_class_analytics()
+    
+    display_performance_panel()
+    display_memory_panel()
+
+def display_performance_panel():
+    """Span timings from utils.tracing, to see where slow reruns spend their time"""
+    with st.expander("⏱️ Performance"):
+        st.toggle("Collect timings", value=tracer.enabled, key="tracing_enabled", on_change=toggle_tracing)
+        rows = tracer.summary()
+        if rows:
+            st.dataframe(rows, use_container_width=True, hide_index=True)
+        else:
+            st.info("No timings collected yet. Turn on collection and use the app for a while.")
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button("Download Prometheus metrics", tracer.export_prometheus(),
+                               file_name="smartedu_metrics.prom", mime="text/plain")
+        with col2:
+            st.button("Reset timings", on_click=tracer.reset)
 
+def toggle_tracing():
+    # The tracer is process-wide, so this applies to every session
+    tracer.enabled = st.session_state.tracing_enabled
+
+def active_session_states():
+    """session_state of every connected browser session, or just this one if unavailable"""
+    try:
+        from streamlit.runtime import Runtime
+        
+        sessions = Runtime.instance()._session_mgr.list_active_sessions()
+        return [info.session.session_state.filtered_state for info in sessions]
+    except Exception:
+        return [st.session_state.to_dict()]
+
+def display_memory_panel():
+    """Deep memory footprint per component and per student, from utils.memory"""
+    with st.expander("🧠 Memory"):
+        # Walking every record is too slow to do on each rerun
+        if not st.button("Measure memory"):
+            st.caption("Measures what each component and each student's records and open sessions hold.")
+            return
+        
+        built = {name: component.get() for name, component in zip(
+            ['quiz_content', 'learner_profiler', 'content_adapter', 'feedback_generator', 'analytics', 'ai_chatbot'],
+            components) if component.is_built}
+        component_rows = footprint(dict(built, registry=registry, prefetcher=prefetcher,
+                                        review_scheduler=review_scheduler, knowledge_tracer=knowledge_tracer,
+                                        peer_index=peer_index))
+        shared = shared_ids(list(built.values()) + [prefetcher, review_scheduler, knowledge_tracer, peer_index])
+        student_rows = student_footprint(registry.snapshot(), active_session_states(), shared)
+        
+        col1, col2 = st.columns([1, 2])
+        with col1:
+            st.markdown("**Components**")
+            st.dataframe([{'component': row['name'], 'KB': round(row['bytes'] / 1024, 1)} for row in component_rows],
+                         use_container_width=True, hide_index=True)
+        with col2:
+            st.markdown("**Students**")
+            total = sum(row['total_bytes'] for row in student_rows)
+            st.metric("All students", f"{total / 1024:.1f} KB",
+                      f"{total / max(1, len(student_rows)) / 1024:.1f} KB per student", delta_color="off")
+            st.dataframe(student_rows, use_container_width=True, hide_index=True)
+
+@st.fragment
+@traced('render.display_student_details')
 def display_student_details(student_name):
     st.subheader(f"Student Profile: {student_name}")
     
-    user_data = st.session_state.user_data[student_name]
+    user_data = registry.get_user_data(student_name)
     quiz_history = user_data['quiz_history']
     
     if not quiz_history:
@@ -292,7 +476,7 @@ def display_student_details(student_name):
         return
     
     # Generate learner profile
-    profile = learner_profiler.get_learner_profile(quiz_history)
+    profile = get_cached_profile(student_name, user_data)
     
     col1, col2 = st.columns(2)
     
@@ -309,89 +493,110 @@ def display_student_details(student_name):
     with col2:
         # Performance trend
         if len(quiz_history) > 1:
-            accuracies = [quiz['accuracy'] for quiz in quiz_history]
-            fig = go.Figure()
-            fig.add_trace(go.Scatter(
-                y=accuracies,
-                mode='lines+markers',
-                name='Accuracy',
-                line=dict(color='#1f77b4')
-            ))
-            fig.update_layout(
-                title=f"{student_name}'s Progress",
-                yaxis_title="Accuracy",
-                yaxis=dict(range=[0, 1], tickformat='.0%'),
-                height=300
-            )
+            def build_trend():
+                accuracies = [quiz['accuracy'] for quiz in quiz_history]
+                return accuracy_figure(accuracies, title=f"{student_name}'s Progress", height=300)
+            
+            fig = cached_view('student_trend', student_name, user_data['version'], build_trend)
             st.plotly_chart(fig, use_container_width=True)
     
     # Recommendations
     st.subheader("🎯 Recommendations")
-    recommendations = content_adapter.get_teacher_recommendations(quiz_history, profile)
+    recommendations = cached_view(
+        'teacher_recommendations', student_name, user_data['version'],
+        lambda: content_adapter.get_teacher_recommendations(
+            quiz_history, profile, peer_index.what_worked_next(quiz_history, exclude=student_name))
+    )
     for rec in recommendations:
         st.write(f"• {rec}")
+    
+    peers = peer_index.similar_learners(quiz_history, k=3, exclude=student_name)
+    if peers:
+        st.caption("Most similar learners: " + ", ".join(peer['student'] for peer in peers))
 
+@st.fragment
+@traced('render.display_class_analytics')
 def display_class_analytics():
-    if not st.session_state.user_data:
+    students = registry.snapshot()
+    if not students:
         return
     
-    # Collect all quiz data
-    all_quizzes = []
-    for user, data in st.session_state.user_data.items():
-        for quiz in data['quiz_history']:
-            quiz_copy = quiz.copy()
-            quiz_copy['student'] = user
-            all_quizzes.append(quiz_copy)
-    
-    if not all_quizzes:
+    topic_fig, style_fig = cached_view('class_analytics', None, students.version,
+                                       lambda: build_class_charts(students))
+    if topic_fig is None:
         return
     
     col1, col2 = st.columns(2)
     
     with col1:
-        # Average performance by topic
-        topic_performance = {}
-        for quiz in all_quizzes:
-            topic = quiz['topic']
-            if topic not in topic_performance:
-                topic_performance[topic] = []
-            topic_performance[topic].append(quiz['accuracy'])
-        
-        topics = list(topic_performance.keys())
-        avg_accuracies = [np.mean(topic_performance[topic]) for topic in topics]
-        
-        fig = px.bar(x=topics, y=avg_accuracies, title="Average Performance by Topic")
-        fig.update_layout(yaxis=dict(tickformat='.0%'))
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(topic_fig, use_container_width=True)
     
     with col2:
-        # Learning style distribution
-        learning_styles = []
-        for user, data in st.session_state.user_data.items():
-            if data['quiz_history']:
-                profile = learner_profiler.get_learner_profile(data['quiz_history'])
-                learning_styles.append(profile['learning_style'])
+        if style_fig is not None:
+            st.plotly_chart(style_fig, use_container_width=True)
+
+@traced('render.build_class_charts')
+def build_class_charts(students):
+    """Build the class-wide topic and learning style charts"""
+    import plotly.express as px
+    
+    # Collect all quiz data; topics as catalog codes so averaging is a bincount
+    all_quizzes = [quiz for _, data in students.items() for quiz in data['quiz_history']]
+    
+    if not all_quizzes:
+        return None, None
+    
+    # Average performance by topic, in catalog order
+    topic_codes = TOPICS.encode(quiz['topic'] for quiz in all_quizzes)
+    accuracies = np.fromiter((quiz['accuracy'] for quiz in all_quizzes), dtype=np.float64,
+                             count=len(all_quizzes))
+    attempts = np.bincount(topic_codes, minlength=len(TOPICS))
+    totals = np.bincount(topic_codes, weights=accuracies, minlength=len(TOPICS))
+    practised = np.flatnonzero(attempts)
+    topics = TOPICS.decode(practised)
+    avg_accuracies = totals[practised] / attempts[practised]
+    
+    topic_fig = px.bar(x=topics, y=avg_accuracies, title="Average Performance by Topic")
+    topic_fig.update_layout(yaxis=dict(tickformat='.0%'))
+    
+    # Learning style distribution
+    learning_styles = []
+    for user, data in students.items():
+        if data['quiz_history']:
+            profile = get_cached_profile(user, data)
+            learning_styles.append(profile['learning_style'])
+    
+    style_fig = None
+    if learning_styles:
+        style_counts = np.bincount(LEARNING_STYLES.encode(learning_styles), minlength=len(LEARNING_STYLES))
+        shown = np.flatnonzero(style_counts)
         
-        if learning_styles:
-            style_counts = {}
-            for style in learning_styles:
-                style_counts[style] = style_counts.get(style, 0) + 1
-            
-            fig = px.pie(
-                values=list(style_counts.values()),
-                names=list(style_counts.keys()),
-                title="Learning Style Distribution"
-            )
-            st.plotly_chart(fig, use_container_width=True)
+        style_fig = px.pie(
+            values=style_counts[shown],
+            names=LEARNING_STYLES.decode(shown),
+            title="Learning Style Distribution"
+        )
+    
+    return topic_fig, style_fig
 
-def display_quiz_section(user_data):
+@st.fragment
+@traced('render.display_quiz_section')
+def display_quiz_section(user_name):
     """Display the quiz section with topic selection and start quiz functionality"""
-    if st.session_state.current_quiz is None:
+    user_data = registry.get_user_data(user_name)
+    if st.session_state.last_quiz_result is not None:
+        display_quiz_results()
+    elif st.session_state.current_quiz is None:
         # Get adaptive content recommendation
         if user_data['quiz_history']:
-            recommended_topic, difficulty = content_adapter.get_next_content(
-                user_data['quiz_history'], 
-                st.session_state.learner_profile
+            recommended_topic, difficulty = cached_view(
+                'next_content', user_name, user_data['version'],
+                lambda: content_adapter.get_next_content(
+                    user_data['quiz_history'],
+                    st.session_state.learner_profile,
+                    knowledge_tracer.mastery_of(user_name),
+                    peer_index.what_worked_next(user_data['quiz_history'], exclude=user_name)
+                )
             )
         else:
             recommended_topic, difficulty = "Mathematics", "beginner"
@@ -399,20 +604,19 @@ def display_quiz_section(user_data):
         st.write(f"**Recommended Topic:** {recommended_topic}")
         st.write(f"**Difficulty Level:** {difficulty.title()}")
         
+        # Questions whose spaced-repetition review is due come first
+        due_ids = review_scheduler.due(user_name, limit=20)
+        if due_ids:
+            review_subject, review_difficulty = review_topic(due_ids)
+            st.info(f"🔁 {len(due_ids)}{'+' if len(due_ids) == 20 else ''} questions are due for review, "
+                    f"most of them in {review_subject}.")
+            st.button("🔁 Start Review", on_click=start_quiz,
+                      args=(review_subject, review_difficulty, due_ids))
+        
         col_start, col_topic = st.columns([1, 2])
         with col_start:
-            if st.button("🚀 Start Quiz", type="primary"):
-                questions = quiz_content.get_questions(recommended_topic, difficulty, num_questions=5)
-                st.session_state.current_quiz = {
-                    'questions': questions,
-                    'current_question': 0,
-                    'answers': [],
-                    'start_time': time.time(),
-                    'question_start_times': [time.time()],
-                    'topic': recommended_topic,
-                    'difficulty': difficulty
-                }
-                st.rerun()
+            st.button("🚀 Start Quiz", type="primary",
+                      on_click=start_quiz, args=(recommended_topic, difficulty))
         
         with col_topic:
             # Allow topic selection
@@ -420,21 +624,16 @@ def display_quiz_section(user_data):
             selected_topic = st.selectbox("Or choose a different topic:", topics, 
                                         index=topics.index(recommended_topic) if recommended_topic in topics else 0)
             if selected_topic != recommended_topic:
-                if st.button("Start with selected topic"):
-                    questions = quiz_content.get_questions(selected_topic, difficulty, num_questions=5)
-                    st.session_state.current_quiz = {
-                        'questions': questions,
-                        'current_question': 0,
-                        'answers': [],
-                        'start_time': time.time(),
-                        'question_start_times': [time.time()],
-                        'topic': selected_topic,
-                        'difficulty': difficulty
-                    }
-                    st.rerun()
+                st.button("Start with selected topic",
+                          on_click=start_quiz, args=(selected_topic, difficulty))
     else:
         display_quiz()
 
+# Chat messages always shown under "Recent Messages"; older ones are paginated
+RECENT_MESSAGES = 6
+CHAT_PAGE_SIZE = 10
+
+@traced('render.ai_tutor_chat')
 def ai_tutor_chat():
     """Display the AI tutor chat interface"""
     st.subheader("💬 AI Tutor Chat")
@@ -443,21 +642,22 @@ def ai_tutor_chat():
     user_name = st.session_state.selected_user
     chat_history = st.session_state.chat_history[user_name]
     
-    # Display chat history
-    if chat_history:
-        st.subheader("📜 Conversation History")
-        for i, message in enumerate(chat_history):
-            if message['role'] == 'user':
-                st.write(f"**You:** {message['content']}")
-            else:
-                st.write(f"**AI Tutor:** {message['content']}")
+    # Display older turns, one page at a time
+    if len(chat_history) > RECENT_MESSAGES:
+        display_chat_history(user_name)
         st.markdown("---")
     
-    # Topic suggestions
+    # Message to send this run, from a topic button or the Send button
+    pending_message = None
+    
+    # Topic suggestions, and starters for each of them, are fetched in the background
+    # while the page is open
+    prefetcher.warm(st.session_state.learner_profile)
     st.subheader("💡 Suggested Topics")
     if st.button("🔄 Get New Topic Suggestions"):
         profile = st.session_state.learner_profile
-        suggestions = ai_chatbot.generate_topic_suggestions(profile)
+        # The first click shows the prefetched suggestions; later ones ask for new ones
+        suggestions = prefetcher.topic_suggestions(profile, refresh='topic_suggestions' in st.session_state)
         st.session_state.topic_suggestions = suggestions
     
     if 'topic_suggestions' in st.session_state:
@@ -465,15 +665,10 @@ def ai_tutor_chat():
         for i, topic in enumerate(st.session_state.topic_suggestions):
             with cols[i]:
                 if st.button(f"💭 {topic}", key=f"topic_{i}"):
-                    # Generate conversation starters for this topic
-                    starters = ai_chatbot.generate_conversation_starters(topic)
+                    # Usually already prefetched, leaving only the chat call
+                    starters = prefetcher.conversation_starters(topic)
                     if starters:
-                        starter_text = f"I'm curious about {topic}. {starters[0]}"
-                        # Add to chat and get response
-                        chat_history.append({"role": "user", "content": starter_text})
-                        response = ai_chatbot.chat(starter_text, chat_history[:-1])
-                        chat_history.append({"role": "assistant", "content": response})
-                        st.rerun()
+                        pending_message = f"I'm curious about {topic}. {starters[0]}"
     
     # Chat input
     st.subheader("💬 Ask a Question")
@@ -483,34 +678,76 @@ def ai_tutor_chat():
     with col1:
         if st.button("Send 📨", type="primary"):
             if user_input.strip():
-                # Add user message to chat history
-                chat_history.append({"role": "user", "content": user_input})
-                
-                # Get AI response
-                with st.spinner("🤔 Thinking..."):
-                    response = ai_chatbot.chat(user_input, chat_history[:-1])
-                
-                # Add AI response to chat history
-                chat_history.append({"role": "assistant", "content": response})
-                
-                # Clear input and refresh
-                st.rerun()
+                pending_message = user_input
     
     with col2:
         if st.button("🗑️ Clear Chat History"):
             st.session_state.chat_history[user_name] = []
             st.rerun()
     
+    if pending_message and stream_tutor_reply(chat_history, pending_message):
+        # Refresh so the new turns move into the history views
+        st.rerun()
+    
     # Show recent conversation
     if chat_history:
         st.subheader("💭 Recent Messages")
         # Show last few messages
-        recent_messages = chat_history[-6:] if len(chat_history) > 6 else chat_history
-        for message in recent_messages:
+        for message in chat_history[-RECENT_MESSAGES:]:
+            text = format_chat_message(message['role'], message['content'])
             if message['role'] == 'user':
-                st.info(f"**You:** {message['content']}")
+                st.info(text)
             else:
-                st.success(f"**AI Tutor:** {message['content']}")
+                st.success(text)
+
+@traced('render.stream_tutor_reply')
+def stream_tutor_reply(chat_history, user_message):
+    """Show the tutor's reply as it streams in, then commit both turns to history.
+    
+    Returns False, leaving the history untouched, if the tutor could not answer.
+    """
+    st.info(format_chat_message('user', user_message))
+    with st.container(border=True):
+        st.markdown("**AI Tutor:**")
+        try:
+            response = st.write_stream(
+                ai_chatbot.chat_stream(user_message, chat_history, conversation_id=st.session_state.selected_user)
+            )
+        except RateLimitedError:
+            st.warning("You're sending messages very quickly. Please wait a moment and try again.")
+            return False
+        except LLMUnavailableError:
+            # Not saved as a tutor turn, so it is never sent back as conversation context
+            st.error("I'm sorry, I'm having trouble connecting right now. Please try again in a moment.")
+            return False
+    
+    chat_history.append({"role": "user", "content": user_message})
+    chat_history.append({"role": "assistant", "content": response})
+    return True
+
+@st.fragment
+@traced('render.display_chat_history')
+def display_chat_history(user_name):
+    """Older chat turns, collapsed and paginated so only one page is rendered"""
+    older_messages = st.session_state.chat_history[user_name][:-RECENT_MESSAGES]
+    num_pages = (len(older_messages) + CHAT_PAGE_SIZE - 1) // CHAT_PAGE_SIZE
+    
+    st.subheader("📜 Conversation History")
+    with st.expander(f"Earlier messages ({len(older_messages)})"):
+        page = 1
+        if num_pages > 1:
+            # Defaults to the most recent page; changing it reruns only this fragment
+            page = st.number_input("Page", min_value=1, max_value=num_pages,
+                                   value=num_pages, key=f"chat_page_{user_name}")
+        # Pages are counted back from the newest, so only page 1 can be partial
+        end = len(older_messages) - (num_pages - page) * CHAT_PAGE_SIZE
+        for message in older_messages[max(0, end - CHAT_PAGE_SIZE):end]:
+            st.markdown(format_chat_message(message['role'], message['content']))
+
+def format_chat_message(role, content):
+    """Markdown for one chat message"""
+    speaker = "You" if role == 'user' else "AI Tutor"
+    return f"**{speaker}:** {content}"
 
 if __name__ == "__main__":
     main()
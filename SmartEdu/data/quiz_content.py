@@ -1,5 +1,8 @@
 import random
 
+from models.catalog import DIFFICULTIES, TOPICS
+from utils.retrieval import BM25Index
+
 class QuizContent:
     def __init__(self):
         self.question_bank = {
@@ -154,13 +157,64 @@ class QuizContent:
                 ]
             }
         }
+        
+        # Give every question a stable integer id (its position in this list), and
+        # index its text so the tutor can look up explanations locally
+        self.questions_by_id = []
+        # (topic code, difficulty code) per question id, see models.catalog
+        self.question_levels = []
+        self.search_index = BM25Index()
+        for topic, difficulties in self.question_bank.items():
+            for difficulty, questions in difficulties.items():
+                for question in questions:
+                    self._register_question(question, topic, difficulty)
+    
+    def _register_question(self, question_data, topic, difficulty):
+        level = (TOPICS.add(topic), DIFFICULTIES.code(difficulty))
+        question_data['id'] = len(self.questions_by_id)
+        self.questions_by_id.append(question_data)
+        self.question_levels.append(level)
+        text = " ".join([topic, question_data['question'], question_data['correct_answer'],
+                         question_data.get('explanation', '')])
+        self.search_index.add(question_data['id'], text, {'topic': topic, 'difficulty': difficulty})
+    
+    def get_question(self, question_id):
+        """Look up a question by its id"""
+        return self.questions_by_id[question_id]
+    
+    def get_question_level(self, question_id):
+        """(topic, difficulty) a question is filed under"""
+        topic, difficulty = self.question_levels[question_id]
+        return TOPICS.value(topic), DIFFICULTIES.value(difficulty)
+    
+    def get_answer_key(self):
+        """Correct option index for every question, indexed by question id"""
+        import numpy as np
+        
+        return np.array(
+            [q['options'].index(q['correct_answer']) for q in self.questions_by_id],
+            dtype=np.int8
+        )
+    
+    def search_explanations(self, query, k=3):
+        """Questions whose text and explanation best match a free-text query
+        
+        Returns:
+            list: (question, hit) pairs, best first; hit.confidence is in [0, 1]
+        """
+        return [(self.questions_by_id[hit.doc_id], hit) for hit in self.search_index.search(query, k)]
     
     def get_available_topics(self):
         """Return list of available topics"""
         return list(self.question_bank.keys())
     
-    def get_questions(self, topic, difficulty, num_questions=5):
-        """Get questions for specified topic and difficulty"""
+    def get_questions(self, topic, difficulty, num_questions=5, review_ids=None):
+        """Get questions for specified topic and difficulty
+        
+        In review mode (review_ids, e.g. from ReviewScheduler.due) the quiz
+        starts with the due questions of this topic, in the order given, and
+        is topped up with the usual random selection.
+        """
         if topic not in self.question_bank:
             topic = 'Mathematics'  # Default fallback
         
@@ -169,6 +223,20 @@ class QuizContent:
         
         available_questions = self.question_bank[topic][difficulty]
         
+        if review_ids:
+            topic_code = TOPICS.code(topic)
+            review = [self.questions_by_id[q] for q in review_ids if self.question_levels[q][0] == topic_code]
+            review = review[:num_questions]
+            if len(review) < num_questions:
+                chosen = {q['id'] for q in review}
+                rest = [q for q in available_questions if q['id'] not in chosen] or available_questions
+                review += self._sample_questions(rest, num_questions - len(review))
+            return review
+        
+        return self._sample_questions(available_questions, num_questions)
+    
+    def _sample_questions(self, available_questions, num_questions):
+        """Random selection of num_questions, repeating questions if there are too few"""
         # Select random questions (with replacement if needed)
         if len(available_questions) >= num_questions:
             selected_questions = random.sample(available_questions, num_questions)
@@ -180,13 +248,21 @@ class QuizContent:
         return selected_questions
     
     def add_question(self, topic, difficulty, question_data):
-        """Add a new question to the bank"""
+        """Add a new question to the bank
+        
+        New topics are added to the topic catalog; the difficulty must be one of
+        models.catalog.DIFFICULTIES (ValueError otherwise).
+        """
+        if difficulty not in DIFFICULTIES:
+            raise ValueError(f"Unknown difficulty: {difficulty!r}")
+        
         if topic not in self.question_bank:
             self.question_bank[topic] = {}
         
         if difficulty not in self.question_bank[topic]:
             self.question_bank[topic][difficulty] = []
         
+        self._register_question(question_data, topic, difficulty)
         self.question_bank[topic][difficulty].append(question_data)
     
     def get_question_stats(self):
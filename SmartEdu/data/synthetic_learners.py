@@ -0,0 +1,141 @@
+"""Seeded generator of realistic synthetic quiz histories.
+
+Each learner has a latent ability, a per-topic skill offset, a learning rate,
+a working speed and topic preferences that drift over time. Quizzes are
+answered question by question (item-response style: the chance of a correct
+answer is a logistic function of ability, topic skill, practice and question
+difficulty), so the histories have the same shape as the ones the app stores,
+answer-level records included. The same seed always gives the same population,
+and learner i is the same whatever the population size.
+
+    generator = SyntheticLearnerGenerator(seed=42)
+    students = generator.generate_population(num_students=1000, quizzes_per_student=20)
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from data.quiz_content import QuizContent
+from models.catalog import DIFFICULTIES
+from models.compact_answers import CompactAnswers
+
+DIFFICULTY_OFFSET = {'beginner': -1.0, 'intermediate': 0.0, 'advanced': 1.2}
+
+
+class SyntheticLearnerGenerator:
+    def __init__(self, seed=0, quiz_content=None, questions_per_quiz=5, start_date=None,
+                 mean_days_between_quizzes=1.5, topic_stickiness=0.6, compact_answers=False):
+        self.seed = seed
+        self.quiz_content = quiz_content or QuizContent()
+        self.questions_per_quiz = questions_per_quiz
+        self.start_date = start_date or datetime(2025, 1, 6, 9, 0)
+        self.mean_days_between_quizzes = mean_days_between_quizzes
+        # Chance that a learner stays on the topic of their previous quiz
+        self.topic_stickiness = topic_stickiness
+        # Store answers as CompactAnswers, as the app does, instead of dicts
+        self.compact_answers = compact_answers
+        self.topics = self.quiz_content.get_available_topics()
+
+    def generate_learner(self, index, num_quizzes):
+        """Quiz history for learner `index`, oldest quiz first"""
+        rng = np.random.default_rng([self.seed, index])
+        num_topics = len(self.topics)
+
+        ability = rng.normal(0.0, 1.0)
+        topic_skill = rng.normal(0.0, 0.6, num_topics)
+        learning_rate = rng.lognormal(np.log(0.03), 0.5)
+        # Seconds per question is lognormal around a personal median
+        median_seconds = rng.lognormal(np.log(22.0), 0.35)
+        preferences = rng.dirichlet(np.full(num_topics, 0.8))
+
+        history = []
+        practice = np.zeros(num_topics)
+        timestamp = self.start_date + timedelta(days=float(rng.uniform(0, 14)))
+        topic_index = rng.choice(num_topics, p=preferences)
+        difficulty_index = 0
+
+        for _ in range(num_quizzes):
+            # Topic drift: preferences wander a little after every quiz
+            preferences = preferences * rng.lognormal(0.0, 0.15, num_topics)
+            preferences /= preferences.sum()
+            if rng.random() > self.topic_stickiness:
+                topic_index = rng.choice(num_topics, p=preferences)
+
+            topic = self.topics[topic_index]
+            difficulty = DIFFICULTIES.value(difficulty_index)
+            skill = ability + topic_skill[topic_index] + learning_rate * practice[topic_index]
+            quiz = self._generate_quiz(rng, topic, difficulty, skill, median_seconds, timestamp)
+            history.append(quiz)
+            practice[topic_index] += 1
+
+            # Learners move up after strong quizzes and down after weak ones
+            if quiz['accuracy'] >= 0.8 and difficulty_index < len(DIFFICULTIES) - 1:
+                difficulty_index += 1
+            elif quiz['accuracy'] < 0.5 and difficulty_index > 0:
+                difficulty_index -= 1
+
+            timestamp += timedelta(days=float(rng.exponential(self.mean_days_between_quizzes)))
+
+        return history
+
+    def generate_population(self, num_students, quizzes_per_student=20):
+        """dict of student name -> user record, shaped like the student registry's"""
+        return dict(self.iter_population(num_students, quizzes_per_student))
+
+    def iter_population(self, num_students, quizzes_per_student=20):
+        """Yield (student, user_record) pairs one learner at a time"""
+        for index in range(num_students):
+            # Quizzes per learner vary around the requested mean
+            rng = np.random.default_rng([self.seed, index, 1])
+            num_quizzes = max(1, int(rng.poisson(quizzes_per_student)))
+            yield f"learner-{index:07d}", {
+                'quiz_history': self.generate_learner(index, num_quizzes),
+                'performance_metrics': {},
+                'learning_style': 'unknown',
+                'current_level': 'beginner'
+            }
+
+    def _generate_quiz(self, rng, topic, difficulty, skill, median_seconds, timestamp):
+        questions = self.quiz_content.question_bank[topic][difficulty]
+        picks = rng.choice(len(questions), self.questions_per_quiz,
+                           replace=len(questions) < self.questions_per_quiz)
+
+        p_correct = 1.0 / (1.0 + np.exp(-(skill - DIFFICULTY_OFFSET[difficulty])))
+        correct = rng.random(self.questions_per_quiz) < p_correct
+        # Wrong answers take longer, and harder questions take longer still
+        times = rng.lognormal(np.log(median_seconds), 0.5, self.questions_per_quiz)
+        times *= np.where(correct, 1.0, 1.3) * (1.0 + 0.25 * DIFFICULTIES.code(difficulty))
+
+        answers = []
+        for position, (pick, is_correct, time_taken) in enumerate(zip(picks, correct, times)):
+            question = questions[pick]
+            if is_correct:
+                answer = question['correct_answer']
+            else:
+                wrong = [option for option in question['options'] if option != question['correct_answer']]
+                answer = wrong[rng.integers(len(wrong))]
+            answers.append({
+                # Position in the quiz, as QuizSession.to_answer_dicts records it
+                'question_id': position,
+                'answer': answer,
+                'correct': bool(is_correct),
+                'time_taken': round(float(time_taken), 2)
+            })
+
+        if self.compact_answers:
+            answers = CompactAnswers.from_dicts(answers, [questions[pick]['id'] for pick in picks],
+                                                self.quiz_content)
+
+        total_time = float(times.sum())
+        correct_answers = int(correct.sum())
+        return {
+            'timestamp': timestamp,
+            'topic': topic,
+            'difficulty': difficulty,
+            'total_questions': self.questions_per_quiz,
+            'correct_answers': correct_answers,
+            'accuracy': correct_answers / self.questions_per_quiz,
+            'total_time': total_time,
+            'avg_time_per_question': total_time / self.questions_per_quiz,
+            'answers': answers
+        }
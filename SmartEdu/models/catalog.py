@@ -0,0 +1,110 @@
+"""Small-int codes for the strings that label quizzes and learners.
+
+Topics, difficulties and learning styles each have one Catalog that gives
+every value a stable code: its position in the catalog, which only ever
+grows at the end. Lookups both ways are O(1), and arrays of codes are int8,
+so they group and compare much faster than strings:
+
+    DIFFICULTIES.code('advanced')                 # 2, also the level's rank
+    TOPICS.encode(['Science', 'History'])         # array([1, 3], dtype=int8)
+    TOPICS.categorical(df_topics)                 # pandas Categorical on the same codes
+
+Difficulty codes are ordered easiest first, so code + 1 is the next level up.
+"""
+import threading
+
+# Largest code an int8 can hold
+MAX_CODE = 127
+
+
+class Catalog:
+    """Append-only mapping between one kind of label and int8 codes"""
+
+    def __init__(self, name, values=(), frozen=False):
+        self.name = name
+        self._values = []
+        self._codes = {}
+        self._lock = threading.Lock()
+        self.frozen = False
+        for value in values:
+            self.add(value)
+        # A frozen catalog rejects new values, e.g. difficulties, whose codes are ranks
+        self.frozen = frozen
+
+    def __len__(self):
+        return len(self._values)
+
+    def __iter__(self):
+        return iter(tuple(self._values))
+
+    def __contains__(self, value):
+        return value in self._codes
+
+    @property
+    def values(self):
+        """Every value, in code order"""
+        return tuple(self._values)
+
+    def add(self, value):
+        """Code of value, registering it first if it is new"""
+        code = self._codes.get(value)
+        if code is not None:
+            return code
+        with self._lock:
+            code = self._codes.get(value)
+            if code is None:
+                if self.frozen:
+                    raise ValueError(f"Unknown {self.name}: {value!r} (expected one of {', '.join(self._values)})")
+                if len(self._values) > MAX_CODE:
+                    raise ValueError(f"Too many {self.name} values for int8 codes")
+                code = len(self._values)
+                self._values.append(value)
+                self._codes[value] = code
+            return code
+
+    def code(self, value):
+        """Code of a known value; KeyError if it was never registered"""
+        try:
+            return self._codes[value]
+        except KeyError:
+            raise KeyError(f"Unknown {self.name}: {value!r}") from None
+
+    def value(self, code):
+        return self._values[code]
+
+    def encode(self, values):
+        """int8 array of codes, registering new values unless the catalog is frozen"""
+        # numpy is only loaded here, so importing the question bank stays cheap
+        import numpy as np
+
+        codes = self._codes
+        return np.fromiter((codes[value] if value in codes else self.add(value) for value in values),
+                           dtype=np.int8)
+
+    def decode(self, codes):
+        """Values for an array (or list) of codes"""
+        import numpy as np
+
+        return np.array(self._values, dtype=object)[np.asarray(codes, dtype=np.intp)].tolist()
+
+    def dtype(self):
+        """pandas CategoricalDtype whose category codes are this catalog's codes"""
+        import pandas as pd
+
+        return pd.CategoricalDtype(self.values)
+
+    def categorical(self, values):
+        """pandas Categorical of values, without hashing each string again in pandas"""
+        return self.categorical_from_codes(self.encode(values))
+
+    def categorical_from_codes(self, codes):
+        import pandas as pd
+
+        return pd.Categorical.from_codes(codes, dtype=self.dtype())
+
+TOPICS = Catalog('topic', ['Mathematics', 'Science', 'English', 'History', 'Programming'])
+
+DIFFICULTIES = Catalog('difficulty', ['beginner', 'intermediate', 'advanced'], frozen=True)
+
+LEARNING_STYLES = Catalog('learning style', ['unknown', 'fast_learner', 'steady_learner', 'struggling_learner',
+                                             'methodical_learner', 'average_learner'], frozen=True)
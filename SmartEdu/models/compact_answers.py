@@ -0,0 +1,123 @@
+from collections.abc import Sequence
+
+import numpy as np
+
+# One finished answer in 8 bytes: the question's bank id, its position in the
+# quiz, the chosen option index with the correctness bit on top, and the time
+# taken in tenths of a second
+ANSWER_DTYPE = np.dtype([('question', '<i4'), ('position', 'u1'), ('choice', 'u1'), ('time', '<u2')])
+
+CORRECT_BIT = 0x80
+OPTION_MASK = 0x7f
+TIME_STEP = 0.1
+MAX_TIME_UNITS = np.iinfo(np.uint16).max
+
+
+def quantize_time(seconds):
+    """Time taken in TIME_STEP units, clamped to what fits in the encoding"""
+    return int(min(MAX_TIME_UNITS, max(0, round(float(seconds) / TIME_STEP))))
+
+
+class CompactAnswers(Sequence):
+    """The 'answers' list of a quiz_history entry, stored as packed bytes.
+
+    Behaves like the list of answer dicts it replaces: iterating, indexing and
+    len() work as before, decoding each answer on access with the question
+    bank. Times are kept to TIME_STEP, so a round trip through the dict format
+    is exact once times are rounded to a tenth of a second.
+    """
+
+    __slots__ = ('data', 'quiz_content')
+
+    def __init__(self, data, quiz_content):
+        self.data = bytes(data)
+        self.quiz_content = quiz_content
+
+    @classmethod
+    def from_arrays(cls, question_ids, positions, options, correct, times, quiz_content):
+        packed = np.zeros(len(question_ids), dtype=ANSWER_DTYPE)
+        packed['question'] = question_ids
+        packed['position'] = positions
+        packed['choice'] = np.asarray(options, dtype=np.uint8) | np.where(correct, CORRECT_BIT, 0).astype(np.uint8)
+        packed['time'] = [quantize_time(t) for t in times]
+        return cls(packed.tobytes(), quiz_content)
+
+    @classmethod
+    def from_dicts(cls, answers, question_ids, quiz_content):
+        """Encode answer dicts, given the bank id of the question at each quiz position"""
+        options = []
+        for answer in answers:
+            question = quiz_content.get_question(int(question_ids[answer['question_id']]))
+            if answer['answer'] not in question['options']:
+                raise ValueError(f"{answer['answer']!r} is not an option of question {question['id']}")
+            options.append(question['options'].index(answer['answer']))
+        return cls.from_arrays(
+            [question_ids[answer['question_id']] for answer in answers],
+            [answer['question_id'] for answer in answers],
+            options,
+            [answer['correct'] for answer in answers],
+            [answer['time_taken'] for answer in answers],
+            quiz_content
+        )
+
+    @property
+    def array(self):
+        """Read-only structured array view of the packed answers"""
+        return np.frombuffer(self.data, dtype=ANSWER_DTYPE)
+
+    @property
+    def question_ids(self):
+        return self.array['question']
+
+    @property
+    def correct(self):
+        return (self.array['choice'] & CORRECT_BIT) != 0
+
+    @property
+    def times(self):
+        return self.array['time'] * TIME_STEP
+
+    def __iter__(self):
+        for row in self.array.tolist():
+            yield self._decode(row)
+
+    def __len__(self):
+        return len(self.data) // ANSWER_DTYPE.itemsize
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.to_dicts()[index]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("answer index out of range")
+        return self._decode(self.array[index].item())
+
+    def __eq__(self, other):
+        if isinstance(other, CompactAnswers):
+            return self.data == other.data
+        if isinstance(other, (list, tuple)):
+            return self.to_dicts() == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"CompactAnswers({len(self)} answers, {len(self.data)} bytes)"
+
+    def __reduce__(self):
+        # Pickled as plain dicts, so readers do not need a question bank
+        return list, (self.to_dicts(),)
+
+    def _decode(self, row):
+        question_id, position, choice, time_units = row
+        return {
+            'question_id': position,
+            'answer': self.quiz_content.get_question(question_id)['options'][choice & OPTION_MASK],
+            'correct': bool(choice & CORRECT_BIT),
+            'time_taken': round(time_units * TIME_STEP, 3)
+        }
+
+    def to_dicts(self):
+        """Answers in the quiz_history 'answers' dict format"""
+        return list(self)
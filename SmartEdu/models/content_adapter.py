@@ -2,13 +2,26 @@ import numpy as np
 import random
 from collections import defaultdict
 
+from models.catalog import DIFFICULTIES, TOPICS
+
 class ContentAdapter:
     def __init__(self):
-        self.difficulty_levels = ['beginner', 'intermediate', 'advanced']
-        self.topics = ['Mathematics', 'Science', 'English', 'History', 'Programming']
-        
-    def get_next_content(self, quiz_history, learner_profile=None):
-        """Recommend next content based on performance and profile"""
+        # Level index == difficulty code, so stepping up or down is code arithmetic
+        self.difficulty_levels = DIFFICULTIES.values
+        self.topics = TOPICS.values
+        # Knowledge-tracing mastery above which a level counts as learned, and below
+        # which the student should step back down
+        self.mastery_threshold = 0.95
+        self.struggling_threshold = 0.4
+        
+    def get_next_content(self, quiz_history, learner_profile=None, mastery=None, peer_evidence=None):
+        """Recommend next content based on performance and profile
+        
+        mastery, if given, maps (topic, difficulty) to the probability that the
+        student has learned it (see models.knowledge_tracing) and replaces
+        whole-quiz accuracy when adapting the difficulty. peer_evidence, from
+        PeerIndex.what_worked_next, picks the topic when no topic needs work.
+        """
         if not quiz_history:
             return "Mathematics", "beginner"
         
@@ -19,10 +32,11 @@ class ContentAdapter:
         topic_performance = self._analyze_topic_performance(quiz_history)
         
         # Choose topic based on weaknesses or continuation
-        recommended_topic = self._select_topic(topic_performance, recent_quizzes)
+        recommended_topic = self._select_topic(topic_performance, recent_quizzes, peer_evidence)
         
         # Adapt difficulty based on performance
-        recommended_difficulty = self._adapt_difficulty(recent_quizzes, learner_profile)
+        recommended_difficulty = self._adapt_difficulty(recent_quizzes, learner_profile,
+                                                        recommended_topic, mastery)
         
         return recommended_topic, recommended_difficulty
     
@@ -51,7 +65,7 @@ class ContentAdapter:
         
         return topic_performance
     
-    def _select_topic(self, topic_performance, recent_quizzes):
+    def _select_topic(self, topic_performance, recent_quizzes, peer_evidence=None):
         """Select next topic based on performance analysis"""
         if not topic_performance:
             return random.choice(self.topics)
@@ -66,7 +80,12 @@ class ContentAdapter:
                               key=lambda t: topic_performance[t]['avg_score'])
             return weakest_topic
         
-        # If all topics are strong, continue with recent topic or explore new
+        # If all topics are strong, follow what helped similar learners most
+        helpful = [step for step in peer_evidence or () if step['avg_gain'] > 0]
+        if helpful:
+            return helpful[0]['topic']
+        
+        # Otherwise continue with recent topic or explore new
         recent_topics = [quiz['topic'] for quiz in recent_quizzes]
         if recent_topics:
             recent_topic = recent_topics[-1]
@@ -81,22 +100,23 @@ class ContentAdapter:
                             key=lambda t: topic_attempts.get(t, 0))
         return least_practiced
     
-    def _adapt_difficulty(self, recent_quizzes, learner_profile):
+    def _adapt_difficulty(self, recent_quizzes, learner_profile, topic=None, mastery=None):
         """Adapt difficulty based on recent performance and learner profile"""
         if not recent_quizzes:
             return "beginner"
         
+        # Get current difficulty from recent quizzes: the most common level, easiest on ties
+        current_difficulties = DIFFICULTIES.encode(quiz.get('difficulty', 'beginner') for quiz in recent_quizzes)
+        current_level_idx = int(np.bincount(current_difficulties).argmax())
+        
+        if mastery:
+            return self._adapt_difficulty_from_mastery(topic, current_level_idx, mastery)
+        
         # Calculate recent performance metrics
         recent_accuracy = np.mean([quiz['accuracy'] for quiz in recent_quizzes])
         recent_times = [quiz['avg_time_per_question'] for quiz in recent_quizzes]
         avg_time = np.mean(recent_times)
         
-        # Get current difficulty from recent quizzes
-        current_difficulties = [quiz.get('difficulty', 'beginner') for quiz in recent_quizzes]
-        current_level_idx = self.difficulty_levels.index(
-            max(set(current_difficulties), key=current_difficulties.count)
-        )
-        
         # Adaptation logic
         if recent_accuracy > 0.85 and avg_time < 20:
             # Performing very well - increase difficulty
@@ -118,6 +138,25 @@ class ContentAdapter:
         
         return self.difficulty_levels[new_level_idx]
     
+    def _adapt_difficulty_from_mastery(self, topic, current_level_idx, mastery):
+        """Step up once the topic's current level is mastered, down if it is not being learned"""
+        # The student's current level, or the hardest one they have practised in this topic
+        practised = [i for i, level in enumerate(self.difficulty_levels) if (topic, level) in mastery]
+        if current_level_idx in practised or not practised:
+            level_idx = current_level_idx
+        else:
+            level_idx = max(practised)
+        level_mastery = mastery.get((topic, self.difficulty_levels[level_idx]))
+        
+        if level_mastery is None:
+            # Nothing known about this topic yet
+            return self.difficulty_levels[level_idx]
+        if level_mastery >= self.mastery_threshold:
+            level_idx = min(level_idx + 1, len(self.difficulty_levels) - 1)
+        elif level_mastery < self.struggling_threshold:
+            level_idx = max(level_idx - 1, 0)
+        return self.difficulty_levels[level_idx]
+    
     def get_content_sequence(self, topic, difficulty, num_items=5):
         """Generate a sequence of content items for the given topic and difficulty"""
         # This would typically connect to a content database
@@ -157,7 +196,7 @@ class ContentAdapter:
         
         return sequence
     
-    def get_teacher_recommendations(self, quiz_history, learner_profile):
+    def get_teacher_recommendations(self, quiz_history, learner_profile, peer_evidence=None):
         """Generate recommendations for teachers about a student"""
         recommendations = []
         
@@ -198,4 +237,13 @@ class ContentAdapter:
         if weaknesses:
             recommendations.append(f"📈 Focus improvement on: {', '.join(weaknesses)}")
         
+        # Peer evidence: what learners in a similar position did best with next
+        if peer_evidence:
+            best = peer_evidence[0]
+            if best['avg_gain'] > 0:
+                recommendations.append(
+                    f"👥 Similar learners improved most with {best['topic']} ({best['difficulty']}) next: "
+                    f"{best['avg_accuracy']:.0%} average across {best['peers']} peers"
+                )
+        
         return recommendations
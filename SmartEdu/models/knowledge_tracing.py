@@ -0,0 +1,319 @@
+"""Bayesian Knowledge Tracing (BKT) for every student and skill at once.
+
+A skill is a (topic, difficulty) pair, taken from each answer's question
+when answers carry question ids (so a review quiz mixing levels updates each
+of them) and from the quiz's label otherwise. Each has four parameters: the chance
+it is known before any practice (p_init), of learning it from one answer
+(p_learn), of a wrong answer despite knowing it (p_slip) and of a right one
+without (p_guess). Mastery, the probability that a student knows a skill,
+is kept for every (student, skill) in a dense float32 matrix and updated
+from answers in vectorized batches:
+
+    tracer = KnowledgeTracer(quiz_content.get_available_topics())
+    tracer.observe_quiz('alice', quiz_result)
+    tracer.mastery_of('alice')            # {(topic, difficulty): probability}
+
+    tracer.fit(registry.snapshot())       # per-skill parameters by grid search
+"""
+import itertools
+import threading
+import weakref
+
+import numpy as np
+
+from models.catalog import DIFFICULTIES
+
+# Grid searched by fit(); slip and guess stay below 0.5 so that a right
+# answer is always evidence of knowing the skill
+FIT_GRID = {
+    'p_init': (0.1, 0.3, 0.5, 0.7, 0.9),
+    'p_learn': (0.02, 0.05, 0.1, 0.2, 0.35),
+    'p_slip': (0.05, 0.1, 0.2, 0.3),
+    'p_guess': (0.1, 0.2, 0.3, 0.4)
+}
+
+
+def bkt_step(mastery, correct, p_learn, p_slip, p_guess):
+    """Mastery after one answer per entry, plus the probability of that answer"""
+    p_correct = mastery * (1 - p_slip) + (1 - mastery) * p_guess
+    likelihood = np.where(correct, p_correct, 1 - p_correct)
+    known = np.where(correct, mastery * (1 - p_slip), mastery * p_slip) / likelihood
+    # Rounding can push mastery just past 1, and wrong answers amplify that
+    return np.clip(known + (1 - known) * p_learn, 0, 1), likelihood
+
+
+def bkt_forward(correct, mask, p_init, p_learn, p_slip, p_guess):
+    """Trace padded answer sequences from the start.
+
+    Args:
+        correct (ndarray): (N, T) bool, answer t of sequence n
+        mask (ndarray): (N, T) bool, False for padding
+        p_init, p_learn, p_slip, p_guess: arrays broadcastable against (N,),
+            e.g. (G, 1) to trace G parameter sets at once
+
+    Returns:
+        tuple: (log likelihood, final mastery), each of the broadcast shape
+    """
+    shape = np.broadcast_shapes(np.shape(p_init), np.shape(p_learn), np.shape(p_slip),
+                                np.shape(p_guess), correct.shape[:1])
+    mastery = np.array(np.broadcast_to(p_init, shape), dtype=np.float32)
+    log_likelihood = np.zeros(shape, dtype=np.float32)
+    for t in range(correct.shape[1]):
+        updated, likelihood = bkt_step(mastery, correct[:, t], p_learn, p_slip, p_guess)
+        mastery = np.where(mask[:, t], updated, mastery)
+        log_likelihood += np.where(mask[:, t], np.log(likelihood), 0)
+    return log_likelihood, mastery
+
+
+def quiz_events(quiz):
+    """Correctness of every answer in a quiz_history entry, as a bool array"""
+    answers = quiz.get('answers') or ()
+    correct = getattr(answers, 'correct', None)
+    if correct is not None:
+        # CompactAnswers, without decoding the answers
+        return correct
+    return np.fromiter((answer['correct'] for answer in answers), dtype=bool, count=len(answers))
+
+
+def answer_skills(quiz):
+    """(topic, difficulty) of every answer in a quiz_history entry"""
+    answers = quiz.get('answers') or ()
+    question_ids = getattr(answers, 'question_ids', None)
+    if question_ids is None or answers.quiz_content is None:
+        # Dict-format answers only know the quiz they were part of
+        return [(quiz['topic'], quiz['difficulty'])] * len(answers)
+    level = answers.quiz_content.get_question_level
+    return [level(question_id) for question_id in question_ids.tolist()]
+
+
+def group_by_skill(quiz_history, sequences=None, max_length=None):
+    """Append each skill's answers (bool arrays) in a history to sequences: {skill: [array, ...]}"""
+    sequences = {} if sequences is None else sequences
+    per_skill = {}
+    for quiz in quiz_history:
+        skills = answer_skills(quiz)
+        events = quiz_events(quiz)
+        distinct = dict.fromkeys(skills)
+        if len(distinct) == 1:
+            per_skill.setdefault(skills[0], []).append(events)
+            continue
+        for skill in distinct:
+            per_skill.setdefault(skill, []).append(events[[s == skill for s in skills]])
+    for skill, events in per_skill.items():
+        sequences.setdefault(skill, []).append(np.concatenate(events)[:max_length])
+    return sequences
+
+
+class KnowledgeTracer:
+    def __init__(self, topics=(), p_init=0.3, p_learn=0.1, p_slip=0.1, p_guess=0.2, capacity=256):
+        self.default_params = (p_init, p_learn, p_slip, p_guess)
+        self.students = {}   # student -> row
+        self.skills = {}     # (topic, difficulty) -> column
+        self.p_init = np.empty(0, dtype=np.float32)
+        self.p_learn = np.empty(0, dtype=np.float32)
+        self.p_slip = np.empty(0, dtype=np.float32)
+        self.p_guess = np.empty(0, dtype=np.float32)
+        self.mastery = np.empty((capacity, 0), dtype=np.float32)
+        # Answers seen per (student, skill); skills never practised have no estimate
+        self.counts = np.zeros((capacity, 0), dtype=np.int32)
+        # question bank -> {question id: column}, so replays skip the level lookups
+        self._question_columns = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        for topic in topics:
+            for difficulty in DIFFICULTIES:
+                self._column((topic, difficulty))
+
+    def observe_quiz(self, student, quiz):
+        """Update a student's mastery with every answer of one finished quiz"""
+        self.observe_quizzes({student: [quiz]})
+
+    def observe_quizzes(self, quizzes_by_student):
+        """Apply many students' quizzes in one batch; each student's in the order given"""
+        rows, cols, correct = [], [], []
+        with self._lock:
+            for student, quizzes in quizzes_by_student.items():
+                row = self._row(student)
+                for quiz in quizzes:
+                    events = quiz_events(quiz)
+                    rows.append(np.full(len(events), row, dtype=np.int64))
+                    cols.append(self._answer_columns(quiz))
+                    correct.append(events)
+            if rows:
+                self._update(np.concatenate(rows), np.concatenate(cols), np.concatenate(correct))
+
+    def observe_population(self, students):
+        """Replay the quiz history of every student in a mapping of user records"""
+        self.observe_quizzes({student: record['quiz_history'] for student, record in students.items()})
+
+    def forget(self, student):
+        """Reset a student to the priors, e.g. when they move to another shard.
+
+        The row is kept, and reused if the student is observed again.
+        """
+        with self._lock:
+            row = self.students.get(student)
+            if row is not None:
+                self.mastery[row] = self.p_init
+                self.counts[row] = 0
+
+    def mastery_of(self, student):
+        """{(topic, difficulty): mastery} for the skills the student has practised"""
+        # Under the lock: another session's first answer on a new skill grows the
+        # skill dict and swaps in wider arrays
+        with self._lock:
+            row = self.students.get(student)
+            if row is None:
+                return {}
+            mastery, counts = self.mastery[row].copy(), self.counts[row].copy()
+            skills = list(self.skills.items())
+        return {skill: float(mastery[col]) for skill, col in skills if counts[col]}
+
+    def mastery_from_history(self, quiz_history):
+        """mastery_of() for a quiz history that is not tracked, e.g. one loaded from a store"""
+        sequences = group_by_skill(quiz_history)
+        if not sequences:
+            return {}
+        skills = list(sequences)
+        correct, mask = self._pad([sequences[skill][0] for skill in skills])
+        with self._lock:
+            cols = np.array([self._column(skill) for skill in skills])
+        _, mastery = bkt_forward(correct, mask, self.p_init[cols], self.p_learn[cols],
+                                 self.p_slip[cols], self.p_guess[cols])
+        return {skill: float(m) for skill, m in zip(skills, mastery)}
+
+    def fit(self, students, grid=FIT_GRID, max_sequences=2000, max_length=200, seed=0):
+        """Fit each skill's parameters to a population by maximum likelihood.
+
+        Every parameter combination in `grid` is scored on up to
+        `max_sequences` (student, skill) answer sequences at once, then the
+        mastery matrix is recomputed from scratch with the new parameters.
+
+        Args:
+            students: mapping of student -> user record (e.g. a registry snapshot)
+
+        Returns:
+            dict: skill -> {'p_init', 'p_learn', 'p_slip', 'p_guess', 'sequences', 'log_likelihood'}
+        """
+        sequences = {}
+        for record in students.values():
+            group_by_skill(record['quiz_history'], sequences, max_length)
+
+        combos = np.array(list(itertools.product(*(grid[name] for name in
+                                                   ('p_init', 'p_learn', 'p_slip', 'p_guess')))),
+                          dtype=np.float32)
+        p_init, p_learn, p_slip, p_guess = (combos[:, i:i + 1] for i in range(4))
+        rng = np.random.default_rng(seed)
+        fitted = {}
+        for skill, skill_sequences in sequences.items():
+            if len(skill_sequences) > max_sequences:
+                picks = rng.choice(len(skill_sequences), max_sequences, replace=False)
+                skill_sequences = [skill_sequences[i] for i in picks]
+            correct, mask = self._pad(skill_sequences)
+            log_likelihood, _ = bkt_forward(correct, mask, p_init, p_learn, p_slip, p_guess)
+            totals = log_likelihood.sum(axis=1)
+            best = int(np.argmax(totals))
+            fitted[skill] = dict(zip(('p_init', 'p_learn', 'p_slip', 'p_guess'), combos[best].tolist()),
+                                 sequences=len(skill_sequences), log_likelihood=float(totals[best]))
+
+        with self._lock:
+            for skill, params in fitted.items():
+                col = self._column(skill)
+                self.p_init[col] = params['p_init']
+                self.p_learn[col] = params['p_learn']
+                self.p_slip[col] = params['p_slip']
+                self.p_guess[col] = params['p_guess']
+            self.mastery[:] = self.p_init
+            self.counts[:] = 0
+        self.observe_population(students)
+        return fitted
+
+    def __getstate__(self):
+        with self._lock:
+            state = dict(self.__dict__)
+            state['students'] = dict(self.students)
+            state['skills'] = dict(self.skills)
+            state['mastery'] = self.mastery.copy()
+            state['counts'] = self.counts.copy()
+        del state['_lock']
+        del state['_question_columns']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._question_columns = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _answer_columns(self, quiz):
+        """Column of every answer's skill, as answer_skills() would give it"""
+        answers = quiz.get('answers') or ()
+        question_ids = getattr(answers, 'question_ids', None)
+        if question_ids is None or answers.quiz_content is None:
+            return np.full(len(answers), self._column((quiz['topic'], quiz['difficulty'])), dtype=np.int64)
+        columns = self._question_columns.get(answers.quiz_content)
+        if columns is None:
+            columns = self._question_columns[answers.quiz_content] = {}
+        level = answers.quiz_content.get_question_level
+        result = []
+        for question_id in question_ids.tolist():
+            col = columns.get(question_id)
+            if col is None:
+                # A question's level never changes once it is in the bank
+                col = columns[question_id] = self._column(level(question_id))
+            result.append(col)
+        return np.array(result, dtype=np.int64)
+
+    def _update(self, rows, cols, correct):
+        """Apply answer events in order; the same (student, skill) may repeat"""
+        # Events for the same (student, skill) depend on each other, so they go in
+        # rounds: round k holds every pair's k-th event, and no pair twice
+        pair = rows * self.mastery.shape[1] + cols
+        order = np.argsort(pair, kind='stable')
+        sorted_pair = pair[order]
+        starts = np.flatnonzero(np.r_[True, sorted_pair[1:] != sorted_pair[:-1]])
+        rank = np.empty(len(pair), dtype=np.int64)
+        rank[order] = np.arange(len(pair)) - np.repeat(starts, np.diff(np.r_[starts, len(pair)]))
+
+        by_round = np.argsort(rank, kind='stable')
+        bounds = np.cumsum(np.bincount(rank))
+        start = 0
+        for end in bounds:
+            index = by_round[start:end]
+            r, c = rows[index], cols[index]
+            self.mastery[r, c], _ = bkt_step(self.mastery[r, c], correct[index],
+                                             self.p_learn[c], self.p_slip[c], self.p_guess[c])
+            start = end
+        np.add.at(self.counts, (rows, cols), 1)
+
+    def _row(self, student):
+        row = self.students.get(student)
+        if row is None:
+            row = self.students[student] = len(self.students)
+            if row >= len(self.mastery):
+                # Grow by doubling, so adding students is amortized O(1)
+                extra = max(len(self.mastery), 1)
+                self.mastery = np.vstack([self.mastery, np.tile(self.p_init, (extra, 1))])
+                self.counts = np.vstack([self.counts, np.zeros((extra, self.counts.shape[1]), dtype=np.int32)])
+        return row
+
+    def _column(self, skill):
+        col = self.skills.get(skill)
+        if col is None:
+            col = self.skills[skill] = len(self.skills)
+            p_init, p_learn, p_slip, p_guess = self.default_params
+            self.p_init = np.append(self.p_init, np.float32(p_init))
+            self.p_learn = np.append(self.p_learn, np.float32(p_learn))
+            self.p_slip = np.append(self.p_slip, np.float32(p_slip))
+            self.p_guess = np.append(self.p_guess, np.float32(p_guess))
+            self.mastery = np.hstack([self.mastery, np.full((len(self.mastery), 1), p_init, dtype=np.float32)])
+            self.counts = np.hstack([self.counts, np.zeros((len(self.counts), 1), dtype=np.int32)])
+        return col
+
+    @staticmethod
+    def _pad(sequences):
+        length = max(len(s) for s in sequences)
+        correct = np.zeros((len(sequences), length), dtype=bool)
+        mask = np.zeros((len(sequences), length), dtype=bool)
+        for i, s in enumerate(sequences):
+            correct[i, :len(s)] = s
+            mask[i, :len(s)] = True
+        return correct, mask
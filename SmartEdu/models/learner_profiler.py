@@ -1,14 +1,26 @@
 import numpy as np
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
-import pandas as pd
 
 class LearnerProfiler:
     def __init__(self):
-        self.scaler = StandardScaler()
-        self.clusterer = KMeans(n_clusters=3, random_state=42)
+        # scikit-learn is slow to import, so the models are built on first use
+        self._scaler = None
+        self._clusterer = None
         self.is_fitted = False
     
+    @property
+    def scaler(self):
+        if self._scaler is None:
+            from sklearn.preprocessing import StandardScaler
+            self._scaler = StandardScaler()
+        return self._scaler
+    
+    @property
+    def clusterer(self):
+        if self._clusterer is None:
+            from sklearn.cluster import KMeans
+            self._clusterer = KMeans(n_clusters=3, random_state=42)
+        return self._clusterer
+    
     def extract_features(self, quiz_history):
         """Extract learning features from quiz history"""
         if not quiz_history:
@@ -31,9 +43,12 @@ class LearnerProfiler:
         if len(values) < 2:
             return 0.0
         
-        x = np.arange(len(values))
-        slope = np.polyfit(x, values, 1)[0]
-        return slope
+        # Closed-form least-squares slope; same result as np.polyfit(x, values, 1)[0]
+        # at a fraction of the cost, which matters when indexing whole cohorts
+        x = np.arange(len(values), dtype=np.float64)
+        y = np.asarray(values, dtype=np.float64)
+        x -= x.mean()
+        return float(np.dot(x, y - y.mean()) / np.dot(x, x))
     
     def get_learner_profile(self, quiz_history):
         """Generate comprehensive learner profile"""
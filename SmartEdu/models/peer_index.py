@@ -0,0 +1,208 @@
+"""Nearest-neighbour search over learner feature vectors ("students like you").
+
+Learners are compared on LearnerProfiler.extract_features (accuracy, time per
+question, consistency, trend), standardized so seconds do not outweigh
+accuracy. Two indexes are kept:
+
+    learners      every student's current features
+    transitions   the features a student had before each of their last few
+                  quizzes, with what that next quiz was and how it went
+
+so "similar learners" is a query on the first and "what worked for similar
+learners next" aggregates the nearest entries of the second:
+
+    peers = PeerIndex()
+    peers.build(registry.snapshot())
+    peers.similar_learners(quiz_history, k=5, exclude='alice')
+    peers.what_worked_next(quiz_history)
+"""
+import threading
+
+import numpy as np
+
+from models.learner_profiler import LearnerProfiler
+
+
+def _standardizer(vectors):
+    """(mean, scale) that standardize each column; constant columns are left unscaled"""
+    std = vectors.std(axis=0)
+    return vectors.mean(axis=0), np.where(std > 1e-9, std, 1.0)
+
+
+class IncrementalKNN:
+    """k-NN over keyed vectors: a KD-tree rebuilt in batches plus a buffer of recent changes.
+
+    Upserts and removals go to a small buffer that queries scan with numpy
+    and mark the key's old tree entry stale; the tree is rebuilt once the
+    buffer grows past `rebuild_fraction` of the tree (or `min_rebuild` for
+    small trees), so the cost of rebuilding is spread over many changes.
+    """
+
+    def __init__(self, dim, leaf_size=40, rebuild_fraction=0.1, min_rebuild=256):
+        self.dim = dim
+        self.leaf_size = leaf_size
+        self.rebuild_fraction = rebuild_fraction
+        self.min_rebuild = min_rebuild
+        self._tree = None
+        self._tree_keys = []
+        self._tree_vectors = np.empty((0, dim))
+        self._tree_rows = {}        # key -> row in the tree
+        self._stale = set()         # tree rows superseded by the buffer or removed
+        self._pending = {}          # key -> raw vector, not in the tree yet
+        self._mean = np.zeros(dim)
+        self._scale = np.ones(dim)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._tree_keys) - len(self._stale) + len(self._pending)
+
+    def upsert(self, key, vector):
+        with self._lock:
+            row = self._tree_rows.get(key)
+            if row is not None:
+                self._stale.add(row)
+            self._pending[key] = np.asarray(vector, dtype=np.float64)
+            if len(self._pending) + len(self._stale) > max(self.min_rebuild,
+                                                           self.rebuild_fraction * len(self._tree_keys)):
+                self._rebuild()
+
+    def remove(self, key):
+        with self._lock:
+            self._pending.pop(key, None)
+            row = self._tree_rows.get(key)
+            if row is not None:
+                self._stale.add(row)
+
+    def rebuild(self):
+        with self._lock:
+            self._rebuild()
+
+    def query(self, vector, k, exclude=None, max_excluded=1):
+        """Up to k (key, distance) pairs nearest to vector, nearest first.
+
+        exclude is an optional predicate on keys, true for at most
+        `max_excluded` of them (e.g. the student asking).
+        """
+        with self._lock:
+            tree, tree_keys, mean, scale = self._tree, self._tree_keys, self._mean, self._scale
+            # Both are small: bounded by the rebuild threshold
+            stale, pending = set(self._stale), dict(self._pending)
+        if tree is None and pending:
+            # Nothing built yet, so no scaler either: standardize by the pending vectors
+            # themselves, rather than comparing raw seconds against raw accuracies
+            mean, scale = _standardizer(np.array(list(pending.values())))
+        point = (np.asarray(vector, dtype=np.float64) - mean) / scale
+
+        candidates = []
+        if tree is not None:
+            # Ask for enough extra neighbours to make up for stale or excluded rows
+            fetch = min(len(tree_keys), k + len(stale) + (max_excluded if exclude else 0))
+            distances, rows = tree.query(point[None, :], k=fetch)
+            for distance, row in zip(distances[0], rows[0]):
+                key = tree_keys[row]
+                if row not in stale and not (exclude and exclude(key)):
+                    candidates.append((key, float(distance)))
+        if pending:
+            keys = [key for key in pending if not (exclude and exclude(key))]
+            if keys:
+                vectors = (np.array([pending[key] for key in keys]) - mean) / scale
+                distances = np.sqrt(((vectors - point) ** 2).sum(axis=1))
+                candidates.extend(zip(keys, distances.tolist()))
+        candidates.sort(key=lambda candidate: candidate[1])
+        return candidates[:k]
+
+    def _rebuild(self):
+        from sklearn.neighbors import KDTree
+
+        live = [(key, self._tree_vectors[row]) for key, row in self._tree_rows.items()
+                if row not in self._stale and key not in self._pending]
+        live.extend(self._pending.items())
+        self._pending = {}
+        self._stale = set()
+        self._tree_keys = [key for key, _ in live]
+        self._tree_rows = {key: row for row, key in enumerate(self._tree_keys)}
+        self._tree_vectors = np.array([vector for _, vector in live]).reshape(len(live), self.dim)
+        if not live:
+            self._tree = None
+            return
+        self._mean, self._scale = _standardizer(self._tree_vectors)
+        self._tree = KDTree((self._tree_vectors - self._mean) / self._scale, leaf_size=self.leaf_size)
+
+
+class PeerIndex:
+    def __init__(self, learner_profiler=None, transitions_per_student=5, **knn_options):
+        self.learner_profiler = learner_profiler or LearnerProfiler()
+        self.transitions_per_student = transitions_per_student
+        self.learners = IncrementalKNN(4, **knn_options)
+        self.transitions = IncrementalKNN(4, **knn_options)
+        # (student, index) -> (topic, difficulty, accuracy, accuracy gain over the student's average before it)
+        self.outcomes = {}
+        self._transition_keys = {}  # student -> keys currently indexed
+
+    def __len__(self):
+        return len(self.learners)
+
+    def update_student(self, student, quiz_history):
+        """(Re)index a student after their history changed"""
+        if not quiz_history:
+            return
+        self.learners.upsert(student, self.learner_profiler.extract_features(quiz_history))
+
+        first = max(1, len(quiz_history) - self.transitions_per_student)
+        keys = []
+        for index in range(first, len(quiz_history)):
+            key = (student, index)
+            keys.append(key)
+            if key in self.outcomes:
+                # Earlier quizzes never change, so neither do their transitions
+                continue
+            before = quiz_history[:index]
+            quiz = quiz_history[index]
+            self.transitions.upsert(key, self.learner_profiler.extract_features(before))
+            prior = np.mean([q['accuracy'] for q in before])
+            self.outcomes[key] = (quiz['topic'], quiz['difficulty'], quiz['accuracy'], quiz['accuracy'] - prior)
+        for key in self._transition_keys.get(student, ()):
+            if key not in keys:
+                self.transitions.remove(key)
+                self.outcomes.pop(key, None)
+        self._transition_keys[student] = keys
+
+    def build(self, students):
+        """Index every student in a mapping of user records, then build the trees once"""
+        for student, record in students.items():
+            self.update_student(student, record['quiz_history'])
+        self.learners.rebuild()
+        self.transitions.rebuild()
+
+    def similar_learners(self, quiz_history, k=5, exclude=None):
+        """The k students whose current features are nearest, as {'student', 'distance'} dicts"""
+        features = self.learner_profiler.extract_features(quiz_history)
+        return [{'student': student, 'distance': distance}
+                for student, distance in self.learners.query(
+                    features, k, exclude=(lambda key: key == exclude) if exclude is not None else None)]
+
+    def what_worked_next(self, quiz_history, k=25, exclude=None, min_peers=2):
+        """What learners in a similar position took next, best average gain first.
+
+        Returns:
+            list: dicts with 'topic', 'difficulty', 'peers', 'avg_accuracy' and
+            'avg_gain' (next accuracy minus their average before it), for each
+            next step taken by at least min_peers of the k nearest transitions
+        """
+        features = self.learner_profiler.extract_features(quiz_history)
+        steps = {}
+        neighbours = self.transitions.query(
+            features, k, exclude=(lambda key: key[0] == exclude) if exclude is not None else None,
+            max_excluded=self.transitions_per_student)
+        for key, _ in neighbours:
+            outcome = self.outcomes.get(key)
+            if outcome is not None:
+                steps.setdefault(outcome[:2], []).append(outcome[2:])
+        evidence = [{
+            'topic': topic,
+            'difficulty': difficulty,
+            'peers': len(results),
+            'avg_accuracy': float(np.mean([accuracy for accuracy, _ in results])),
+            'avg_gain': float(np.mean([gain for _, gain in results]))
+        } for (topic, difficulty), results in steps.items() if len(results) >= min_peers]
+        return sorted(evidence, key=lambda step: step['avg_gain'], reverse=True)
@@ -0,0 +1,152 @@
+import time
+import uuid
+from datetime import datetime
+
+from models.learner_profiler import LearnerProfiler
+from models.content_adapter import ContentAdapter
+from models.quiz_session import QuizSession
+from models.knowledge_tracing import KnowledgeTracer
+from models.catalog import DIFFICULTIES, TOPICS
+from data.quiz_content import QuizContent
+from utils.feedback_generator import FeedbackGenerator
+from utils.analytics import Analytics
+
+
+class QuizNotFoundError(KeyError):
+    """Raised when a quiz session id is unknown or already finished"""
+
+
+def build_quiz_result(topic, difficulty, total_questions, answers, start_time, end_time=None):
+    """Score a quiz and build the quiz_history entry stored for the student"""
+    end_time = end_time if end_time is not None else time.time()
+
+    # Calculate quiz metrics
+    total_time = end_time - start_time
+    correct_answers = sum(1 for ans in answers if ans['correct'])
+    accuracy = correct_answers / len(answers)
+    avg_time_per_question = total_time / len(answers)
+
+    return {
+        'timestamp': datetime.now(),
+        'topic': topic,
+        'difficulty': difficulty,
+        'total_questions': total_questions,
+        'correct_answers': correct_answers,
+        'accuracy': accuracy,
+        'total_time': total_time,
+        'avg_time_per_question': avg_time_per_question,
+        'answers': answers
+    }
+
+
+class QuizEngine:
+    """Quiz flow without any UI state; every call reads and writes through the store"""
+
+    def __init__(self, store, quiz_content=None, learner_profiler=None, content_adapter=None,
+                 feedback_generator=None, analytics=None, knowledge_tracer=None):
+        self.store = store
+        self.quiz_content = quiz_content or QuizContent()
+        self.learner_profiler = learner_profiler or LearnerProfiler()
+        self.content_adapter = content_adapter or ContentAdapter()
+        self.feedback_generator = feedback_generator or FeedbackGenerator()
+        self.analytics = analytics or Analytics()
+        # Only its parameters are used: mastery is traced from the stored history
+        self.knowledge_tracer = knowledge_tracer or KnowledgeTracer(self.quiz_content.get_available_topics())
+
+    def start_quiz(self, student, topic=None, difficulty=None, num_questions=5):
+        """Start a quiz, using the adaptive recommendation for anything not given"""
+        # Checked before anything is stored, so a typo is not recorded as a new topic;
+        # topics the adapter recommends are valid even without questions in the bank
+        if topic and topic not in TOPICS.values:
+            raise ValueError(f"Unknown topic: {topic!r} (expected one of {', '.join(TOPICS)})")
+        if difficulty and difficulty not in DIFFICULTIES.values:
+            raise ValueError(f"Unknown difficulty: {difficulty!r} (expected one of {', '.join(DIFFICULTIES)})")
+
+        self.store.ensure_user(student)
+        quiz_history = self.store.get_quiz_history(student)
+
+        if quiz_history:
+            profile = self.learner_profiler.get_learner_profile(quiz_history)
+            mastery = self.knowledge_tracer.mastery_from_history(quiz_history)
+            recommended_topic, recommended_difficulty = self.content_adapter.get_next_content(quiz_history, profile, mastery)
+        else:
+            recommended_topic, recommended_difficulty = "Mathematics", "beginner"
+
+        topic = topic or recommended_topic
+        difficulty = difficulty or recommended_difficulty
+        questions = self.quiz_content.get_questions(topic, difficulty, num_questions=num_questions)
+
+        session_id = uuid.uuid4().hex
+        session = QuizSession.from_questions(topic, difficulty, questions)
+        self.store.save_session(session_id, dict(session.to_dict(), student=student))
+
+        return {
+            'session_id': session_id,
+            'topic': topic,
+            'difficulty': difficulty,
+            'questions': [
+                {'question': q['question'], 'options': q['options']} for q in questions
+            ]
+        }
+
+    def submit_answer(self, session_id, question_index, answer, time_taken=None):
+        """Record an answer; resubmitting the same question replaces the earlier answer"""
+        student, session = self._load(session_id)
+        if not 0 <= question_index < session.num_questions:
+            raise ValueError(f"question_index must be between 0 and {session.num_questions - 1}")
+
+        question = self.quiz_content.get_question(int(session.question_ids[question_index]))
+        if answer not in question['options']:
+            raise ValueError("answer must be one of the question's options")
+
+        session.record_answer(question_index, question['options'].index(answer), time_taken=time_taken)
+        self.store.save_session(session_id, dict(session.to_dict(), student=student))
+
+        return {'answered': session.num_answered, 'total_questions': session.num_questions}
+
+    def finish_quiz(self, session_id):
+        """Score the quiz, store it in the student's history and return feedback"""
+        # Claimed before grading, so two concurrent finishes cannot both record the quiz
+        data = self.store.pop_session(session_id)
+        if data is None:
+            raise QuizNotFoundError(session_id)
+        try:
+            student, session = data['student'], QuizSession.from_dict(data)
+            if session.num_answered == 0:
+                raise ValueError("Cannot finish a quiz without any answers")
+
+            quiz_result = build_quiz_result(
+                session.topic, session.difficulty, session.num_questions,
+                session.to_compact_answers(self.quiz_content), session.start_time
+            )
+
+            # Feedback uses the profile from before this quiz, like the Student Portal
+            quiz_history = self.store.get_quiz_history(student)
+            profile = self.learner_profiler.get_learner_profile(quiz_history) if quiz_history else None
+            feedback = self.feedback_generator.generate_feedback(quiz_result, profile)
+
+            self.store.append_quiz(student, quiz_result)
+        except Exception:
+            # Nothing was recorded, so the quiz can still be finished
+            self.store.save_session(session_id, data)
+            raise
+
+        return {'result': quiz_result, 'feedback': feedback}
+
+    def get_profile(self, student):
+        quiz_history = self.store.get_quiz_history(student)
+        if not quiz_history:
+            return None
+        return self.learner_profiler.get_learner_profile(quiz_history)
+
+    def get_report(self, student):
+        user_data = self.store.get_user_data(student)
+        if user_data is None:
+            return None
+        return self.analytics.generate_student_report(user_data)
+
+    def _load(self, session_id):
+        data = self.store.load_session(session_id)
+        if data is None:
+            raise QuizNotFoundError(session_id)
+        return data['student'], QuizSession.from_dict(data)
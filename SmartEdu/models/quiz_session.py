@@ -0,0 +1,150 @@
+import time
+import numpy as np
+
+from models.compact_answers import CompactAnswers
+
+# Answer index stored for questions that have not been answered yet
+UNANSWERED = -1
+
+
+class QuizSession:
+    """Compact state of one in-progress quiz.
+
+    Questions are referenced by id (see QuizContent.get_question), answers are
+    option indices in an int8 array and per-question timings a float32 array.
+    """
+
+    __slots__ = ('topic', 'difficulty', 'question_ids', 'answers', 'timings',
+                 'current_question', 'start_time', 'question_start_time')
+
+    def __init__(self, topic, difficulty, question_ids, start_time=None):
+        start_time = start_time if start_time is not None else time.time()
+        self.topic = topic
+        self.difficulty = difficulty
+        self.question_ids = np.asarray(question_ids, dtype=np.int32)
+        self.answers = np.full(len(self.question_ids), UNANSWERED, dtype=np.int8)
+        self.timings = np.zeros(len(self.question_ids), dtype=np.float32)
+        self.current_question = 0
+        self.start_time = start_time
+        self.question_start_time = start_time
+
+    @classmethod
+    def from_questions(cls, topic, difficulty, questions, start_time=None):
+        return cls(topic, difficulty, [q['id'] for q in questions], start_time)
+
+    @property
+    def num_questions(self):
+        return len(self.question_ids)
+
+    @property
+    def num_answered(self):
+        return int(np.count_nonzero(self.answers != UNANSWERED))
+
+    def record_answer(self, position, option_index, time_taken=None, now=None):
+        """Record (or replace) the answer to the question at position"""
+        now = now if now is not None else time.time()
+        if time_taken is None:
+            time_taken = now - self.question_start_time
+        self.answers[position] = option_index
+        self.timings[position] = time_taken
+        self.question_start_time = now
+
+    def go_to(self, position, now=None):
+        """Move to another question and restart its timer"""
+        self.current_question = position
+        self.question_start_time = now if now is not None else time.time()
+
+    def grade(self, answer_key):
+        """Boolean array of which answers are correct"""
+        return self.answers == answer_key[self.question_ids]
+
+    def to_answer_dicts(self, quiz_content):
+        """Answered questions in the quiz_history 'answers' format"""
+        answer_dicts = []
+        for position in np.flatnonzero(self.answers != UNANSWERED):
+            question = quiz_content.get_question(int(self.question_ids[position]))
+            answer = question['options'][int(self.answers[position])]
+            answer_dicts.append({
+                'question_id': int(position),
+                'answer': answer,
+                'correct': answer == question['correct_answer'],
+                'time_taken': float(self.timings[position])
+            })
+        return answer_dicts
+
+    def to_compact_answers(self, quiz_content):
+        """Answered questions as CompactAnswers, the packed form of to_answer_dicts"""
+        positions = np.flatnonzero(self.answers != UNANSWERED)
+        question_ids = self.question_ids[positions]
+        options = self.answers[positions]
+        questions = [quiz_content.get_question(int(q)) for q in question_ids]
+        correct = [q['options'][o] == q['correct_answer'] for q, o in zip(questions, options)]
+        return CompactAnswers.from_arrays(question_ids, positions, options, correct,
+                                          self.timings[positions], quiz_content)
+
+    def to_dict(self):
+        """JSON-friendly form for stores shared between processes"""
+        return {
+            'topic': self.topic,
+            'difficulty': self.difficulty,
+            'question_ids': self.question_ids.tolist(),
+            'answers': self.answers.tolist(),
+            'timings': self.timings.tolist(),
+            'current_question': self.current_question,
+            'start_time': self.start_time,
+            'question_start_time': self.question_start_time
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        session = cls(data['topic'], data['difficulty'], data['question_ids'], data['start_time'])
+        session.answers[:] = data['answers']
+        session.timings[:] = data['timings']
+        session.current_question = data['current_question']
+        session.question_start_time = data['question_start_time']
+        return session
+
+
+def stack_sessions(sessions):
+    """Stack sessions into (question_ids, answers) matrices padded with UNANSWERED"""
+    width = max((s.num_questions for s in sessions), default=0)
+    question_ids = np.full((len(sessions), width), UNANSWERED, dtype=np.int32)
+    answers = np.full((len(sessions), width), UNANSWERED, dtype=np.int8)
+    for row, session in enumerate(sessions):
+        question_ids[row, :session.num_questions] = session.question_ids
+        answers[row, :session.num_questions] = session.answers
+    return question_ids, answers
+
+
+def grade_batch(question_ids, answers, answer_key):
+    """Grade many submitted quizzes at once.
+
+    Args:
+        question_ids (ndarray): (sessions, questions) question ids, UNANSWERED for padding
+        answers (ndarray): (sessions, questions) chosen option indices, UNANSWERED if skipped
+        answer_key (ndarray): correct option index per question id (QuizContent.get_answer_key)
+
+    Returns:
+        dict: 'correct' (bool matrix), 'correct_answers', 'answered' and
+        'accuracy' (per session, over answered questions like finish_quiz)
+    """
+    question_ids = np.asarray(question_ids)
+    answers = np.asarray(answers)
+    valid = question_ids != UNANSWERED
+    expected = answer_key[np.where(valid, question_ids, 0)]
+
+    answered = valid & (answers != UNANSWERED)
+    correct = answered & (answers == expected)
+
+    correct_answers = correct.sum(axis=1)
+    answered_counts = answered.sum(axis=1)
+    accuracy = np.divide(correct_answers, answered_counts,
+                         out=np.zeros(len(answers), dtype=np.float64),
+                         where=answered_counts > 0)
+
+    return {
+        'correct': correct,
+        'correct_answers': correct_answers,
+        'answered': answered_counts,
+        'accuracy': accuracy
+    }
@@ -0,0 +1,252 @@
+import heapq
+import itertools
+import threading
+import time
+
+DAY = 24 * 3600
+
+
+class ReviewCard:
+    """SM-2 state of one question for one student"""
+
+    __slots__ = ('student', 'item', 'easiness', 'interval', 'repetitions', 'lapses', 'due', 'seq', 'in_global')
+
+    def __init__(self, student, item):
+        self.student = student
+        self.item = item
+        self.easiness = 2.5
+        self.interval = 0.0
+        self.repetitions = 0
+        self.lapses = 0
+        self.due = 0.0
+        # Sequence number of the card's live queue entry; older entries are stale
+        self.seq = -1
+        # Whether the live entry is still in the global heap (pop_due removes it)
+        self.in_global = False
+
+
+class ReviewScheduler:
+    """Spaced-repetition review schedule for every student and question (SM-2).
+
+    Each answer updates the card for (student, question): correct answers
+    push the next review out by a growing interval, wrong ones bring it back
+    after `lapse_interval`. Due cards sit in one global heap of
+    (due, seq, card), and the same entries in a heap per student, so
+    recording an answer, popping the globally next due card and finding a
+    student's due cards are all O(log n) per card, however many are
+    scheduled. Rescheduled cards leave stale entries behind, which are
+    skipped when popped and compacted away once they outnumber live ones.
+
+    Times are epoch seconds, like QuizSession's.
+    """
+
+    def __init__(self, first_interval=DAY, second_interval=6 * DAY, lapse_interval=600,
+                 min_easiness=1.3, fast_seconds=10.0, slow_seconds=45.0):
+        self.first_interval = first_interval
+        self.second_interval = second_interval
+        self.lapse_interval = lapse_interval
+        self.min_easiness = min_easiness
+        # Correct answers faster/slower than these count as easy/hard recalls
+        self.fast_seconds = fast_seconds
+        self.slow_seconds = slow_seconds
+
+        self._cards = {}    # student -> {item: ReviewCard}
+        self._queues = {}   # student -> heap of (due, seq, card)
+        self._global = []   # heap of (due, seq, card) for every card not yet popped
+        self._global_stale = 0
+        self._num_cards = 0
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._num_cards
+
+    def quality(self, correct, time_taken=None):
+        """SM-2 recall quality (0-5) from one answer outcome"""
+        if not correct:
+            return 1
+        if time_taken is None:
+            return 4
+        if time_taken <= self.fast_seconds:
+            return 5
+        return 3 if time_taken >= self.slow_seconds else 4
+
+    def record(self, student, item, correct, time_taken=None, now=None):
+        """Update the card for (student, item) with an answer and reschedule it"""
+        now = now if now is not None else time.time()
+        with self._lock:
+            cards = self._cards.setdefault(student, {})
+            card = cards.get(item)
+            if card is None:
+                card = cards[item] = ReviewCard(student, item)
+                self._num_cards += 1
+            elif card.in_global:
+                self._global_stale += 1
+            self._update(card, self.quality(correct, time_taken), now)
+            self._push(card)
+            return card
+
+    def record_quiz(self, student, quiz_result):
+        """Record every answer of a quiz_history entry.
+
+        Needs answers that carry question ids (CompactAnswers); older
+        dict-format answers only know their position in the quiz and are skipped.
+        """
+        answers = quiz_result['answers']
+        question_ids = getattr(answers, 'question_ids', None)
+        if question_ids is None:
+            return 0
+        timestamp = quiz_result.get('timestamp')
+        now = timestamp.timestamp() if timestamp is not None else time.time()
+        for item, correct, time_taken in zip(question_ids.tolist(), answers.correct.tolist(), answers.times.tolist()):
+            self.record(student, item, correct, time_taken, now)
+        return len(question_ids)
+
+    def record_quizzes(self, student, quiz_results):
+        """record_quiz for several of a student's quizzes in order, e.g. when replaying a log.
+
+        Cards are updated answer by answer but queued once each, at the end,
+        so a batch leaves no stale entries behind.
+        """
+        touched = {}
+        with self._lock:
+            cards = self._cards.setdefault(student, {})
+            for quiz_result in quiz_results:
+                answers = quiz_result['answers']
+                question_ids = getattr(answers, 'question_ids', None)
+                if question_ids is None:
+                    continue
+                timestamp = quiz_result.get('timestamp')
+                now = timestamp.timestamp() if timestamp is not None else time.time()
+                for item, correct, time_taken in zip(question_ids.tolist(), answers.correct.tolist(),
+                                                     answers.times.tolist()):
+                    card = cards.get(item)
+                    if card is None:
+                        card = cards[item] = ReviewCard(student, item)
+                        self._num_cards += 1
+                    elif card.in_global and item not in touched:
+                        self._global_stale += 1
+                    self._update(card, self.quality(correct, time_taken), now)
+                    # Moved to the end, so cards are queued in the order record() would have
+                    touched.pop(item, None)
+                    touched[item] = card
+            for card in touched.values():
+                self._push(card)
+        return len(touched)
+
+    def due(self, student, now=None, limit=None):
+        """Questions the student should review now, most overdue first"""
+        now = now if now is not None else time.time()
+        with self._lock:
+            queue = self._queues.get(student)
+            if not queue:
+                return []
+            found = []
+            while queue and queue[0][0] <= now and (limit is None or len(found) < limit):
+                entry = heapq.heappop(queue)
+                if entry[1] == entry[2].seq:
+                    found.append(entry)
+            # Peeking means popping; the live entries go back in
+            for entry in found:
+                heapq.heappush(queue, entry)
+            return [entry[2].item for entry in found]
+
+    def next_review(self, student):
+        """Time of the student's next review, or None if nothing is scheduled"""
+        with self._lock:
+            queue = self._queues.get(student)
+            while queue and queue[0][1] != queue[0][2].seq:
+                heapq.heappop(queue)
+            return queue[0][0] if queue else None
+
+    def pop_due(self, now=None, limit=None):
+        """Remove and return (student, item, due) for cards that have come due, across all students.
+
+        Each card is returned once per time it comes due, e.g. to send
+        reminders; it stays in the student's due() list until answered again.
+        """
+        now = now if now is not None else time.time()
+        popped = []
+        with self._lock:
+            while self._global and self._global[0][0] <= now and (limit is None or len(popped) < limit):
+                due, seq, card = heapq.heappop(self._global)
+                if seq != card.seq:
+                    self._global_stale -= 1
+                    continue
+                card.in_global = False
+                popped.append((card.student, card.item, due))
+        return popped
+
+    def forget(self, student):
+        """Drop every card of a student, e.g. when they move to another shard; returns how many"""
+        with self._lock:
+            cards = self._cards.pop(student, {})
+            self._queues.pop(student, None)
+            for card in cards.values():
+                if card.in_global:
+                    self._global_stale += 1
+                # Leaves its global heap entry stale
+                card.seq = -1
+            self._num_cards -= len(cards)
+            return len(cards)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'students': len(self._cards),
+                'cards': self._num_cards,
+                'global_queue': len(self._global),
+                'global_stale': self._global_stale
+            }
+
+    def __getstate__(self):
+        # Containers are copied under the lock, as due() reorders the heaps in place
+        with self._lock:
+            state = dict(self.__dict__)
+            state['_cards'] = {student: dict(cards) for student, cards in self._cards.items()}
+            state['_queues'] = {student: list(queue) for student, queue in self._queues.items()}
+            state['_global'] = list(self._global)
+            state['_sequence'] = next(self._sequence)
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        state = dict(state)
+        state['_sequence'] = itertools.count(state['_sequence'])
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _update(self, card, quality, now):
+        if quality < 3:
+            card.repetitions = 0
+            card.lapses += 1
+            card.interval = self.lapse_interval
+        else:
+            card.repetitions += 1
+            if card.repetitions == 1:
+                card.interval = self.first_interval
+            elif card.repetitions == 2:
+                card.interval = self.second_interval
+            else:
+                card.interval *= card.easiness
+        card.easiness = max(self.min_easiness,
+                            card.easiness + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+        card.due = now + card.interval
+
+    def _push(self, card):
+        card.seq = next(self._sequence)
+        card.in_global = True
+        entry = (card.due, card.seq, card)
+        # One tuple shared by both heaps
+        heapq.heappush(self._global, entry)
+        queue = self._queues.setdefault(card.student, [])
+        heapq.heappush(queue, entry)
+
+        # Rebuild heaps once stale entries outnumber live ones
+        if self._global_stale > len(self._global) // 2 + 64:
+            self._global = [entry for entry in self._global if entry[1] == entry[2].seq]
+            heapq.heapify(self._global)
+            self._global_stale = 0
+        if len(queue) > 2 * len(self._cards[card.student]) + 16:
+            queue[:] = [entry for entry in queue if entry[1] == entry[2].seq]
+            heapq.heapify(queue)
@@ -0,0 +1,182 @@
+"""Scaling benchmarks for the learning engine on synthetic learner populations.
+
+Generates a seeded population (data/synthetic_learners.py) for each scale,
+given in total quizzes, and reports throughput, p50/p99 latency and peak
+traced memory for:
+
+    profile          LearnerProfiler.get_learner_profile    (per student)
+    next_content     ContentAdapter.get_next_content        (per student)
+    get_questions    QuizContent.get_questions              (per call)
+    class_analytics  Analytics.generate_class_analytics     (whole population)
+    bkt_replay       KnowledgeTracer.observe_population     (whole population)
+    peer_query       PeerIndex.what_worked_next             (per student)
+
+Run from the SmartEdu directory:
+
+    python scripts/benchmark.py --scales 1000,100000 --save benchmarks.json
+    python scripts/benchmark.py --scales 1000,100000 --compare benchmarks.json
+
+With --compare the exit status is 1 if any p50 is slower than the baseline by
+more than --tolerance. Populations are held in memory, so the 10M-quiz scale
+needs tens of GB; per-student entry points only time --samples students.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.quiz_content import QuizContent
+from data.synthetic_learners import SyntheticLearnerGenerator
+from models.catalog import DIFFICULTIES
+from models.content_adapter import ContentAdapter
+from models.knowledge_tracing import KnowledgeTracer
+from models.learner_profiler import LearnerProfiler
+from models.peer_index import PeerIndex
+from utils.analytics import Analytics
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure(calls, repeat=1):
+    """Time every call, then run them once more under tracemalloc for peak memory"""
+    # Warm-up, so lazy imports and first-call caches are not timed
+    calls[0]()
+
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for call in calls:
+            call_start = time.perf_counter()
+            call()
+            latencies.append(time.perf_counter() - call_start)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    for call in calls:
+        call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'calls': len(latencies),
+        'ops_per_s': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'peak_kb': peak / 1024
+    }
+
+
+def run_scale(scale, args, components):
+    quiz_content, learner_profiler, content_adapter, analytics = components
+    num_students = max(1, scale // args.quizzes_per_student)
+    generator = SyntheticLearnerGenerator(seed=args.seed, quiz_content=quiz_content)
+
+    start = time.perf_counter()
+    population = generator.generate_population(num_students, args.quizzes_per_student)
+    generate_seconds = time.perf_counter() - start
+    total_quizzes = sum(len(record['quiz_history']) for record in population.values())
+    print(f"\n{total_quizzes} quizzes / {num_students} students (generated in {generate_seconds:.1f}s)")
+
+    rng = random.Random(args.seed)
+    sample = rng.sample(list(population.values()), min(args.samples, num_students))
+    histories = [record['quiz_history'] for record in sample]
+    profiles = [learner_profiler.get_learner_profile(history) for history in histories]
+    topics = quiz_content.get_available_topics()
+    question_requests = [(rng.choice(topics), rng.choice(DIFFICULTIES.values)) for _ in range(args.samples)]
+
+    start = time.perf_counter()
+    peers = PeerIndex(learner_profiler)
+    peers.build(population)
+    print(f"peer index of {len(peers)} learners built in {time.perf_counter() - start:.1f}s")
+
+    return {
+        'profile': measure([lambda h=h: learner_profiler.get_learner_profile(h) for h in histories]),
+        'next_content': measure([lambda h=h, p=p: content_adapter.get_next_content(h, p)
+                                 for h, p in zip(histories, profiles)]),
+        'get_questions': measure([lambda t=t, d=d: quiz_content.get_questions(t, d)
+                                  for t, d in question_requests]),
+        'class_analytics': measure([lambda: analytics.generate_class_analytics(population)],
+                                   repeat=args.repeat),
+        'peer_query': measure([lambda h=h: peers.what_worked_next(h) for h in histories]),
+        'bkt_replay': measure([lambda: KnowledgeTracer(topics).observe_population(population)],
+                              repeat=args.repeat),
+    }
+
+
+def compare(results, baseline, tolerance, min_ms):
+    """Print p50 ratios against a baseline; returns the regressed benchmark names"""
+    regressions = []
+    print(f"\n{'benchmark':32} {'baseline p50':>13} {'p50':>10} {'ratio':>7}")
+    for key, result in results.items():
+        base = baseline.get('results', {}).get(key)
+        if base is None or not base['p50_ms']:
+            continue
+        ratio = result['p50_ms'] / base['p50_ms']
+        # Sub-min_ms timings are too noisy to call a regression
+        flag = '  REGRESSION' if ratio > tolerance and result['p50_ms'] >= min_ms else ''
+        print(f"{key:32} {base['p50_ms']:11.3f}ms {result['p50_ms']:8.3f}ms {ratio:7.2f}{flag}")
+        if flag:
+            regressions.append(key)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', default='1000,10000,100000',
+                        help="comma-separated population sizes in total quizzes")
+    parser.add_argument('--quizzes-per-student', type=int, default=20)
+    parser.add_argument('--samples', type=int, default=500, help="students timed per per-student benchmark")
+    parser.add_argument('--repeat', type=int, default=3, help="class analytics runs per scale")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--save', help="write results to this JSON baseline file")
+    parser.add_argument('--compare', help="baseline JSON file to compare against")
+    parser.add_argument('--tolerance', type=float, default=1.25, help="allowed p50 slowdown ratio")
+    parser.add_argument('--min-ms', type=float, default=0.05, help="ignore slowdowns of calls faster than this")
+    args = parser.parse_args()
+
+    components = (QuizContent(), LearnerProfiler(), ContentAdapter(), Analytics())
+    results = {}
+    for scale in (int(s) for s in args.scales.split(',')):
+        for name, result in run_scale(scale, args, components).items():
+            results[f"{name}@{scale}"] = result
+
+    print(f"\n{'benchmark':32} {'calls':>6} {'ops/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'peak KB':>9}")
+    for key, result in results.items():
+        print(f"{key:32} {result['calls']:6d} {result['ops_per_s']:10.1f} {result['p50_ms']:9.3f} "
+              f"{result['p99_ms']:9.3f} {result['peak_kb']:9.1f}")
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({
+                'meta': {
+                    'created': datetime.now().isoformat(timespec='seconds'),
+                    'python': platform.python_version(),
+                    'machine': platform.machine(),
+                    'seed': args.seed,
+                    'quizzes_per_student': args.quizzes_per_student
+                },
+                'results': results
+            }, f, indent=2)
+        print(f"\nSaved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.min_ms)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) slower than {args.tolerance:.2f}x the baseline")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
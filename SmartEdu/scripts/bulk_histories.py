@@ -0,0 +1,41 @@
+"""Bulk export/import of student quiz histories (see utils/bulk_io.py).
+
+Run from the SmartEdu directory:
+
+    python scripts/bulk_histories.py export --store sqlite:///smartedu.db --dir gradebook --format parquet
+    python scripts/bulk_histories.py import --store sqlite:///smartedu.db --dir gradebook --format csv
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.bulk_io import FORMATS, DEFAULT_BATCH_SIZE, export_histories, import_histories
+from utils.store import make_store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('command', choices=['export', 'import'])
+    parser.add_argument('--store', required=True, help="store URL, e.g. sqlite:///smartedu.db")
+    parser.add_argument('--dir', required=True, help="directory holding quizzes.<fmt> and answers.<fmt>")
+    parser.add_argument('--format', choices=FORMATS, default='parquet')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    store = make_store(args.store)
+    start = time.perf_counter()
+    if args.command == 'export':
+        counts = export_histories(store, args.dir, args.format, args.batch_size)
+    else:
+        counts = import_histories(store, args.dir, args.format, args.batch_size)
+    elapsed = time.perf_counter() - start
+
+    summary = ', '.join(f"{count} {name}" for name, count in counts.items())
+    print(f"{args.command}ed {summary} in {elapsed:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Cold-start import budget check.
+
+Imports each module in a fresh interpreter, measures the wall time, and fails
+(exit code 1) if any module goes over its budget or pulls in a heavy library
+that should only load on the code path that needs it.
+
+Run from the SmartEdu directory:
+
+    python scripts/check_import_budget.py
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Heavy libraries that must stay out of a cold start
+HEAVY_MODULES = ['pandas', 'plotly.express', 'sklearn', 'openai']
+
+# Budgets in milliseconds. `app` includes Streamlit itself (~600ms) and is
+# imported in bare mode, i.e. the student quiz path before any page renders.
+IMPORT_BUDGETS_MS = {
+    'data.quiz_content': 50,
+    'utils.feedback_generator': 50,
+    'models.content_adapter': 300,
+    'models.learner_profiler': 300,
+    'utils.analytics': 300,
+    'utils.ai_chatbot': 50,
+    'app': 1500,
+}
+
+RUNS = 3
+
+MEASURE_SNIPPET = """
+import json, sys, time, logging
+logging.disable(logging.WARNING)
+start = time.perf_counter()
+import {module}
+elapsed_ms = (time.perf_counter() - start) * 1000
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{'elapsed_ms': elapsed_ms, 'heavy': heavy}}))
+"""
+
+
+def measure_import(module):
+    """Import a module in a fresh interpreter and return (ms, heavy modules loaded)"""
+    code = MEASURE_SNIPPET.format(module=module, heavy=HEAVY_MODULES)
+    result = subprocess.run(
+        [sys.executable, '-c', code],
+        cwd=APP_DIR,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    # Streamlit may log to stdout in bare mode; the measurement is the last line
+    data = json.loads(result.stdout.strip().splitlines()[-1])
+    return data['elapsed_ms'], data['heavy']
+
+
+def check_budgets(budgets=IMPORT_BUDGETS_MS, runs=RUNS):
+    """Return a list of (module, median_ms, budget_ms, heavy, ok) rows"""
+    rows = []
+    for module, budget in budgets.items():
+        timings = []
+        heavy = []
+        for _ in range(runs):
+            elapsed, heavy = measure_import(module)
+            timings.append(elapsed)
+        median = statistics.median(timings)
+        ok = median <= budget and not heavy
+        rows.append((module, median, budget, heavy, ok))
+    return rows
+
+
+def main():
+    rows = check_budgets()
+    failed = False
+    for module, median, budget, heavy, ok in rows:
+        status = 'ok' if ok else 'FAIL'
+        line = f"{status:4} {module:28} {median:8.1f}ms / {budget}ms"
+        if heavy:
+            line += f"  loaded: {', '.join(heavy)}"
+        print(line)
+        failed = failed or not ok
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
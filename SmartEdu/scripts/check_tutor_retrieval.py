@@ -0,0 +1,62 @@
+"""Retrieve-first tutor check.
+
+Asks the tutor questions against the fake LLM server and fails (exit code 1)
+unless questions the question bank really answers are answered locally, and
+questions that only share a word with a bank question go to the model.
+
+Run from the SmartEdu directory:
+
+    python scripts/check_tutor_retrieval.py
+"""
+import os
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+from utils.fake_llm_server import FakeCompletionServer
+
+# Asked almost word for word in the question bank
+LOCAL_QUESTIONS = [
+    "How do I find √64?",
+    "What is 5 + 3?",
+    "what is the chemical symbol for water",
+    "what gas do plants absorb",
+    "time is money metaphor",
+]
+
+# Share a word or a symbol with a bank question, which does not answer them
+MODEL_QUESTIONS = [
+    "What is 2+2?",
+    "what is 2 + 3?",
+    "what is money",
+    "how does the wind work",
+    "tell me about plants",
+    "what is √81",
+    "symbol for gold",
+]
+
+
+def main():
+    server = FakeCompletionServer().start()
+    os.environ['OPENAI_BASE_URL'] = server.base_url
+    os.environ['OPENAI_API_KEY'] = 'fake'
+
+    from data.quiz_content import QuizContent
+    from utils.ai_chatbot import AIChatbot
+
+    chatbot = AIChatbot(knowledge=QuizContent())
+    failed = False
+    for question, expect_local in [(q, True) for q in LOCAL_QUESTIONS] + [(q, False) for q in MODEL_QUESTIONS]:
+        before = server.request_count
+        chatbot.chat(question, conversation_id=question)
+        local = server.request_count == before
+        ok = local == expect_local
+        print(f"{'ok' if ok else 'FAIL':4} {'local' if local else 'model':5} {question}")
+        failed = failed or not ok
+    server.stop()
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,295 @@
+"""Multi-session load test for the Streamlit app, driven headlessly with AppTest.
+
+Simulated students enter their name, take quizzes (start, answer every
+question, finish) and optionally ask the tutor a question. Simulated teachers
+keep refreshing the Teacher Dashboard. The LLM is replaced by
+utils.fake_llm_server with tunable latency.
+
+AppTest is not safe to run from several threads in one interpreter, so each
+of --concurrency worker processes runs one session at a time. A worker is a
+complete app instance whose sessions share its registry and component caches,
+as sessions on one server do; a teacher's dashboard shows the students run by
+the same worker. Every worker needs its own interpreter (roughly 200 MB), so
+concurrency is bounded by memory.
+
+Reports rerun latency percentiles per action, and how much process memory
+grew per simulated user, both while sessions are open and what stays after
+they are closed. Exits with status 1 if any session aborted or any rerun
+failed, since the percentiles then only cover the sessions that survived.
+
+Run from the SmartEdu directory:
+
+    python scripts/load_test_app.py --students 100 --teachers 5 --concurrency 20 --llm-latency 0.5
+
+AppTest reruns the whole script for every interaction, including those inside
+fragments, so latencies are an upper bound on what a browser session sees.
+"""
+import argparse
+import gc
+import multiprocessing
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from queue import Empty
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+from utils.fake_llm_server import FakeCompletionServer
+
+APP_PATH = os.path.join(APP_DIR, 'app.py')
+
+
+def rss_mb():
+    """Current resident set size, falling back to the peak where /proc is missing"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 1024
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class SessionAborted(Exception):
+    """A rerun failed inside AppTest, so the rest of the session cannot be driven"""
+
+
+class SessionDriver:
+    """One simulated browser session, timing every rerun it triggers"""
+
+    # Component discovery scans installed packages on every new AppTest; a real
+    # server does it once, so it is shared rather than counted in 'open'
+    _component_manager = None
+
+    def __init__(self, latencies, errors, timeout):
+        from streamlit.testing.v1 import AppTest
+
+        self.at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        if SessionDriver._component_manager is not None:
+            self.at._bidi_component_manager = SessionDriver._component_manager
+        self.latencies = latencies
+        self.errors = errors
+
+    def timed(self, action, element):
+        start = time.perf_counter()
+        try:
+            element.run()
+        except Exception as e:
+            self.errors[action] += 1
+            raise SessionAborted(f"{action}: {type(e).__name__}: {e}") from e
+        elapsed = time.perf_counter() - start
+        if SessionDriver._component_manager is None:
+            SessionDriver._component_manager = getattr(self.at, '_bidi_component_manager', None)
+        self.latencies[action].append(elapsed)
+        if self.at.exception:
+            self.errors[action] += 1
+
+    def has_button(self, label):
+        return any(label in button.label for button in self.at.button)
+
+    def click(self, action, label):
+        for button in self.at.button:
+            if label in button.label:
+                self.timed(action, button.click())
+                return True
+        self.errors[action] += 1
+        return False
+
+
+def run_student(index, args, latencies, errors, rng):
+    session = SessionDriver(latencies, errors, args.timeout)
+    at = session.at
+    session.timed('open', at)
+    session.timed('login', at.sidebar.text_input[0].input(f"student-{index:05d}"))
+
+    for _ in range(args.quizzes):
+        if not session.click('start_quiz', 'Start Quiz'):
+            break
+        while True:
+            if at.radio:
+                question = [radio for radio in at.radio if radio.key and radio.key.startswith('q_')]
+                if question:
+                    question[0].set_value(rng.choice(question[0].options))
+            if session.has_button('Next'):
+                session.click('next_question', 'Next')
+                continue
+            session.click('finish_quiz', 'Finish')
+            break
+        session.click('new_quiz', 'Take Another')
+        time.sleep(rng.uniform(0, args.think_time))
+
+    if args.chat and at.sidebar.radio:
+        session.timed('open_chat', at.sidebar.radio[0].set_value("💬 AI Tutor Chat"))
+        if at.text_area:
+            session.timed('type_question', at.text_area[0].input("Why is the sky blue?"))
+            session.click('send_chat', 'Send')
+    return session
+
+
+def run_teacher(index, args, latencies, errors, rng):
+    session = SessionDriver(latencies, errors, args.timeout)
+    at = session.at
+    session.timed('open', at)
+    session.timed('open_dashboard', at.sidebar.selectbox[0].select('Teacher Dashboard'))
+    for _ in range(args.teacher_refreshes):
+        time.sleep(rng.uniform(0, args.think_time * 2))
+        session.timed('refresh_dashboard', at)
+    return session
+
+
+SESSIONS = {'student': run_student, 'teacher': run_teacher}
+
+
+def run_worker(worker, args, llm_url, jobs, results):
+    """Worker process: warm up, run sessions from `jobs` one at a time, then report"""
+    os.environ['OPENAI_BASE_URL'] = llm_url
+    os.environ.setdefault('OPENAI_API_KEY', 'load-test')
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    aborted = []
+
+    # Warm-up sessions, so lazy imports and cache_resource builds are not counted per user
+    warmup = argparse.Namespace(**{**vars(args), 'quizzes': 1, 'chat': True, 'teacher_refreshes': 1})
+    try:
+        run_student(-1 - worker, warmup, defaultdict(list), defaultdict(int), random.Random(args.seed))
+        run_teacher(-1 - worker, warmup, defaultdict(list), defaultdict(int), random.Random(args.seed))
+    except SessionAborted as e:
+        aborted.append(f"worker {worker} warm-up aborted: {e}")
+    gc.collect()
+    tracemalloc.start()
+    rss_start = rss_mb()
+
+    sessions = []
+    for kind, index, seed in iter(jobs.get, None):
+        try:
+            sessions.append(SESSIONS[kind](index, args, latencies, errors, random.Random(seed)))
+        except SessionAborted as e:
+            aborted.append(f"{kind} {index} aborted: {e}")
+
+    rss_active = rss_mb()
+    traced_active = tracemalloc.get_traced_memory()[0]
+    del sessions
+    gc.collect()
+    results.put({
+        'latencies': dict(latencies),
+        'errors': dict(errors),
+        'aborted': aborted,
+        'rss_active': rss_active - rss_start,
+        'rss_retained': rss_mb() - rss_start,
+        'traced_active': traced_active,
+        'traced_retained': tracemalloc.get_traced_memory()[0],
+    })
+
+
+def collect_results(workers, results):
+    """One report per worker; a worker that died without reporting counts as aborted"""
+    reports = []
+    pending = len(workers)
+    while pending:
+        try:
+            reports.append(results.get(timeout=1.0))
+            pending -= 1
+        except Empty:
+            crashed = [p for p in workers if p.exitcode not in (None, 0)]
+            if len(crashed) >= pending:
+                for p in crashed:
+                    reports.append({'aborted': [f"worker {p.name} exited with code {p.exitcode}"]})
+                break
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--students', type=int, default=50)
+    parser.add_argument('--teachers', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, default=10, help="worker processes, each running one session at a time")
+    parser.add_argument('--quizzes', type=int, default=2, help="quizzes per student")
+    parser.add_argument('--teacher-refreshes', type=int, default=5)
+    parser.add_argument('--chat', action='store_true', help="each student also asks the tutor a question")
+    parser.add_argument('--llm-latency', type=float, default=0.5, help="fake LLM time to first token (s)")
+    parser.add_argument('--llm-chunk-delay', type=float, default=0.02)
+    parser.add_argument('--think-time', type=float, default=0.0, help="max random pause between quizzes (s)")
+    parser.add_argument('--timeout', type=float, default=120.0, help="per-rerun timeout (s)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    llm = FakeCompletionServer(first_token_latency=args.llm_latency, chunk_delay=args.llm_chunk_delay).start()
+    rng = random.Random(args.seed)
+    jobs = [('student', i) for i in range(args.students)] + [('teacher', i) for i in range(args.teachers)]
+    rng.shuffle(jobs)
+
+    context = multiprocessing.get_context('spawn')
+    job_queue = context.Queue()
+    results = context.Queue()
+    for kind, index in jobs:
+        job_queue.put((kind, index, rng.random()))
+    for _ in range(args.concurrency):
+        job_queue.put(None)
+
+    start = time.perf_counter()
+    workers = [context.Process(target=run_worker, args=(worker, args, llm.base_url, job_queue, results),
+                               name=f"load-worker-{worker}", daemon=True)
+               for worker in range(args.concurrency)]
+    for worker in workers:
+        worker.start()
+    reports = collect_results(workers, results)
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    llm.stop()
+
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    aborted = []
+    for report in reports:
+        for action, values in report.get('latencies', {}).items():
+            latencies[action].extend(values)
+        for action, count in report.get('errors', {}).items():
+            errors[action] += count
+        aborted.extend(report['aborted'])
+
+    users = args.students + args.teachers
+    total_reruns = sum(len(values) for values in latencies.values())
+    print(f"{args.students} students + {args.teachers} teachers, {args.concurrency} at a time: "
+          f"{total_reruns} reruns in {elapsed:.1f}s ({total_reruns / elapsed:.1f} reruns/s), "
+          f"{llm.request_count} LLM requests")
+    if total_reruns:
+        print(f"\n{'action':18} {'count':>6} {'errors':>6} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        for action, values in sorted(latencies.items()):
+            print(f"{action:18} {len(values):6d} {errors[action]:6d} {percentile(values, 50) * 1000:8.1f} "
+                  f"{percentile(values, 90) * 1000:8.1f} {percentile(values, 99) * 1000:8.1f} "
+                  f"{max(values) * 1000:8.1f}")
+        all_values = [v for values in latencies.values() for v in values]
+        print(f"{'all':18} {len(all_values):6d} {sum(errors.values()):6d} "
+              f"{percentile(all_values, 50) * 1000:8.1f} {percentile(all_values, 90) * 1000:8.1f} "
+              f"{percentile(all_values, 99) * 1000:8.1f} {statistics.mean(all_values) * 1000:8.1f} (mean)")
+
+    measured = [report for report in reports if 'rss_active' in report]
+    print("\nMemory growth per user, summed over workers (RSS / Python heap):")
+    print(f"  with sessions open: {sum(r['rss_active'] for r in measured) / users * 1024:8.1f} KB / "
+          f"{sum(r['traced_active'] for r in measured) / users / 1024:8.1f} KB")
+    print(f"  after they closed:  {sum(r['rss_retained'] for r in measured) / users * 1024:8.1f} KB / "
+          f"{sum(r['traced_retained'] for r in measured) / users / 1024:8.1f} KB  (server-side state: registry, caches)")
+
+    if aborted or any(errors.values()):
+        for message in aborted:
+            print(message, file=sys.stderr)
+        print(f"\nFAILED: {len(aborted)} aborted, {sum(errors.values())} failed reruns; "
+              "percentiles only cover the sessions that completed", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
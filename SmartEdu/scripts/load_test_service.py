@@ -0,0 +1,96 @@
+"""Load test for the headless quiz-engine service (service/api.py).
+
+Each simulated student starts a quiz, answers every question and finishes it,
+in a loop. Reports request throughput and latency percentiles per endpoint.
+
+    python scripts/load_test_service.py --url http://127.0.0.1:8000 --students 50 --quizzes 5
+"""
+import argparse
+import json
+import random
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+
+
+def request(base_url, method, path, body=None):
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    req = urllib.request.Request(base_url + path, data=data, method=method,
+                                 headers={'content-type': 'application/json'})
+    with urllib.request.urlopen(req, timeout=30) as response:
+        return json.loads(response.read())
+
+
+def run_student(base_url, student, quizzes, latencies, errors, lock):
+    def timed(endpoint, method, path, body=None):
+        start = time.perf_counter()
+        try:
+            return request(base_url, method, path, body)
+        except (urllib.error.URLError, OSError) as e:
+            with lock:
+                errors[endpoint] += 1
+            raise e
+        finally:
+            with lock:
+                latencies[endpoint].append(time.perf_counter() - start)
+
+    for _ in range(quizzes):
+        try:
+            quiz = timed('start', 'POST', '/quizzes', {'student': student})
+            session_id = quiz['session_id']
+            for index, question in enumerate(quiz['questions']):
+                timed('answer', 'POST', f'/quizzes/{session_id}/answers', {
+                    'question_index': index,
+                    'answer': random.choice(question['options']),
+                    'time_taken': random.uniform(5, 40)
+                })
+            timed('finish', 'POST', f'/quizzes/{session_id}/finish')
+            timed('profile', 'GET', f'/students/{student}/profile')
+        except (urllib.error.URLError, OSError):
+            continue
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--students', type=int, default=50, help='concurrent simulated students')
+    parser.add_argument('--quizzes', type=int, default=5, help='quizzes per student')
+    args = parser.parse_args()
+
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+
+    threads = [
+        threading.Thread(target=run_student,
+                         args=(args.url, f'loadtest-{i}', args.quizzes, latencies, errors, lock))
+        for i in range(args.students)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    total_requests = sum(len(values) for values in latencies.values())
+    print(f"{args.students} students x {args.quizzes} quizzes: {total_requests} requests "
+          f"in {elapsed:.1f}s ({total_requests / elapsed:.0f} req/s)")
+    print(f"{'endpoint':10} {'count':>7} {'errors':>7} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'mean ms':>8}")
+    for endpoint, values in latencies.items():
+        print(f"{endpoint:10} {len(values):7d} {errors[endpoint]:7d} "
+              f"{percentile(values, 50) * 1000:8.1f} {percentile(values, 90) * 1000:8.1f} "
+              f"{percentile(values, 99) * 1000:8.1f} {statistics.mean(values) * 1000:8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Per-student memory footprint of stored quiz histories, dict vs packed answers.
+
+Generates the same seeded synthetic population twice, once with answers as
+lists of dicts (the old quiz_history format) and once as CompactAnswers (what
+the app and the quiz service now store), loads each into a StudentRegistry and
+reports deep sizes per student and per quiz.
+
+Run from the SmartEdu directory:
+
+    python scripts/memory_report.py --students 1000 --quizzes-per-student 20
+"""
+import argparse
+import os
+import statistics
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.quiz_content import QuizContent
+from data.synthetic_learners import SyntheticLearnerGenerator
+from utils.memory import deep_sizeof, student_footprint
+from utils.student_registry import StudentRegistry
+
+
+def measure(quiz_content, args, compact_answers):
+    generator = SyntheticLearnerGenerator(seed=args.seed, quiz_content=quiz_content,
+                                          compact_answers=compact_answers)
+    registry = StudentRegistry()
+    for student, record in generator.iter_population(args.students, args.quizzes_per_student):
+        registry.append_quizzes(student, record['quiz_history'])
+
+    snapshot = registry.snapshot()
+    rows = student_footprint(snapshot, shared=[quiz_content])
+    record_bytes = [row['record_bytes'] for row in rows]
+    quizzes = sum(row['quizzes'] for row in rows)
+    answers_bytes = sum(deep_sizeof(quiz['answers'], [quiz_content])
+                        for record in snapshot.students.values() for quiz in record['quiz_history'])
+    return {
+        'total_kb': sum(record_bytes) / 1024,
+        'per_student_median_kb': statistics.median(record_bytes) / 1024,
+        'per_student_max_kb': max(record_bytes) / 1024,
+        'per_quiz_bytes': sum(record_bytes) / quizzes,
+        'answers_per_quiz_bytes': answers_bytes / quizzes
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--students', type=int, default=1000)
+    parser.add_argument('--quizzes-per-student', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    quiz_content = QuizContent()
+    results = {
+        'dict answers': measure(quiz_content, args, compact_answers=False),
+        'compact answers': measure(quiz_content, args, compact_answers=True)
+    }
+
+    print(f"{args.students} students, ~{args.quizzes_per_student} quizzes each\n")
+    print(f"{'encoding':16} {'total KB':>10} {'median KB':>10} {'max KB':>8} {'B/quiz':>8} {'answers B/quiz':>15}")
+    for name, result in results.items():
+        print(f"{name:16} {result['total_kb']:10.1f} {result['per_student_median_kb']:10.2f} "
+              f"{result['per_student_max_kb']:8.2f} {result['per_quiz_bytes']:8.0f} "
+              f"{result['answers_per_quiz_bytes']:15.0f}")
+    saved = 1 - results['compact answers']['total_kb'] / results['dict answers']['total_kb']
+    print(f"\nCompact answers use {saved:.0%} less memory for stored histories")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+"""Headless quiz-engine service.
+
+A plain ASGI application exposing the quiz flow as JSON endpoints so the hot
+path can scale horizontally behind an HTTP load balancer. The service keeps
+no per-request state in memory; quiz sessions and histories live in the store
+selected by SMARTEDU_STORE (see utils.store.make_store), so every replica must
+point at the same shared store.
+
+Run with any ASGI server, from the SmartEdu directory:
+
+    SMARTEDU_STORE=sqlite:///smartedu.db uvicorn service.api:app --workers 4
+
+Endpoints:
+    POST /quizzes                        {"student", "topic"?, "difficulty"?}
+    POST /quizzes/{session_id}/answers   {"question_index", "answer", "time_taken"?}
+    POST /quizzes/{session_id}/finish
+    GET  /students/{student}/profile
+    GET  /students/{student}/report
+    GET  /health
+    GET  /metrics                        Prometheus text format (with SMARTEDU_TRACING=1)
+"""
+import asyncio
+import json
+import re
+import traceback
+from datetime import datetime
+from urllib.parse import unquote
+
+from models.quiz_engine import QuizEngine, QuizNotFoundError
+from utils.store import make_store
+from utils.tracing import tracer
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if hasattr(value, 'to_dicts'):
+        # CompactAnswers
+        return value.to_dicts()
+    if hasattr(value, 'item'):
+        # numpy scalars
+        return value.item()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+class QuizService:
+    """ASGI application wrapping a QuizEngine"""
+
+    def __init__(self, engine=None):
+        self._engine = engine
+        self.routes = [
+            ('POST', re.compile(r'^/quizzes$'), self.start_quiz),
+            ('POST', re.compile(r'^/quizzes/(?P<session_id>[0-9a-f]+)/answers$'), self.submit_answer),
+            ('POST', re.compile(r'^/quizzes/(?P<session_id>[0-9a-f]+)/finish$'), self.finish_quiz),
+            ('GET', re.compile(r'^/students/(?P<student>[^/]+)/profile$'), self.get_profile),
+            ('GET', re.compile(r'^/students/(?P<student>[^/]+)/report$'), self.get_report),
+            ('GET', re.compile(r'^/health$'), self.health),
+            ('GET', re.compile(r'^/metrics$'), self.metrics),
+        ]
+
+    @property
+    def engine(self):
+        # Built on first request so importing the module stays cheap
+        if self._engine is None:
+            self._engine = tracer.instrument(QuizEngine(make_store()), 'engine')
+        return self._engine
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        try:
+            handler, params = self._match(scope['method'], scope['path'])
+            body = await self._read_json(receive) if scope['method'] == 'POST' else {}
+            # Handlers do blocking store I/O and grading, so they run off the event loop
+            status, payload = 200, await asyncio.to_thread(self._handle, handler, body, params)
+        except HTTPError as e:
+            status, payload = e.status, {'error': e.message}
+        except QuizNotFoundError:
+            status, payload = 404, {'error': 'Quiz session not found'}
+        except ValueError as e:
+            status, payload = 400, {'error': str(e)}
+        except Exception:
+            # Still answer the request; the traceback goes to the server's stderr
+            traceback.print_exc()
+            status, payload = 500, {'error': 'Internal server error'}
+
+        if isinstance(payload, str):
+            data, content_type = payload.encode('utf-8'), b'text/plain; version=0.0.4'
+        else:
+            data, content_type = json.dumps(payload, default=_json_default).encode('utf-8'), b'application/json'
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [
+                (b'content-type', content_type),
+                (b'content-length', str(len(data)).encode('ascii')),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': data})
+
+    def _handle(self, handler, body, params):
+        with tracer.span(f"http.{handler.__name__}"):
+            return handler(body, **params)
+
+    def _match(self, method, path):
+        path_matched = False
+        for route_method, pattern, handler in self.routes:
+            match = pattern.match(path)
+            if match:
+                path_matched = True
+                if route_method == method:
+                    return handler, {k: unquote(v) for k, v in match.groupdict().items()}
+        if path_matched:
+            raise HTTPError(405, 'Method not allowed')
+        raise HTTPError(404, 'Not found')
+
+    async def _read_json(self, receive):
+        chunks = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            chunks.append(message.get('body', b''))
+            more_body = message.get('more_body', False)
+        raw = b''.join(chunks)
+        if not raw:
+            return {}
+        try:
+            body = json.loads(raw)
+        except json.JSONDecodeError:
+            raise HTTPError(400, 'Request body must be valid JSON')
+        if not isinstance(body, dict):
+            raise HTTPError(400, 'Request body must be a JSON object')
+        return body
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    # Handlers
+
+    def start_quiz(self, body):
+        student = body.get('student')
+        if not student:
+            raise HTTPError(400, 'student is required')
+        return self.engine.start_quiz(
+            student,
+            topic=body.get('topic'),
+            difficulty=body.get('difficulty'),
+            num_questions=int(body.get('num_questions', 5))
+        )
+
+    def submit_answer(self, body, session_id):
+        if 'question_index' not in body or 'answer' not in body:
+            raise HTTPError(400, 'question_index and answer are required')
+        return self.engine.submit_answer(
+            session_id,
+            int(body['question_index']),
+            body['answer'],
+            time_taken=body.get('time_taken')
+        )
+
+    def finish_quiz(self, body, session_id):
+        return self.engine.finish_quiz(session_id)
+
+    def get_profile(self, body, student):
+        profile = self.engine.get_profile(student)
+        if profile is None:
+            raise HTTPError(404, 'No quiz history for this student')
+        return profile
+
+    def get_report(self, body, student):
+        report = self.engine.get_report(student)
+        if report is None:
+            raise HTTPError(404, 'Unknown student')
+        return report
+
+    def health(self, body):
+        return {'status': 'ok'}
+
+    def metrics(self, body):
+        return tracer.export_prometheus()
+
+
+app = QuizService()
@@ -1,14 +1,64 @@
 import os
 import json
-from openai import OpenAI
+
+from utils.retrieval import tokenize
+from utils.response_cache import ResponseCache, profile_signature, topic_signature
+from utils.chat_context import ChatContextManager, extractive_summary
 
 class AIChatbot:
-    def __init__(self):
+    def __init__(self, knowledge=None, answer_threshold=0.85, grounding_threshold=0.3, min_answer_terms=2,
+                 min_answer_score=5.0, min_question_coverage=0.6):
+        # Imported here so that pages without the tutor never load openai or asyncio
+        from utils.llm_client import AsyncLLMClient
+        from utils.llm_scheduler import FairScheduler
+        
+        # All sessions share one client: at most SMARTEDU_LLM_CONCURRENCY requests are
+        # in flight, each student may send SMARTEDU_LLM_STUDENT_RATE chat requests a
+        # minute, and chat goes ahead of suggestions and starters. Failures are retried
+        # with backoff, and while the API is down the circuit breaker fails fast so
+        # suggestions fall back to the default lists
+        self.client = AsyncLLMClient(
+            timeout=float(os.environ.get("SMARTEDU_LLM_TIMEOUT", 30)),
+            scheduler=FairScheduler(
+                max_concurrency=int(os.environ.get("SMARTEDU_LLM_CONCURRENCY", 8)),
+                student_rate=float(os.environ.get("SMARTEDU_LLM_STUDENT_RATE", 10)) / 60
+            ),
+            api_key=os.environ.get("OPENAI_API_KEY")
+        )
         # the newest OpenAI model is "gpt-5" which was released August 7, 2025.
         # do not change this unless explicitly requested by the user
-        self.client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
         self.model = "gpt-5"
         
+        # Suggestions depend only on strengths, weaknesses and learning style, and
+        # starters only on the topic, so identical requests are served from here.
+        # Set SMARTEDU_RESPONSE_CACHE to a file path to keep the cache across restarts.
+        self.response_cache = ResponseCache(
+            max_entries=1024,
+            ttl_seconds=24 * 3600,
+            path=os.environ.get("SMARTEDU_RESPONSE_CACHE")
+        )
+        
+        # Keeps each chat request under a token budget by summarizing older turns
+        self.context = ChatContextManager(
+            budget_tokens=int(os.environ.get("SMARTEDU_CHAT_TOKEN_BUDGET", 3000)),
+            keep_recent=6,
+            summarizer=self._summarize_turns
+        )
+        
+        # Retrieve-first mode: questions the question bank (a QuizContent) already
+        # explains are answered locally when the best match covers at least
+        # answer_threshold of the message, matches min_answer_terms of its words with
+        # a BM25 score of min_answer_score, and the message covers min_question_coverage
+        # of the bank question's own words, i.e. it asks that question rather than
+        # sharing a word with it. Other matches above grounding_threshold are passed
+        # to the model as context
+        self.knowledge = knowledge
+        self.answer_threshold = answer_threshold
+        self.grounding_threshold = grounding_threshold
+        self.min_answer_terms = min_answer_terms
+        self.min_answer_score = min_answer_score
+        self.min_question_coverage = min_question_coverage
+        
         # System message to guide the AI tutor behavior
         self.system_message = {
             "role": "system",
@@ -25,51 +75,145 @@ class AIChatbot:
 Keep your responses conversational, encouraging, and educational. Use emojis sparingly to keep things friendly. If a student asks about something outside of educational topics, gently redirect them back to learning-focused discussions."""
         }
     
-    def chat(self, user_message, chat_history=None):
+    def _build_messages(self, user_message, chat_history=None, conversation_id='default', matches=()):
+        """System message, recent (or summarized) conversation and the new user message"""
+        system_message = self.system_message
+        if matches:
+            notes = "\n".join(
+                f"- {question['question']} Answer: {question['correct_answer']}. {question.get('explanation', '')}"
+                for question, _ in matches
+            )
+            system_message = {
+                "role": "system",
+                "content": f"{system_message['content']}\n\nRelevant notes from the course question bank:\n{notes}"
+            }
+        return self.context.build_messages(system_message, chat_history, user_message, conversation_id)
+    
+    def _retrieve(self, user_message):
+        """Question-bank matches for a message that are relevant enough to use"""
+        if self.knowledge is None:
+            return []
+        return [(question, hit) for question, hit in self.knowledge.search_explanations(user_message)
+                if hit.confidence >= self.grounding_threshold]
+    
+    def _local_answer(self, matches, user_message):
+        """Answer straight from the question bank, or None if no match is close enough"""
+        if not matches:
+            return None
+        question, hit = matches[0]
+        if (hit.confidence < self.answer_threshold or hit.matched_terms < self.min_answer_terms
+                or hit.score < self.min_answer_score or not question.get('explanation')):
+            return None
+        question_terms = set(tokenize(question['question']))
+        if len(question_terms & set(tokenize(user_message))) < self.min_question_coverage * len(question_terms):
+            return None
+        return (
+            f"{question['explanation']}\n\n"
+            f"📘 From the {hit.payload['topic']} question bank: {question['question']} "
+            f"**{question['correct_answer']}**"
+        )
+    
+    def _summarize_turns(self, previous_summary, messages, max_words):
+        """Fold older turns into the running summary, falling back to a local summary"""
+        try:
+            transcript = "\n".join(
+                f"{'Student' if m['role'] == 'user' else 'Tutor'}: {m['content']}" for m in messages
+            )
+            prompt = (
+                f"Summary so far: {previous_summary or '(none)'}\n\n"
+                f"New conversation turns:\n{transcript}\n\n"
+                f"Update the summary in at most {max_words} words. Keep the topics covered, "
+                "what the student understood or struggled with, and any open questions."
+            )
+            response = self.client.complete(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": "You summarize tutoring conversations concisely."},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=int(max_words * 2),
+                temperature=0.3
+            )
+            return response.choices[0].message.content.strip()
+        except Exception:
+            return extractive_summary(previous_summary, messages, max_words)
+    
+    def chat(self, user_message, chat_history=None, conversation_id='default'):
         """
         Generate a response to the user's message
         
         Args:
             user_message (str): The user's message
             chat_history (list): Previous conversation history
+            conversation_id (str): The student's conversation; keys the summary cache and their rate limit
             
         Returns:
             str: AI response
-        """
-        try:
-            # Prepare messages for the API call
-            messages = [self.system_message]
-            
-            # Add previous chat history if available
-            if chat_history:
-                messages.extend(chat_history)
             
-            # Add the current user message
-            messages.append({"role": "user", "content": user_message})
-            
-            # Call OpenAI API
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                max_tokens=500,
-                temperature=0.7
-            )
+        Raises:
+            LLMUnavailableError: If no response could be generated
+        """
+        matches = self._retrieve(user_message)
+        answer = self._local_answer(matches, user_message)
+        if answer is not None:
+            return answer
+        
+        response = self.client.complete(
+            student=conversation_id,
+            model=self.model,
+            messages=self._build_messages(user_message, chat_history, conversation_id, matches),
+            max_tokens=500,
+            temperature=0.7
+        )
+        
+        return response.choices[0].message.content
+    
+    def chat_stream(self, user_message, chat_history=None, conversation_id='default'):
+        """
+        Stream a response to the user's message as it is generated
+        
+        Args:
+            user_message (str): The user's message
+            chat_history (list): Previous conversation history
+            conversation_id (str): The student's conversation; keys the summary cache and their rate limit
             
-            return response.choices[0].message.content
+        Yields:
+            str: Pieces of the AI response, in order
             
-        except Exception as e:
-            return f"I'm sorry, I'm having trouble connecting right now. Please try again in a moment. Error: {str(e)}"
+        Raises:
+            LLMUnavailableError: If the response could not be generated or was cut off
+        """
+        matches = self._retrieve(user_message)
+        answer = self._local_answer(matches, user_message)
+        if answer is not None:
+            yield answer
+            return
+        
+        yield from self.client.stream(
+            student=conversation_id,
+            model=self.model,
+            messages=self._build_messages(user_message, chat_history, conversation_id, matches),
+            max_tokens=500,
+            temperature=0.7
+        )
     
-    def generate_topic_suggestions(self, student_profile=None):
+    def generate_topic_suggestions(self, student_profile=None, refresh=False):
         """
         Generate interesting topic suggestions for the student
         
         Args:
             student_profile (dict): Student's learning profile if available
+            refresh (bool): Ask the model for new suggestions even if some are cached;
+                they then replace the cached ones
             
         Returns:
             list: List of suggested topics for discussion
         """
+        cache_key = f"topics:{profile_signature(student_profile)}"
+        cached = self.response_cache.get(cache_key) if not refresh else None
+        if cached is not None:
+            return list(cached)
+        
         try:
             # Customize suggestions based on student profile
             prompt = "Generate 5 interesting educational topics that a student might want to discuss. "
@@ -96,7 +240,8 @@ Keep your responses conversational, encouraging, and educational. Use emojis spa
             Format as a JSON list of topics only, like: ["Topic 1", "Topic 2", "Topic 3", "Topic 4", "Topic 5"]
             """
             
-            response = self.client.chat.completions.create(
+            response = self.client.complete(
+                lane='background',
                 model=self.model,
                 messages=[
                     {"role": "system", "content": "You are an educational content curator."},
@@ -113,9 +258,15 @@ Keep your responses conversational, encouraging, and educational. Use emojis spa
             
             # Handle different possible JSON structures
             if isinstance(topics_data, list):
-                return topics_data[:5]
+                topics = topics_data[:5]
             elif isinstance(topics_data, dict) and 'topics' in topics_data:
-                return topics_data['topics'][:5]
+                topics = topics_data['topics'][:5]
+            else:
+                topics = None
+            
+            if topics:
+                self.response_cache.set(cache_key, topics)
+                return list(topics)
             else:
                 # Fallback topics if JSON parsing fails
                 return [
@@ -146,6 +297,11 @@ Keep your responses conversational, encouraging, and educational. Use emojis spa
         Returns:
             list: List of conversation starter questions
         """
+        cache_key = f"starters:{topic_signature(topic)}"
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+        
         try:
             prompt = f"""Generate 3 engaging conversation starter questions about "{topic}" that would:
             1. Spark curiosity and interest
@@ -156,7 +312,8 @@ Keep your responses conversational, encouraging, and educational. Use emojis spa
             Format as a JSON list: ["Question 1?", "Question 2?", "Question 3?"]
             """
             
-            response = self.client.chat.completions.create(
+            response = self.client.complete(
+                lane='background',
                 model=self.model,
                 messages=[
                     {"role": "system", "content": "You are an educational conversation facilitator."},
@@ -172,9 +329,15 @@ Keep your responses conversational, encouraging, and educational. Use emojis spa
             
             # Handle different possible JSON structures
             if isinstance(questions_data, list):
-                return questions_data[:3]
+                questions = questions_data[:3]
             elif isinstance(questions_data, dict) and 'questions' in questions_data:
-                return questions_data['questions'][:3]
+                questions = questions_data['questions'][:3]
+            else:
+                questions = None
+            
+            if questions:
+                self.response_cache.set(cache_key, questions)
+                return list(questions)
             else:
                 # Fallback questions
                 return [
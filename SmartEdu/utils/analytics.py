@@ -1,9 +1,7 @@
-import pandas as pd
 import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime, timedelta
-from collections import defaultdict
+from datetime import datetime
+
+from models.catalog import TOPICS
 
 class Analytics:
     def __init__(self):
@@ -16,20 +14,15 @@ class Analytics:
         if not quiz_history:
             return {"error": "No quiz data available"}
         
-        # Convert to DataFrame for easier analysis
-        df = pd.DataFrame([
-            {
-                'timestamp': quiz['timestamp'],
-                'topic': quiz['topic'],
-                'difficulty': quiz['difficulty'],
-                'accuracy': quiz['accuracy'],
-                'total_time': quiz['total_time'],
-                'avg_time_per_question': quiz['avg_time_per_question'],
-                'correct_answers': quiz['correct_answers'],
-                'total_questions': quiz['total_questions']
-            }
-            for quiz in quiz_history
-        ])
+        import pandas as pd
+        
+        # Convert to DataFrame for easier analysis; topics are a categorical on the
+        # catalog's codes, so grouping by topic works on int8 codes
+        fields = ['timestamp', 'accuracy', 'total_time', 'avg_time_per_question',
+                  'correct_answers', 'total_questions']
+        df = pd.DataFrame({field: [quiz[field] for quiz in quiz_history] for field in fields})
+        df['topic'] = TOPICS.categorical(quiz['topic'] for quiz in quiz_history)
+        df['difficulty'] = [quiz['difficulty'] for quiz in quiz_history]
         
         report = {
             'overview': self._generate_overview_stats(df),
@@ -82,13 +75,15 @@ class Analytics:
     
     def _analyze_topic_performance(self, df):
         """Analyze performance by topic"""
-        topic_stats = df.groupby('topic').agg({
+        topic_stats = df.groupby('topic', observed=True).agg({
             'accuracy': ['mean', 'std', 'count'],
             'total_time': 'mean',
             'timestamp': 'max'
         }).round(3)
         
         topic_stats.columns = ['avg_accuracy', 'accuracy_std', 'attempts', 'avg_time', 'last_attempt']
+        # Grouped in catalog order; reported alphabetically
+        topic_stats = topic_stats.loc[sorted(topic_stats.index)]
         
         # Identify strengths and weaknesses
         strengths = topic_stats[topic_stats['avg_accuracy'] > 0.75].index.tolist()
@@ -104,6 +99,8 @@ class Analytics:
     
     def _analyze_time_patterns(self, df):
         """Analyze time-related patterns"""
+        import pandas as pd
+        
         # Convert timestamps to datetime if they're not already
         df['hour'] = pd.to_datetime(df['timestamp']).dt.hour
         df['day_of_week'] = pd.to_datetime(df['timestamp']).dt.day_name()
@@ -197,7 +194,7 @@ class Analytics:
             insights.append("📈 Your performance varies significantly. Try to identify what conditions help you perform best.")
         
         # Topic insights
-        topic_performance = df.groupby('topic')['accuracy'].mean()
+        topic_performance = df.groupby('topic', observed=True)['accuracy'].mean()
         if topic_performance.max() - topic_performance.min() > 0.3:
             insights.append(f"🎯 Large performance gap between topics. Focus on {topic_performance.idxmin()}.")
         
@@ -215,94 +212,172 @@ class Analytics:
         """Generate class-wide analytics for teachers"""
         if not all_user_data:
             return {"error": "No student data available"}
+        return self.merge_class_partials([self.class_partial(all_user_data)])
+    
+    def class_partial(self, all_user_data):
+        """Mergeable class aggregates for one slice of the students.
+        
+        Slices can be computed separately (e.g. one per shard, see
+        utils.sharding) and combined with merge_class_partials; a single slice
+        gives generate_class_analytics' result.
+        """
+        # Collect all quiz data as columns: students and topics are int codes, so
+        # per-student and per-topic aggregates are bincounts rather than groupbys
+        active = {username: user_data['quiz_history'] for username, user_data in all_user_data.items()
+                  if user_data['quiz_history']}
+        partial = {'total_students': len(all_user_data), 'active_students': len(active)}
+        if not active:
+            return partial
+        
+        all_quizzes = [quiz for quiz_history in active.values() for quiz in quiz_history]
+        quiz_counts = np.array([len(quiz_history) for quiz_history in active.values()])
+        student_codes = np.repeat(np.arange(len(active)), quiz_counts)
+        topic_codes = TOPICS.encode(quiz['topic'] for quiz in all_quizzes)
+        accuracy = np.fromiter((quiz['accuracy'] for quiz in all_quizzes), dtype=np.float64,
+                               count=len(all_quizzes))
+        total_time = np.fromiter((quiz['total_time'] for quiz in all_quizzes), dtype=np.float64,
+                                 count=len(all_quizzes))
+        
+        # Student summaries; means of slices rather than a weighted bincount so they
+        # round exactly like pandas' mean, which the at-risk thresholds compare against
+        avg_accuracy = [chunk.mean() for chunk in np.split(accuracy, np.cumsum(quiz_counts)[:-1])]
+        # Distinct (student, topic) pairs per student
+        pairs = np.unique(student_codes * len(TOPICS) + topic_codes)
+        topics_covered = np.bincount(pairs // len(TOPICS), minlength=len(active))
+        student_summaries = {
+            username: {
+                'total_quizzes': len(quiz_history),
+                'avg_accuracy': avg_accuracy[i],
+                'last_activity': max(quiz['timestamp'] for quiz in quiz_history),
+                'topics_covered': int(topics_covered[i])
+            }
+            for i, (username, quiz_history) in enumerate(active.items())
+        }
+        
+        # Per topic: count, mean and sum of squared deviations, which merge exactly
+        attempts = np.bincount(topic_codes, minlength=len(TOPICS))
+        practised = np.flatnonzero(attempts)
+        topic_mean = np.bincount(topic_codes, weights=accuracy, minlength=len(TOPICS))[practised] / attempts[practised]
+        mean_by_code = np.zeros(len(TOPICS))
+        mean_by_code[practised] = topic_mean
+        topic_m2 = np.bincount(topic_codes, weights=(accuracy - mean_by_code[topic_codes]) ** 2,
+                               minlength=len(TOPICS))[practised]
+        topic_time = np.bincount(topic_codes, weights=total_time, minlength=len(TOPICS))[practised]
         
-        # Collect all quiz data
-        all_quizzes = []
-        student_summaries = {}
-        
-        for username, user_data in all_user_data.items():
-            quiz_history = user_data['quiz_history']
-            if quiz_history:
-                for quiz in quiz_history:
-                    quiz_copy = quiz.copy()
-                    quiz_copy['student'] = username
-                    all_quizzes.append(quiz_copy)
-                
-                # Student summary
-                df_student = pd.DataFrame(quiz_history)
-                student_summaries[username] = {
-                    'total_quizzes': len(quiz_history),
-                    'avg_accuracy': df_student['accuracy'].mean(),
-                    'last_activity': max(quiz['timestamp'] for quiz in quiz_history),
-                    'topics_covered': df_student['topic'].nunique()
-                }
-        
-        if not all_quizzes:
+        # Accuracies take few distinct values, so value counts give exact quartiles
+        accuracy_values, accuracy_counts = np.unique(accuracy, return_counts=True)
+        
+        current_time = datetime.now()
+        days_since_last = [(current_time - summary['last_activity']).days for summary in student_summaries.values()]
+        
+        partial.update({
+            'total_quizzes': len(all_quizzes),
+            'accuracy_sum': accuracy.sum(),
+            'total_study_time': total_time.sum(),
+            'accuracy_values': accuracy_values,
+            'accuracy_counts': accuracy_counts,
+            'topics': TOPICS.decode(practised),
+            'topic_attempts': attempts[practised],
+            'topic_mean': topic_mean,
+            'topic_m2': topic_m2,
+            'topic_time': topic_time,
+            'days_since_last_sum': sum(days_since_last),
+            'highly_engaged': sum(1 for summary in student_summaries.values() if summary['total_quizzes'] >= 5),
+            'inactive_students': sum(1 for days in days_since_last if days > 7),
+            'at_risk_students': self._identify_at_risk_students(student_summaries, all_user_data)
+        })
+        return partial
+    
+    def merge_class_partials(self, partials):
+        """Combine class_partial results into the generate_class_analytics report"""
+        active = [partial for partial in partials if partial['active_students']]
+        if not active:
             return {"error": "No quiz data available"}
         
-        df_all = pd.DataFrame(all_quizzes)
+        total_quizzes = sum(partial['total_quizzes'] for partial in active)
+        active_students = sum(partial['active_students'] for partial in active)
         
-        class_analytics = {
+        return {
             'overview': {
-                'total_students': len(all_user_data),
-                'active_students': len([u for u, d in all_user_data.items() if d['quiz_history']]),
-                'total_quizzes': len(all_quizzes),
-                'avg_class_accuracy': df_all['accuracy'].mean(),
-                'total_study_time': df_all['total_time'].sum()
+                'total_students': sum(partial['total_students'] for partial in partials),
+                'active_students': active_students,
+                'total_quizzes': total_quizzes,
+                'avg_class_accuracy': sum(partial['accuracy_sum'] for partial in active) / total_quizzes,
+                'total_study_time': sum(partial['total_study_time'] for partial in active)
             },
-            'performance_distribution': self._analyze_performance_distribution(df_all),
-            'topic_analytics': self._analyze_class_topic_performance(df_all),
-            'engagement_metrics': self._analyze_engagement_metrics(df_all, student_summaries),
-            'at_risk_students': self._identify_at_risk_students(student_summaries, all_user_data)
+            'performance_distribution': self._merge_performance_distribution(active),
+            'topic_analytics': self._merge_topic_performance(active),
+            'engagement_metrics': {
+                'avg_quizzes_per_student': total_quizzes / active_students,
+                'avg_days_since_last_activity': sum(p['days_since_last_sum'] for p in active) / active_students,
+                'highly_engaged': sum(partial['highly_engaged'] for partial in active),
+                'inactive_students': sum(partial['inactive_students'] for partial in active)
+            },
+            'at_risk_students': [student for partial in active for student in partial['at_risk_students']]
         }
-        
-        return class_analytics
     
-    def _analyze_performance_distribution(self, df):
+    def _merge_performance_distribution(self, partials):
         """Analyze how student performance is distributed"""
+        values, inverse = np.unique(np.concatenate([p['accuracy_values'] for p in partials]), return_inverse=True)
+        counts = np.bincount(inverse, weights=np.concatenate([p['accuracy_counts'] for p in partials])).astype(np.int64)
+        
+        def count(low, high):
+            return int(counts[(values > low) & (values <= high)].sum())
+        
         return {
-            'accuracy_quartiles': df['accuracy'].quantile([0.25, 0.5, 0.75]).to_dict(),
+            'accuracy_quartiles': {q: self._quantile_from_counts(values, counts, q) for q in (0.25, 0.5, 0.75)},
             'performance_categories': {
-                'excellent': (df['accuracy'] > 0.85).sum(),
-                'good': ((df['accuracy'] > 0.7) & (df['accuracy'] <= 0.85)).sum(),
-                'needs_improvement': ((df['accuracy'] > 0.5) & (df['accuracy'] <= 0.7)).sum(),
-                'struggling': (df['accuracy'] <= 0.5).sum()
+                'excellent': count(0.85, np.inf),
+                'good': count(0.7, 0.85),
+                'needs_improvement': count(0.5, 0.7),
+                'struggling': count(-np.inf, 0.5)
             }
         }
     
-    def _analyze_class_topic_performance(self, df):
-        """Analyze class performance by topic"""
-        topic_stats = df.groupby('topic').agg({
-            'accuracy': ['mean', 'std', 'count'],
-            'total_time': 'mean'
-        }).round(3)
-        
-        topic_stats.columns = ['avg_accuracy', 'accuracy_std', 'total_attempts', 'avg_time']
-        
-        return {
-            'topic_performance': topic_stats.to_dict('index'),
-            'most_challenging': topic_stats['avg_accuracy'].idxmin() if not topic_stats.empty else None,
-            'easiest': topic_stats['avg_accuracy'].idxmax() if not topic_stats.empty else None,
-            'most_popular': topic_stats['total_attempts'].idxmax() if not topic_stats.empty else None
-        }
+    @staticmethod
+    def _quantile_from_counts(values, counts, q):
+        """Linearly interpolated quantile (numpy/pandas' default) of sorted values with repeat counts"""
+        ends = np.cumsum(counts)
+        index = q * (ends[-1] - 1)
+        below = int(np.floor(index))
+        above = min(below + 1, int(ends[-1]) - 1)
+        a = values[np.searchsorted(ends, below, side='right')]
+        b = values[np.searchsorted(ends, above, side='right')]
+        t = index - below
+        # numpy's lerp, including its switch of end point at t = 0.5
+        return b - (b - a) * (1 - t) if t >= 0.5 else a + (b - a) * t
     
-    def _analyze_engagement_metrics(self, df, student_summaries):
-        """Analyze student engagement patterns"""
-        # Calculate engagement metrics
-        avg_quizzes_per_student = df.groupby('student').size().mean()
-        
-        # Activity recency
-        current_time = datetime.now()
-        recent_activity = []
-        for student, summary in student_summaries.items():
-            days_since_last = (current_time - summary['last_activity']).days
-            recent_activity.append(days_since_last)
+    def _merge_topic_performance(self, partials):
+        """Analyze class performance by topic"""
+        merged = {}
+        for partial in partials:
+            for topic, n, mean, m2, time_sum in zip(partial['topics'], partial['topic_attempts'], partial['topic_mean'],
+                                                    partial['topic_m2'], partial['topic_time']):
+                if topic not in merged:
+                    merged[topic] = [int(n), mean, m2, time_sum]
+                    continue
+                # Chan et al.'s pairwise update of count, mean and squared deviations
+                count, total_mean, total_m2, total_time = merged[topic]
+                delta = mean - total_mean
+                combined = count + n
+                merged[topic] = [combined, total_mean + delta * n / combined,
+                                 total_m2 + m2 + delta ** 2 * count * n / combined, total_time + time_sum]
+        
+        topic_stats = {}
+        for topic in sorted(merged):
+            count, mean, m2, time_sum = merged[topic]
+            topic_stats[topic] = {
+                'avg_accuracy': round(float(mean), 3),
+                'accuracy_std': round(float(np.sqrt(m2 / (count - 1))), 3) if count > 1 else float('nan'),
+                'total_attempts': count,
+                'avg_time': round(float(time_sum / count), 3)
+            }
         
         return {
-            'avg_quizzes_per_student': avg_quizzes_per_student,
-            'avg_days_since_last_activity': np.mean(recent_activity) if recent_activity else 0,
-            'highly_engaged': len([s for s, summ in student_summaries.items() if summ['total_quizzes'] >= 5]),
-            'inactive_students': len([days for days in recent_activity if days > 7])
+            'topic_performance': topic_stats,
+            'most_challenging': min(topic_stats, key=lambda t: topic_stats[t]['avg_accuracy']),
+            'easiest': max(topic_stats, key=lambda t: topic_stats[t]['avg_accuracy']),
+            'most_popular': max(topic_stats, key=lambda t: topic_stats[t]['total_attempts'])
         }
     
     def _identify_at_risk_students(self, student_summaries, all_user_data):
@@ -0,0 +1,361 @@
+"""Streaming bulk import/export of student quiz histories.
+
+Histories are moved as two flat tables written side by side in a directory:
+
+    quizzes.<ext>   one row per quiz   (student, quiz_index, timestamp, topic, ...)
+    answers.<ext>   one row per answer (student, quiz_index, question_id, answer, ...)
+
+Supported formats are 'csv', 'jsonl' and 'parquet' (needs pyarrow). Rows are
+streamed in batches, so memory use is bounded by the batch size rather than
+the number of students or quizzes. Imports write straight into any store with
+the utils.store interface (StudentRegistry, SQLiteStore). An import checks
+the whole directory before it writes anything, so a bad row leaves the store
+untouched and the import can simply be run again once the file is fixed.
+"""
+import csv
+import json
+import os
+from datetime import datetime
+from itertools import groupby
+
+from models.catalog import DIFFICULTIES, TOPICS
+from models.compact_answers import CompactAnswers
+
+QUIZ_SCHEMA = {
+    'student': str,
+    'quiz_index': int,
+    'timestamp': datetime,
+    'topic': str,
+    'difficulty': str,
+    'total_questions': int,
+    'correct_answers': int,
+    'accuracy': float,
+    'total_time': float,
+    'avg_time_per_question': float,
+}
+
+ANSWER_SCHEMA = {
+    'student': str,
+    'quiz_index': int,
+    'question_id': int,
+    'answer': str,
+    'correct': bool,
+    'time_taken': float,
+    'bank_question_id': int,
+}
+
+# Columns that older exports do not have; they are read as None
+OPTIONAL_FIELDS = {'bank_question_id'}
+
+FORMATS = ('csv', 'jsonl', 'parquet')
+
+DEFAULT_BATCH_SIZE = 50000
+
+
+class SchemaError(ValueError):
+    """Raised when an imported row does not match the expected schema"""
+
+
+# Row conversion
+
+def quiz_rows(student, quiz_history):
+    """Flatten one student's history into quiz rows and answer rows"""
+    quizzes, answers = [], []
+    for quiz_index, quiz in enumerate(quiz_history):
+        quizzes.append({'student': student, 'quiz_index': quiz_index,
+                        **{field: quiz[field] for field in QUIZ_SCHEMA if field in quiz}})
+        quiz_answers = quiz.get('answers', [])
+        # Only CompactAnswers know which bank question each answer was for
+        bank_ids = quiz_answers.question_ids.tolist() if isinstance(quiz_answers, CompactAnswers) else None
+        for position, answer in enumerate(quiz_answers):
+            answers.append({'student': student, 'quiz_index': quiz_index,
+                            **{field: answer[field] for field in ANSWER_SCHEMA if field in answer},
+                            'bank_question_id': bank_ids[position] if bank_ids else None})
+    return quizzes, answers
+
+
+def validate_row(row, schema, line):
+    """Coerce a row to the schema's types, raising SchemaError on bad data.
+
+    Topics and difficulties must be in the catalog (models.catalog): a quiz
+    stored under an unknown label breaks adaptation for that student.
+    """
+    missing = [field for field in schema if field not in OPTIONAL_FIELDS and row.get(field) in (None, '')]
+    if missing:
+        raise SchemaError(f"Row {line}: missing {', '.join(missing)}")
+
+    clean = {}
+    for field, field_type in schema.items():
+        value = row.get(field)
+        if field in OPTIONAL_FIELDS and value in (None, ''):
+            clean[field] = None
+            continue
+        try:
+            if field_type is datetime:
+                clean[field] = value if isinstance(value, datetime) else datetime.fromisoformat(value)
+            elif field_type is bool:
+                clean[field] = value if isinstance(value, bool) else str(value).strip().lower() in ('true', '1')
+            else:
+                clean[field] = field_type(value)
+        except (TypeError, ValueError):
+            raise SchemaError(f"Row {line}: {field}={value!r} is not a valid {field_type.__name__}")
+
+    if 'accuracy' in clean and not 0 <= clean['accuracy'] <= 1:
+        raise SchemaError(f"Row {line}: accuracy must be between 0 and 1")
+    if 'difficulty' in clean and clean['difficulty'] not in DIFFICULTIES:
+        raise SchemaError(f"Row {line}: unknown difficulty {clean['difficulty']!r}; "
+                          f"expected one of {', '.join(DIFFICULTIES)}")
+    if 'topic' in clean and clean['topic'] not in TOPICS.values:
+        raise SchemaError(f"Row {line}: unknown topic {clean['topic']!r}; expected one of {', '.join(TOPICS)}")
+    return clean
+
+
+# Writers
+
+class _CSVWriter:
+    def __init__(self, path, schema):
+        self._file = open(path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.DictWriter(self._file, fieldnames=list(schema), extrasaction='ignore')
+        self._writer.writeheader()
+
+    def write(self, rows):
+        for row in rows:
+            if isinstance(row.get('timestamp'), datetime):
+                row = dict(row, timestamp=row['timestamp'].isoformat())
+            self._writer.writerow(row)
+
+    def close(self):
+        self._file.close()
+
+
+class _JSONLWriter:
+    def __init__(self, path, schema):
+        self._file = open(path, 'w', encoding='utf-8')
+        self._fields = list(schema)
+
+    def write(self, rows):
+        for row in rows:
+            record = {field: row.get(field) for field in self._fields}
+            self._file.write(json.dumps(record, default=_json_default) + '\n')
+
+    def close(self):
+        self._file.close()
+
+
+class _ParquetWriter:
+    def __init__(self, path, schema, compression='zstd'):
+        pa, pq = _require_pyarrow()
+        arrow_types = {str: pa.string(), int: pa.int64(), float: pa.float64(),
+                       bool: pa.bool_(), datetime: pa.timestamp('us')}
+        self._pa = pa
+        self._schema = pa.schema([(field, arrow_types[field_type]) for field, field_type in schema.items()])
+        self._writer = pq.ParquetWriter(path, self._schema, compression=compression)
+
+    def write(self, rows):
+        if rows:
+            self._writer.write_table(self._pa.Table.from_pylist(rows, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+_WRITERS = {'csv': _CSVWriter, 'jsonl': _JSONLWriter, 'parquet': _ParquetWriter}
+
+
+# Readers (each yields lists of raw rows)
+
+def _read_csv(path, batch_size):
+    with open(path, newline='', encoding='utf-8') as f:
+        batch = []
+        for row in csv.DictReader(f):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def _read_jsonl(path, batch_size):
+    with open(path, encoding='utf-8') as f:
+        batch = []
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                batch.append(json.loads(line))
+            except json.JSONDecodeError:
+                raise SchemaError(f"Row {line_number}: not valid JSON")
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def _read_parquet(path, batch_size):
+    _, pq = _require_pyarrow()
+    for record_batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+        yield record_batch.to_pylist()
+
+
+_READERS = {'csv': _read_csv, 'jsonl': _read_jsonl, 'parquet': _read_parquet}
+
+
+# Public API
+
+def export_histories(store, out_dir, fmt='parquet', batch_size=DEFAULT_BATCH_SIZE, students=None):
+    """Stream every student's quiz history from a store into out_dir.
+
+    Returns:
+        dict: number of students, quizzes and answers written
+    """
+    _check_format(fmt)
+    os.makedirs(out_dir, exist_ok=True)
+    quiz_writer = _WRITERS[fmt](_table_path(out_dir, 'quizzes', fmt), QUIZ_SCHEMA)
+    answer_writer = _WRITERS[fmt](_table_path(out_dir, 'answers', fmt), ANSWER_SCHEMA)
+
+    counts = {'students': 0, 'quizzes': 0, 'answers': 0}
+    quiz_batch, answer_batch = [], []
+    try:
+        for student in (students if students is not None else store.list_students()):
+            quizzes, answers = quiz_rows(student, store.get_quiz_history(student))
+            quiz_batch.extend(quizzes)
+            answer_batch.extend(answers)
+            counts['students'] += 1
+            counts['quizzes'] += len(quizzes)
+            counts['answers'] += len(answers)
+
+            if len(quiz_batch) >= batch_size or len(answer_batch) >= batch_size:
+                quiz_writer.write(quiz_batch)
+                answer_writer.write(answer_batch)
+                quiz_batch, answer_batch = [], []
+
+        quiz_writer.write(quiz_batch)
+        answer_writer.write(answer_batch)
+    finally:
+        quiz_writer.close()
+        answer_writer.close()
+
+    return counts
+
+
+def iter_quiz_results(in_dir, fmt='parquet', batch_size=DEFAULT_BATCH_SIZE, quiz_content=None):
+    """Yield (student, quiz_result) pairs from an exported directory.
+
+    The answers table is optional. When present its rows must be grouped in
+    the same (student, quiz_index) order as the quizzes table, which is how
+    export_histories writes them; they are merge-joined without buffering.
+    Answers that carry bank question ids come back as CompactAnswers, decoded
+    with quiz_content (by default the built-in question bank).
+    """
+    _check_format(fmt)
+    if quiz_content is None:
+        from data.quiz_content import QuizContent
+
+        quiz_content = QuizContent()
+    read = _READERS[fmt]
+    answers_path = _table_path(in_dir, 'answers', fmt)
+    answer_rows = _iter_rows(read(answers_path, batch_size), ANSWER_SCHEMA) if os.path.exists(answers_path) else iter(())
+    pending = next(answer_rows, None)
+
+    for line, quiz in _iter_rows(read(_table_path(in_dir, 'quizzes', fmt), batch_size), QUIZ_SCHEMA):
+        key = (quiz['student'], quiz['quiz_index'])
+        answers, bank_ids = [], {}
+        while pending is not None and (pending[1]['student'], pending[1]['quiz_index']) == key:
+            answer = pending[1]
+            answers.append({field: answer[field] for field in ('question_id', 'answer', 'correct', 'time_taken')})
+            bank_ids[answer['question_id']] = answer['bank_question_id']
+            pending = next(answer_rows, None)
+
+        student = quiz.pop('student')
+        quiz.pop('quiz_index')
+        quiz['answers'] = _pack_answers(answers, bank_ids, quiz_content, line) if answers else answers
+        yield student, quiz
+
+    if pending is not None:
+        raise SchemaError(
+            f"Answer for {pending[1]['student']!r} quiz {pending[1]['quiz_index']} does not match "
+            "any quiz; answers must follow the order of the quizzes table"
+        )
+
+
+def import_histories(store, in_dir, fmt='parquet', batch_size=DEFAULT_BATCH_SIZE, quiz_content=None):
+    """Stream an exported directory into a store, appending to existing histories.
+
+    The files are read twice: once to validate every row, then to write. A
+    SchemaError therefore leaves the store as it was.
+
+    Returns:
+        dict: number of students and quizzes imported
+    """
+    if quiz_content is None:
+        from data.quiz_content import QuizContent
+
+        quiz_content = QuizContent()
+    for _ in iter_quiz_results(in_dir, fmt, batch_size, quiz_content):
+        pass
+
+    counts = {'students': 0, 'quizzes': 0}
+    for student, group in groupby(iter_quiz_results(in_dir, fmt, batch_size, quiz_content), key=lambda pair: pair[0]):
+        store.ensure_user(student)
+        counts['students'] += 1
+        batch = []
+        for _, quiz_result in group:
+            batch.append(quiz_result)
+            if len(batch) >= batch_size:
+                store.append_quizzes(student, batch)
+                counts['quizzes'] += len(batch)
+                batch = []
+        if batch:
+            store.append_quizzes(student, batch)
+            counts['quizzes'] += len(batch)
+    return counts
+
+
+def _pack_answers(answers, bank_ids, quiz_content, line):
+    """CompactAnswers for one quiz's answers, or the dicts if the export has no bank ids"""
+    if None in bank_ids.values():
+        return answers
+    try:
+        return CompactAnswers.from_dicts(answers, bank_ids, quiz_content)
+    except KeyError as e:
+        raise SchemaError(f"Quiz row {line}: unknown bank question {e.args[0]!r}")
+    except ValueError as e:
+        raise SchemaError(f"Quiz row {line}: {e}")
+
+
+def _iter_rows(batches, schema):
+    """Yield (line, clean row) pairs"""
+    line = 0
+    for batch in batches:
+        for row in batch:
+            line += 1
+            yield line, validate_row(row, schema, line)
+
+
+def _table_path(directory, table, fmt):
+    return os.path.join(directory, f"{table}.{fmt}")
+
+
+def _check_format(fmt):
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format {fmt!r}; expected one of {', '.join(FORMATS)}")
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet import/export needs pyarrow: pip install pyarrow")
+    return pa, pq
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if hasattr(value, 'item'):
+        # numpy scalars
+        return value.item()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
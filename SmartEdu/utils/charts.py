@@ -0,0 +1,110 @@
+import numpy as np
+
+# Roughly the pixel width of a dashboard column; more points than this
+# cannot be told apart on screen
+DEFAULT_MAX_POINTS = 500
+
+# Above this many points the trace is drawn with WebGL (Scattergl)
+WEBGL_THRESHOLD = 1000
+
+
+def lttb_indices(x, y, threshold):
+    """Pick indices of the points to keep using Largest-Triangle-Three-Buckets"""
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+
+    # The first and last points are always kept; the rest are split into buckets
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+
+        # Average of the next bucket (or the last point for the final bucket)
+        next_start = end
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        # Keep the point forming the largest triangle with the previous pick
+        # and the next bucket's average
+        areas = np.abs(
+            (x[previous] - avg_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (avg_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        indices[i + 1] = previous
+
+    return indices
+
+
+def downsample_series(x, y, max_points=DEFAULT_MAX_POINTS):
+    """Downsample an (x, y) series for plotting, keeping its visual shape"""
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=np.float64)
+    if len(y) <= max_points:
+        return x, y
+
+    # Dates are bucketed on their numeric value
+    if np.issubdtype(x.dtype, np.datetime64):
+        numeric_x = x.astype('datetime64[ns]').astype(np.int64)
+    elif x.dtype == object:
+        numeric_x = np.arange(len(x))
+    else:
+        numeric_x = x
+
+    keep = lttb_indices(numeric_x, y, max_points)
+    return x[keep], y[keep]
+
+
+def accuracy_figure(accuracies, x=None, title="Accuracy Over Time", height=None,
+                    max_points=DEFAULT_MAX_POINTS, webgl_threshold=WEBGL_THRESHOLD):
+    """Build a plotly figure of an accuracy series that stays small for long histories"""
+    import plotly.graph_objects as go
+
+    total_points = len(accuracies)
+    if x is None:
+        x = np.arange(total_points)
+    else:
+        x = np.asarray(x, dtype='datetime64[ns]') if _is_datetime_list(x) else np.asarray(x)
+
+    plot_x, plot_y = downsample_series(x, accuracies, max_points)
+
+    # Markers only help while individual quizzes can still be seen
+    mode = 'lines+markers' if len(plot_y) <= 100 else 'lines'
+    trace_type = go.Scattergl if total_points > webgl_threshold else go.Scatter
+
+    fig = go.Figure()
+    fig.add_trace(trace_type(
+        x=plot_x,
+        y=plot_y,
+        mode=mode,
+        name='Accuracy',
+        line=dict(color='#1f77b4')
+    ))
+    fig.update_layout(
+        title=title,
+        yaxis_title="Accuracy",
+        yaxis=dict(range=[0, 1], tickformat='.0%')
+    )
+    if height:
+        fig.update_layout(height=height)
+    if len(plot_y) < total_points:
+        fig.add_annotation(
+            text=f"Showing {len(plot_y)} of {total_points} quizzes",
+            xref='paper', yref='paper', x=1, y=1.08,
+            showarrow=False, font=dict(size=10, color='gray')
+        )
+
+    return fig
+
+
+def _is_datetime_list(values):
+    return len(values) > 0 and hasattr(values[0], 'year')
@@ -0,0 +1,140 @@
+import hashlib
+import math
+import re
+
+from utils.response_cache import ResponseCache
+
+# Tokens every chat message costs on top of its content (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Calibrated against the cl100k/o200k tokenizers on English tutoring text:
+# about 4 characters per token, and never fewer tokens than ~0.75 per word
+CHARS_PER_TOKEN = 4.0
+TOKENS_PER_WORD = 0.75
+
+
+class TokenCounter:
+    """Counts tokens locally, using tiktoken when installed and an estimate otherwise"""
+
+    def __init__(self, model="gpt-5"):
+        self.model = model
+        self._encoding = None
+        self._encoding_loaded = False
+
+    @property
+    def encoding(self):
+        if not self._encoding_loaded:
+            self._encoding_loaded = True
+            try:
+                import tiktoken
+                try:
+                    self._encoding = tiktoken.encoding_for_model(self.model)
+                except KeyError:
+                    self._encoding = tiktoken.get_encoding("o200k_base")
+            except ImportError:
+                self._encoding = None
+        return self._encoding
+
+    def count(self, text):
+        if not text:
+            return 0
+        if self.encoding is not None:
+            return len(self.encoding.encode(text))
+        words = len(text.split())
+        return max(math.ceil(len(text) / CHARS_PER_TOKEN), math.ceil(words * TOKENS_PER_WORD))
+
+    def count_message(self, message):
+        return self.count(message['content']) + MESSAGE_OVERHEAD_TOKENS
+
+    def count_messages(self, messages):
+        return sum(self.count_message(m) for m in messages)
+
+
+def extractive_summary(previous_summary, messages, max_words=150):
+    """Local summary: the first sentence of each turn, trimmed to max_words"""
+    points = [previous_summary] if previous_summary else []
+    for message in messages:
+        first_sentence = re.split(r'(?<=[.!?])\s', message['content'].strip(), maxsplit=1)[0]
+        speaker = "Student" if message['role'] == 'user' else "Tutor"
+        points.append(f"{speaker}: {first_sentence}")
+
+    words = " ".join(points).split()
+    if len(words) > max_words:
+        # Keep the most recent points; older ones are already the least relevant
+        words = ["..."] + words[-max_words:]
+    return " ".join(words)
+
+
+class ChatContextManager:
+    """Keeps the prompt for a conversation under a token budget.
+
+    Recent turns are sent verbatim. Once the conversation outgrows the budget,
+    older turns are folded into a running summary that is cached per
+    conversation, so each turn is summarized once rather than on every
+    request. The verbatim window then grows again until the next fold.
+    """
+
+    def __init__(self, budget_tokens=3000, keep_recent=6, summary_max_words=150,
+                 summarizer=None, token_counter=None):
+        self.budget_tokens = budget_tokens
+        self.keep_recent = keep_recent
+        self.summary_max_words = summary_max_words
+        # summarizer(previous_summary, messages, max_words) -> str
+        self.summarizer = summarizer or extractive_summary
+        self.tokens = token_counter or TokenCounter()
+        # conversation_id -> (summarized_count, prefix_fingerprint, summary)
+        self._summaries = ResponseCache(max_entries=2048, ttl_seconds=24 * 3600)
+
+    def build_messages(self, system_message, chat_history, user_message, conversation_id='default'):
+        """Messages to send: system, optional summary, recent turns and the new message"""
+        chat_history = list(chat_history or [])
+        new_message = {"role": "user", "content": user_message}
+        fixed_tokens = self.tokens.count_message(system_message) + self.tokens.count_message(new_message)
+
+        summarized_count, summary = self._cached_summary(conversation_id, chat_history)
+        recent = chat_history[summarized_count:]
+
+        if fixed_tokens + self._summary_tokens(summary) + self.tokens.count_messages(recent) > self.budget_tokens:
+            # Fold everything but the last keep_recent turns, and more if those alone
+            # still do not fit
+            cut = max(summarized_count, len(chat_history) - self.keep_recent)
+            summary_budget = self.summary_max_words / TOKENS_PER_WORD
+            while cut < len(chat_history) and (
+                fixed_tokens + summary_budget + self.tokens.count_messages(chat_history[cut:]) > self.budget_tokens
+            ):
+                cut += 1
+
+            summary = self.summarizer(summary, chat_history[summarized_count:cut], self.summary_max_words)
+            summarized_count = cut
+            self._summaries.set(conversation_id, (cut, _fingerprint(chat_history[:cut]), summary))
+            recent = chat_history[cut:]
+
+        messages = [system_message]
+        if summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation: {summary}"})
+        messages.extend(recent)
+        messages.append(new_message)
+        return messages
+
+    def _cached_summary(self, conversation_id, chat_history):
+        cached = self._summaries.get(conversation_id)
+        if cached is None:
+            return 0, ''
+        summarized_count, fingerprint, summary = cached
+        # The history was cleared or edited since the summary was made
+        if summarized_count > len(chat_history) or _fingerprint(chat_history[:summarized_count]) != fingerprint:
+            return 0, ''
+        return summarized_count, summary
+
+    def _summary_tokens(self, summary):
+        return self.tokens.count(summary) + MESSAGE_OVERHEAD_TOKENS if summary else 0
+
+
+def _fingerprint(messages):
+    digest = hashlib.blake2b(digest_size=16)
+    for message in messages:
+        digest.update(message['role'].encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(message['content'].encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
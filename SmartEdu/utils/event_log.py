@@ -0,0 +1,363 @@
+"""Append-only log of answer and quiz-finished events, with snapshots and replay.
+
+Every answer a student records and every quiz they finish is appended to one
+binary file as a length-prefixed record:
+
+    <u4 payload length> <u4 crc32 of kind + payload> <u1 kind> <payload>
+
+Quiz payloads carry the scored quiz_history entry, with its answers in the
+8-byte CompactAnswers encoding. A record torn by a crash fails its length or
+checksum and is cut off when the log is reopened.
+
+EventJournal keeps derived state (histories, review schedule, mastery) in
+step with the log and snapshots it every `snapshot_every` quizzes, so a
+restart loads the latest snapshot and replays only the events after it:
+
+    journal = EventJournal('var/events', LearningState(registry, scheduler, tracer), quiz_content)
+    journal.recover()
+    journal.record_quiz('alice', quiz_result)
+
+New derived indexes can be backfilled by streaming the log:
+
+    for event in journal.log.read(kinds=(QUIZ,)):
+        index.add(event.student, event.data)
+"""
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+from collections import namedtuple
+from datetime import datetime
+
+from models.catalog import DIFFICULTIES
+from models.compact_answers import CompactAnswers
+
+ANSWER = 1
+QUIZ = 2
+
+_HEADER = struct.Struct('<IIB')
+# timestamp, question id, position, option index, correct, time taken, student name length
+_ANSWER = struct.Struct('<diBB?fH')
+# timestamp, accuracy, total time, avg time per question, total questions,
+# correct answers, difficulty code, student name length, topic length
+_QUIZ = struct.Struct('<ddddHHBHH')
+
+# offset and end are byte positions of the record in the log
+Event = namedtuple('Event', ['kind', 'student', 'data', 'offset', 'end'])
+
+
+class CorruptLogError(ValueError):
+    """Raised when a log cannot be lined up with the snapshot taken from it"""
+
+
+def encode_answer(student, question_id, position, option, correct, time_taken, timestamp):
+    name = student.encode('utf-8')
+    return _ANSWER.pack(timestamp, question_id, position, option, correct, time_taken, len(name)) + name
+
+
+def encode_quiz(student, quiz):
+    """Payload for a quiz_history entry; its answers must be CompactAnswers"""
+    answers = quiz['answers']
+    if not isinstance(answers, CompactAnswers):
+        raise TypeError("Only quizzes with CompactAnswers can be logged")
+    name = student.encode('utf-8')
+    topic = quiz['topic'].encode('utf-8')
+    return b''.join([
+        _QUIZ.pack(quiz['timestamp'].timestamp(), quiz['accuracy'], quiz['total_time'],
+                   quiz['avg_time_per_question'], quiz['total_questions'], quiz['correct_answers'],
+                   DIFFICULTIES.code(quiz['difficulty']), len(name), len(topic)),
+        name, topic, answers.data
+    ])
+
+
+def decode_event(kind, payload, quiz_content):
+    """(student, data) of a record: an answer dict, or a quiz_history entry"""
+    if kind == ANSWER:
+        timestamp, question_id, position, option, correct, time_taken, name_length = _ANSWER.unpack_from(payload)
+        start = _ANSWER.size
+        return payload[start:start + name_length].decode('utf-8'), {
+            'timestamp': timestamp,
+            'question_id': question_id,
+            'position': position,
+            'option': option,
+            'correct': correct,
+            'time_taken': time_taken
+        }
+    if kind == QUIZ:
+        (timestamp, accuracy, total_time, avg_time, total_questions, correct_answers,
+         difficulty, name_length, topic_length) = _QUIZ.unpack_from(payload)
+        name_end = _QUIZ.size + name_length
+        topic_end = name_end + topic_length
+        return payload[_QUIZ.size:name_end].decode('utf-8'), {
+            'timestamp': datetime.fromtimestamp(timestamp),
+            'topic': payload[name_end:topic_end].decode('utf-8'),
+            'difficulty': DIFFICULTIES.value(difficulty),
+            'total_questions': total_questions,
+            'correct_answers': correct_answers,
+            'accuracy': accuracy,
+            'total_time': total_time,
+            'avg_time_per_question': avg_time,
+            'answers': CompactAnswers(payload[topic_end:], quiz_content)
+        }
+    raise CorruptLogError(f"Unknown event kind {kind}")
+
+
+def frame(kind, payload):
+    return _HEADER.pack(len(payload), zlib.crc32(payload, zlib.crc32(bytes((kind,)))), kind) + payload
+
+
+def iter_frames(buffer, start=0, end=None):
+    """(kind, payload, offset, end) for each intact record; stops at the first torn or corrupt one"""
+    end = len(buffer) if end is None else end
+    offset = start
+    while offset + _HEADER.size <= end:
+        length, crc, kind = _HEADER.unpack_from(buffer, offset)
+        body = offset + _HEADER.size
+        if body + length > end:
+            return
+        payload = bytes(buffer[body:body + length])
+        if zlib.crc32(payload, zlib.crc32(bytes((kind,)))) != crc:
+            return
+        yield kind, payload, offset, body + length
+        offset = body + length
+
+
+class EventLog:
+    """Append-only event file; thread-safe for appends within one process.
+
+    Opening scans the records after `valid_from` (a record boundary, e.g. a
+    snapshot's offset) and truncates anything torn after the last intact one.
+    With sync=True every append is fsynced, trading throughput for not losing
+    the last events on power loss (a process crash loses nothing either way).
+    """
+
+    def __init__(self, path, quiz_content=None, sync=False, valid_from=0):
+        self.path = path
+        self.quiz_content = quiz_content
+        self.sync = sync
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'ab')
+        self.size = self._recover(valid_from)
+
+    def _recover(self, valid_from):
+        size = os.fstat(self._file.fileno()).st_size
+        if valid_from > size:
+            raise CorruptLogError(f"{self.path} has {size} bytes, fewer than the snapshot's {valid_from}")
+        end = valid_from
+        if size > valid_from:
+            with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as buffer:
+                for _, _, _, end in iter_frames(buffer, valid_from, size):
+                    pass
+        if end < size:
+            # A torn write from a crash; later appends must start on a record boundary
+            self._file.truncate(end)
+        return end
+
+    def append_answer(self, student, question_id, position, option, correct, time_taken, timestamp=None):
+        timestamp = timestamp if timestamp is not None else time.time()
+        return self._append(ANSWER, encode_answer(student, question_id, position, option, correct,
+                                                  time_taken, timestamp))
+
+    def append_quiz(self, student, quiz):
+        return self._append(QUIZ, encode_quiz(student, quiz))
+
+    def _append(self, kind, payload):
+        record = frame(kind, payload)
+        with self._lock:
+            # One write per record, flushed so readers and a restart see it
+            self._file.write(record)
+            self._file.flush()
+            if self.sync:
+                os.fsync(self._file.fileno())
+            self.size += len(record)
+            return self.size
+
+    def read(self, start=0, end=None, kinds=None):
+        """Decoded Events from byte offset start (a record boundary) up to end"""
+        end = self.size if end is None else end
+        if end <= start:
+            return
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), end, access=mmap.ACCESS_READ) as buffer:
+            for kind, payload, offset, record_end in iter_frames(buffer, start, end):
+                if kinds is None or kind in kinds:
+                    student, data = decode_event(kind, payload, self.quiz_content)
+                    yield Event(kind, student, data, offset, record_end)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class SnapshotStore:
+    """Pickled snapshots of derived state, each tagged with the log offset it covers"""
+
+    def __init__(self, directory, keep=2):
+        self.directory = directory
+        self.keep = keep
+        os.makedirs(directory, exist_ok=True)
+
+    def paths(self):
+        names = sorted(name for name in os.listdir(self.directory)
+                       if name.startswith('snapshot-') and name.endswith('.pickle'))
+        return [os.path.join(self.directory, name) for name in names]
+
+    def save(self, offset, state):
+        path = os.path.join(self.directory, f"snapshot-{offset:020d}.pickle")
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            pickle.dump({'offset': offset, 'state': state}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        # Atomic, so a crash leaves either the old snapshot or the new one
+        os.replace(temp_path, path)
+        for old in self.paths()[:-self.keep]:
+            os.remove(old)
+        return path
+
+    def latest(self):
+        """(offset, state) of the newest readable snapshot, or (0, None)"""
+        for path in reversed(self.paths()):
+            try:
+                with open(path, 'rb') as f:
+                    saved = pickle.load(f)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                continue
+            return saved['offset'], saved['state']
+        return 0, None
+
+
+class LearningState:
+    """The state derived from finished quizzes: histories, review schedule and mastery"""
+
+    def __init__(self, registry, review_scheduler=None, knowledge_tracer=None):
+        self.registry = registry
+        self.review_scheduler = review_scheduler
+        self.knowledge_tracer = knowledge_tracer
+
+    def apply_quiz(self, student, quiz):
+        self.registry.append_quiz(student, quiz)
+        if self.review_scheduler is not None:
+            self.review_scheduler.record_quiz(student, quiz)
+        if self.knowledge_tracer is not None:
+            self.knowledge_tracer.observe_quiz(student, quiz)
+
+    def apply_quizzes(self, quizzes_by_student):
+        """apply_quiz for many students' quizzes at once; each student's in order"""
+        for student, quizzes in quizzes_by_student.items():
+            self.registry.append_quizzes(student, quizzes)
+            if self.review_scheduler is not None:
+                self.review_scheduler.record_quizzes(student, quizzes)
+        if self.knowledge_tracer is not None:
+            self.knowledge_tracer.observe_quizzes(quizzes_by_student)
+
+    def dump(self):
+        """Picklable state; histories are kept in the log's record encoding"""
+        histories = b''.join(frame(QUIZ, encode_quiz(student, quiz))
+                             for student, record in self.registry.snapshot().items()
+                             for quiz in record['quiz_history'])
+        return {
+            'histories': histories,
+            'review_scheduler': self.review_scheduler.__getstate__() if self.review_scheduler is not None else None,
+            'knowledge_tracer': self.knowledge_tracer.__getstate__() if self.knowledge_tracer is not None else None
+        }
+
+    def restore(self, state, quiz_content):
+        """Load a dump() into empty components"""
+        quizzes_by_student = {}
+        for kind, payload, _, _ in iter_frames(state['histories']):
+            student, quiz = decode_event(kind, payload, quiz_content)
+            quizzes_by_student.setdefault(student, []).append(quiz)
+        for student, quizzes in quizzes_by_student.items():
+            self.registry.append_quizzes(student, quizzes)
+        if self.review_scheduler is not None and state['review_scheduler'] is not None:
+            self.review_scheduler.__setstate__(state['review_scheduler'])
+        if self.knowledge_tracer is not None and state['knowledge_tracer'] is not None:
+            self.knowledge_tracer.__setstate__(state['knowledge_tracer'])
+
+
+class EventJournal:
+    """An EventLog and the LearningState derived from it, kept in step.
+
+    Quizzes are logged before they are applied, and both happen under one
+    lock, so a snapshot's log offset covers exactly the quizzes in its state.
+    """
+
+    def __init__(self, directory, state, quiz_content, snapshot_every=1000, sync=False, replay_batch=10000):
+        self.directory = directory
+        self.state = state
+        self.quiz_content = quiz_content
+        self.snapshot_every = snapshot_every
+        self.sync = sync
+        self.replay_batch = replay_batch
+        self.snapshots = SnapshotStore(directory)
+        self.log = None
+        self._since_snapshot = 0
+        self._lock = threading.Lock()
+
+    def recover(self):
+        """Load the latest snapshot and replay the log after it; call once, before recording.
+
+        Returns:
+            dict: 'snapshot_offset', 'replayed' (quiz events) and 'seconds'
+        """
+        start = time.perf_counter()
+        with self._lock:
+            offset, saved = self.snapshots.latest()
+            if saved is not None:
+                self.state.restore(saved, self.quiz_content)
+            self.log = EventLog(os.path.join(self.directory, 'events.log'), self.quiz_content,
+                                sync=self.sync, valid_from=offset)
+
+            replayed = 0
+            batch, batch_size = {}, 0
+            for event in self.log.read(offset, kinds=(QUIZ,)):
+                batch.setdefault(event.student, []).append(event.data)
+                batch_size += 1
+                if batch_size >= self.replay_batch:
+                    self.state.apply_quizzes(batch)
+                    replayed += batch_size
+                    batch, batch_size = {}, 0
+            if batch:
+                self.state.apply_quizzes(batch)
+                replayed += batch_size
+            self._since_snapshot = replayed
+        return {'snapshot_offset': offset, 'replayed': replayed, 'seconds': time.perf_counter() - start}
+
+    def record_answer(self, student, question_id, position, option, correct, time_taken, timestamp=None):
+        """Log one answer as it is recorded; answers do not change the derived state"""
+        return self.log.append_answer(student, question_id, position, option, correct, time_taken, timestamp)
+
+    def record_quiz(self, student, quiz):
+        """Log a finished quiz, then apply it to the derived state"""
+        with self._lock:
+            self.log.append_quiz(student, quiz)
+            self.state.apply_quiz(student, quiz)
+            self._since_snapshot += 1
+            if self.snapshot_every and self._since_snapshot >= self.snapshot_every:
+                self._snapshot()
+
+    def snapshot(self):
+        with self._lock:
+            return self._snapshot()
+
+    def _snapshot(self):
+        path = self.snapshots.save(self.log.size, self.state.dump())
+        self._since_snapshot = 0
+        return path
+
+    def stats(self):
+        return {
+            'log_bytes': self.log.size if self.log is not None else 0,
+            'quizzes_since_snapshot': self._since_snapshot,
+            'snapshots': len(self.snapshots.paths())
+        }
+
+    def close(self):
+        if self.log is not None:
+            self.log.close()
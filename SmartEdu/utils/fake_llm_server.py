@@ -0,0 +1,197 @@
+"""Local fake of the OpenAI chat completions endpoint.
+
+Emulates /v1/chat/completions, including chunked (stream=True) responses, with
+configurable latency, so the tutor can be exercised without network access or
+an API key. Point the app at it with:
+
+    python -m utils.fake_llm_server --port 8089 --first-token-latency 0.5
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=fake streamlit run app.py
+
+or start it in-process:
+
+    server = FakeCompletionServer(first_token_latency=0.2).start()
+    client = OpenAI(base_url=server.base_url, api_key='fake')
+    ...
+    server.stop()
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = (
+    "Great question! Let's break it down step by step. First, think about what "
+    "you already know about the topic. Then we can build on that with an "
+    "example from everyday life, and finish with a quick question to check "
+    "your understanding."
+)
+
+FAKE_TOPICS = [
+    "How Volcanoes Shape the Earth",
+    "The Mathematics of Music",
+    "Why the Roman Empire Fell",
+    "How Computers Store Information",
+    "The Science of Sleep"
+]
+
+
+class FakeCompletionServer:
+    """Threaded HTTP server answering chat completion requests with canned text"""
+
+    def __init__(self, host='127.0.0.1', port=0, reply=DEFAULT_REPLY,
+                 first_token_latency=0.0, chunk_delay=0.0, words_per_chunk=3, latency=None):
+        self.reply = reply
+        # Delay before the first byte of any response
+        self.first_token_latency = first_token_latency
+        # Delay between streamed chunks
+        self.chunk_delay = chunk_delay
+        self.words_per_chunk = words_per_chunk
+        # Total delay of non-streamed responses (defaults to what streaming would take)
+        self.latency = latency
+        self.request_count = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def chunks(self, text):
+        words = text.split(' ')
+        for i in range(0, len(words), self.words_per_chunk):
+            piece = ' '.join(words[i:i + self.words_per_chunk])
+            yield piece if i + self.words_per_chunk >= len(words) else piece + ' '
+
+    def content_for(self, request):
+        """Reply text for a request; JSON requests get suggestion/starter shaped JSON"""
+        if (request.get('response_format') or {}).get('type') == 'json_object':
+            prompt = request['messages'][-1]['content']
+            if 'conversation starter' in prompt:
+                return json.dumps({'questions': [
+                    "What surprised you most when you first learned about this?",
+                    "How would you explain this to a friend?",
+                    "Where do you see this in everyday life?"
+                ]})
+            return json.dumps({'topics': FAKE_TOPICS})
+        return self.reply
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                if not self.path.rstrip('/').endswith('/chat/completions'):
+                    self._send_json(404, {'error': {'message': 'Not found'}})
+                    return
+
+                length = int(self.headers.get('content-length', 0))
+                request = json.loads(self.rfile.read(length) or b'{}')
+                with server._lock:
+                    server.request_count += 1
+
+                content = server.content_for(request)
+                time.sleep(server.first_token_latency)
+                if request.get('stream'):
+                    self._stream(request, content)
+                else:
+                    pieces = list(server.chunks(content))
+                    latency = server.latency if server.latency is not None else server.chunk_delay * len(pieces)
+                    time.sleep(latency)
+                    self._send_json(200, _completion(request, content))
+
+            def _stream(self, request, content):
+                self.send_response(200)
+                self.send_header('content-type', 'text/event-stream')
+                self.send_header('cache-control', 'no-cache')
+                self.send_header('connection', 'close')
+                self.end_headers()
+
+                completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+                self._event(_chunk(request, completion_id, {'role': 'assistant', 'content': ''}))
+                for piece in server.chunks(content):
+                    self._event(_chunk(request, completion_id, {'content': piece}))
+                    time.sleep(server.chunk_delay)
+                self._event(_chunk(request, completion_id, {}, finish_reason='stop'))
+                self.wfile.write(b'data: [DONE]\n\n')
+                self.wfile.flush()
+                self.close_connection = True
+
+            def _event(self, payload):
+                self.wfile.write(b'data: ' + json.dumps(payload).encode('utf-8') + b'\n\n')
+                self.wfile.flush()
+
+            def _send_json(self, status, payload):
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('content-type', 'application/json')
+                self.send_header('content-length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+
+def _completion(request, content):
+    return {
+        'id': f"chatcmpl-{uuid.uuid4().hex}",
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': request.get('model', 'fake'),
+        'choices': [{
+            'index': 0,
+            'message': {'role': 'assistant', 'content': content},
+            'finish_reason': 'stop'
+        }],
+        'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+    }
+
+
+def _chunk(request, completion_id, delta, finish_reason=None):
+    return {
+        'id': completion_id,
+        'object': 'chat.completion.chunk',
+        'created': int(time.time()),
+        'model': request.get('model', 'fake'),
+        'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI chat completions server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--first-token-latency', type=float, default=0.3)
+    parser.add_argument('--chunk-delay', type=float, default=0.05)
+    parser.add_argument('--words-per-chunk', type=int, default=3)
+    args = parser.parse_args()
+
+    server = FakeCompletionServer(args.host, args.port, first_token_latency=args.first_token_latency,
+                                  chunk_delay=args.chunk_delay, words_per_chunk=args.words_per_chunk)
+    print(f"Fake completions at {server.base_url}")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+import threading
+
+
+class LazyComponent:
+    """Proxy that builds the wrapped component the first time it is used"""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Return the wrapped component, building it on first call"""
+        if self._instance is None:
+            with self._lock:
+                # Another session may have built it while we waited
+                if self._instance is None:
+                    self._instance = self._factory()
+        return self._instance
+
+    @property
+    def is_built(self):
+        return self._instance is not None
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
@@ -0,0 +1,251 @@
+import asyncio
+import contextlib
+import queue
+import random
+import threading
+import time
+
+
+class LLMUnavailableError(Exception):
+    """Raised when the language model cannot produce a response right now"""
+
+
+class LLMBusyError(LLMUnavailableError):
+    """Raised when no request slot frees up within the queue timeout"""
+
+
+class RateLimitedError(LLMBusyError):
+    """Raised when one student sends requests faster than their allowance"""
+
+
+class CircuitBreaker:
+    """Stops calling a failing backend until it has had time to recover.
+
+    closed    -> calls go through; consecutive failures are counted
+    open      -> calls fail fast until reset_timeout has passed
+    half_open -> a single trial call decides whether to close or re-open
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        return self.admit() is not None
+
+    def admit(self):
+        """Return 'call' or 'trial' if a call may go ahead, otherwise None"""
+        with self._lock:
+            if self.state == 'closed':
+                return 'call'
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                self._trial_in_flight = False
+            if self.state == 'half_open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return 'trial'
+            return None
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == 'half_open' or self.consecutive_failures >= self.failure_threshold:
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """Hand back a trial that ended without telling whether the backend is up"""
+        with self._lock:
+            self._trial_in_flight = False
+
+
+def _is_retryable(error):
+    import openai
+
+    if isinstance(error, (asyncio.TimeoutError, openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+_STREAM_DONE = object()
+
+
+class AsyncLLMClient:
+    """Chat completions client running on its own asyncio event loop.
+
+    Requests from any thread are scheduled onto one background loop, where a
+    FairScheduler bounds how many are in flight, rate limits each student and
+    lets chat go ahead of background work. Each attempt has a timeout,
+    retryable errors are retried with jittered exponential backoff, and a
+    circuit breaker makes callers fail fast (LLMUnavailableError) while the
+    backend is down instead of every worker thread waiting on it.
+    """
+
+    def __init__(self, max_concurrency=8, timeout=30.0, max_retries=3, backoff_base=0.5,
+                 backoff_max=8.0, queue_timeout=10.0, circuit_breaker=None, scheduler=None,
+                 **client_kwargs):
+        from openai import AsyncOpenAI
+        from utils.llm_scheduler import FairScheduler
+
+        # Retries and timeouts are handled here, not by the SDK
+        self._client = AsyncOpenAI(max_retries=0, timeout=timeout, **client_kwargs)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.queue_timeout = queue_timeout
+        self.breaker = circuit_breaker or CircuitBreaker()
+        self.scheduler = scheduler or FairScheduler(max_concurrency=max_concurrency)
+
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='llm-client', daemon=True)
+        self._thread.start()
+
+    # Sync API (callable from Streamlit script threads)
+
+    def complete(self, *, student=None, lane='chat', **request):
+        """Run a chat completion and return the response object"""
+        future = asyncio.run_coroutine_threadsafe(self.acomplete(student=student, lane=lane, **request), self._loop)
+        return future.result()
+
+    def stream(self, *, student=None, lane='chat', **request):
+        """Yield the text deltas of a streamed chat completion"""
+        chunks = queue.Queue()
+        future = asyncio.run_coroutine_threadsafe(self._astream(request, chunks, student, lane), self._loop)
+        try:
+            while True:
+                item = chunks.get()
+                if item is _STREAM_DONE:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            # The consumer may stop early (e.g. the page reran)
+            future.cancel()
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'retries': self.retries,
+            'failures': self.failures,
+            'circuit_state': self.breaker.state,
+            **self.scheduler.stats()
+        }
+
+    # Async API
+
+    async def acomplete(self, *, student=None, lane='chat', **request):
+        async def attempt():
+            return await asyncio.wait_for(self._client.chat.completions.create(**request), self.timeout)
+
+        return await self._with_retries(attempt, student, lane)
+
+    async def _astream(self, request, chunks, student=None, lane='chat'):
+        async def open_stream():
+            return await asyncio.wait_for(
+                self._client.chat.completions.create(stream=True, **request), self.timeout
+            )
+
+        try:
+            # Only opening the stream is retried; once text has been shown it cannot be taken back
+            async with self._slot(student, lane):
+                stream = await self._with_retries(open_stream, acquire_slot=False)
+                iterator = stream.__aiter__()
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(iterator.__anext__(), self.timeout)
+                    except StopAsyncIteration:
+                        break
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        chunks.put(chunk.choices[0].delta.content)
+            chunks.put(_STREAM_DONE)
+        except asyncio.CancelledError:
+            raise
+        except LLMUnavailableError as e:
+            chunks.put(e)
+        except Exception as e:
+            if _is_retryable(e):
+                self.breaker.record_failure()
+            self.failures += 1
+            error = LLMUnavailableError(str(e))
+            error.__cause__ = e
+            chunks.put(error)
+
+    async def _with_retries(self, attempt_fn, student=None, lane='chat', acquire_slot=True):
+        admitted = None
+        settled = False
+        attempt = 0
+        try:
+            while True:
+                try:
+                    # Only the first attempt is charged to the student's allowance
+                    slot = self._slot(student, lane, cost=0 if attempt else 1) if acquire_slot else contextlib.nullcontext()
+                    async with slot:
+                        # Asked once a slot is held, so a half-open trial is not spent waiting in the queue
+                        if admitted is None:
+                            admitted = self.breaker.admit()
+                            if admitted is None:
+                                raise LLMUnavailableError("The tutor service is temporarily unavailable")
+                        self.requests += 1
+                        result = await attempt_fn()
+                    self.breaker.record_success()
+                    settled = True
+                    return result
+                except LLMUnavailableError:
+                    raise
+                except Exception as e:
+                    retryable = _is_retryable(e)
+                    if not retryable or attempt >= self.max_retries:
+                        # A rejected request (bad request, auth) says nothing about the backend's health
+                        if retryable:
+                            self.breaker.record_failure()
+                            settled = True
+                        self.failures += 1
+                        raise LLMUnavailableError(str(e) or type(e).__name__) from e
+
+                attempt += 1
+                self.retries += 1
+                # Full jitter keeps retries from many sessions from arriving in lockstep
+                await asyncio.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt)))
+        finally:
+            if admitted == 'trial' and not settled:
+                # Busy, rate limited, cancelled or rejected: let the next call make the trial
+                self.breaker.release_trial()
+
+    def _slot(self, student=None, lane='chat', cost=1):
+        return _Slot(self, student, lane, cost)
+
+
+class _Slot:
+    """Async context manager for one scheduler slot, with a queueing timeout"""
+
+    def __init__(self, client, student, lane, cost):
+        self._client = client
+        self._student = student
+        self._lane = lane
+        self._cost = cost
+
+    async def __aenter__(self):
+        await self._client.scheduler.acquire(self._student, self._lane, self._client.queue_timeout, self._cost)
+
+    async def __aexit__(self, *exc_info):
+        self._client.scheduler.release()
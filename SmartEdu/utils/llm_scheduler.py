@@ -0,0 +1,184 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+
+from utils.llm_client import LLMBusyError, RateLimitedError
+
+# Lanes in priority order: interactive chat always goes ahead of background work
+LANES = ('chat', 'background')
+
+
+class TokenBucket:
+    """Request allowance for one student: `capacity` at once, refilled at `rate` per second.
+
+    reserve() may take the balance negative; the deficit is how long the
+    request has to wait for its token.
+    """
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def reserve(self, now, cost=1):
+        """Take `cost` tokens and return the time at which they are actually available"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= cost
+        return now if self.tokens >= 0 else now + -self.tokens / self.rate
+
+    def refund(self, cost=1):
+        self.tokens = min(self.capacity, self.tokens + cost)
+
+    def is_full(self, now):
+        return self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+
+class _Waiter:
+    __slots__ = ('future', 'enqueued_at', 'cancelled')
+
+    def __init__(self, future, enqueued_at):
+        self.future = future
+        self.enqueued_at = enqueued_at
+        self.cancelled = False
+
+
+class FairScheduler:
+    """Admits LLM requests fairly across students under a global concurrency cap.
+
+    Each student has a token bucket, so a student sending faster than
+    `student_rate` requests per second (after a burst of `student_burst`)
+    has their requests delayed rather than crowding out everyone else, and
+    rejected once the delay would exceed `max_rate_wait`. Waiting requests sit
+    in one heap per lane ordered by the time their token is available, and a
+    free slot always goes to the highest-priority lane with a request ready.
+    Enqueue and dispatch are O(log n).
+
+    All methods except stats() must be called on the client's event loop.
+    """
+
+    def __init__(self, max_concurrency=8, student_rate=10 / 60, student_burst=5,
+                 max_rate_wait=30.0, max_buckets=10000):
+        self.max_concurrency = max_concurrency
+        self.student_rate = student_rate
+        self.student_burst = student_burst
+        self.max_rate_wait = max_rate_wait
+        self.max_buckets = max_buckets
+        self.in_flight = 0
+        self._buckets = {}
+        # lane -> heap of (ready_at, sequence, waiter)
+        self._queues = {lane: [] for lane in LANES}
+        self._depth = {lane: 0 for lane in LANES}
+        self._sequence = itertools.count()
+        self._wakeup = None
+
+        self.admitted = {lane: 0 for lane in LANES}
+        self.rate_limited = 0
+        self.timed_out = 0
+        self._waits = {lane: deque(maxlen=2048) for lane in LANES}
+
+    async def acquire(self, student=None, lane='chat', timeout=None, cost=1):
+        """Wait for a request slot; pair every successful call with release()"""
+        now = time.monotonic()
+        ready_at = now
+        bucket = None
+        if student is not None and cost:
+            bucket = self._bucket(student, now)
+            ready_at = bucket.reserve(now, cost)
+            if ready_at - now > self.max_rate_wait:
+                bucket.refund(cost)
+                self.rate_limited += 1
+                raise RateLimitedError("Too many messages in a short time; please wait a moment")
+
+        if ready_at <= now and self.in_flight < self.max_concurrency and not self._depth[lane] \
+                and not any(self._depth[other] for other in LANES[:LANES.index(lane)]):
+            self._admit(lane, now, now)
+            return
+
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), now)
+        heapq.heappush(self._queues[lane], (ready_at, next(self._sequence), waiter))
+        self._depth[lane] += 1
+        self._dispatch()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except asyncio.TimeoutError:
+            self._abandon(waiter, lane, bucket, cost)
+            self.timed_out += 1
+            raise LLMBusyError("Too many tutor requests in progress")
+        except asyncio.CancelledError:
+            self._abandon(waiter, lane, bucket, cost)
+            raise
+
+    def release(self):
+        self.in_flight -= 1
+        self._dispatch()
+
+    def stats(self):
+        stats = {
+            'in_flight': self.in_flight,
+            'rate_limited': self.rate_limited,
+            'timed_out': self.timed_out,
+            'students_tracked': len(self._buckets)
+        }
+        for lane in LANES:
+            waits = sorted(self._waits[lane])
+            stats[f'{lane}_queue_depth'] = self._depth[lane]
+            stats[f'{lane}_admitted'] = self.admitted[lane]
+            stats[f'{lane}_wait_p50'] = waits[len(waits) // 2] if waits else 0.0
+            stats[f'{lane}_wait_p99'] = waits[min(len(waits) - 1, int(len(waits) * 0.99))] if waits else 0.0
+        return stats
+
+    def _admit(self, lane, enqueued_at, now):
+        self.in_flight += 1
+        self.admitted[lane] += 1
+        self._waits[lane].append(now - enqueued_at)
+
+    def _dispatch(self):
+        now = time.monotonic()
+        next_ready = None
+        for lane in LANES:
+            queue = self._queues[lane]
+            while queue and self.in_flight < self.max_concurrency:
+                ready_at, _, waiter = queue[0]
+                if waiter.cancelled:
+                    heapq.heappop(queue)
+                    continue
+                if ready_at > now:
+                    next_ready = ready_at if next_ready is None else min(next_ready, ready_at)
+                    break
+                heapq.heappop(queue)
+                self._depth[lane] -= 1
+                self._admit(lane, waiter.enqueued_at, now)
+                waiter.future.set_result(None)
+
+        # Come back when the earliest rate-limited request gets its token
+        if next_ready is not None and self.in_flight < self.max_concurrency:
+            loop = asyncio.get_running_loop()
+            if self._wakeup is not None:
+                self._wakeup.cancel()
+            self._wakeup = loop.call_at(loop.time() + (next_ready - now), self._dispatch)
+
+    def _abandon(self, waiter, lane, bucket, cost):
+        if waiter.future.done():
+            # Admitted just as the wait ended; hand the slot back
+            self.release()
+        else:
+            waiter.cancelled = True
+            waiter.future.cancel()
+            self._depth[lane] -= 1
+        if bucket is not None:
+            bucket.refund(cost)
+
+    def _bucket(self, student, now):
+        bucket = self._buckets.get(student)
+        if bucket is None:
+            if len(self._buckets) >= self.max_buckets:
+                # Students whose bucket has refilled carry no state worth keeping
+                self._buckets = {s: b for s, b in self._buckets.items() if not b.is_full(now)}
+            bucket = self._buckets[student] = TokenBucket(self.student_rate, self.student_burst, now)
+        return bucket
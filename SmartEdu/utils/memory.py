@@ -0,0 +1,107 @@
+"""Deep memory accounting for student records, session state and components.
+
+    from utils.memory import deep_sizeof, footprint
+
+    deep_sizeof(registry.get_user_data('alice'))
+    footprint({'quiz_content': quiz_content, 'analytics': analytics})
+
+Sizes follow references (gc.get_referents) and count every object once, so
+they include what an object keeps alive, not just its own header. Code and
+modules are never counted, and neither is anything reachable from objects
+passed as `shared` (components, the question bank), so a student's answers
+are not charged for the question bank they point into. Other objects shared
+between the measured ones are counted for each, so totals are an upper bound.
+"""
+import gc
+import sys
+from types import BuiltinFunctionType, FunctionType, MethodType, ModuleType
+
+# Walking into these would count the code and globals of the whole program
+_SKIPPED_TYPES = (type, ModuleType, FunctionType, MethodType, BuiltinFunctionType)
+
+
+def deep_sizeof(obj, shared=()):
+    """Bytes held by obj and everything it references, except what `shared` objects hold.
+
+    `shared` is a list of objects or, to avoid walking them again for every
+    call, the set returned by shared_ids().
+    """
+    return _walk([obj], shared_ids(shared))[0]
+
+
+def shared_ids(shared):
+    """ids of everything reachable from `shared`, to pass as deep_sizeof's exclusion set"""
+    if isinstance(shared, (set, frozenset)):
+        return shared
+    return _walk(shared, set())[1]
+
+
+def _walk(roots, excluded):
+    seen = set(excluded)
+    total = 0
+    stack = list(roots)
+    while stack:
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, _SKIPPED_TYPES):
+            continue
+        seen.add(id(current))
+        total += sys.getsizeof(current)
+        stack.extend(gc.get_referents(current))
+        # Checked on the type, so lazy proxies are not built by the lookup
+        if hasattr(type(current), 'nbytes') and getattr(current, 'base', None) is not None:
+            # numpy views are not GC-tracked; their memory is held by the base array
+            stack.append(current.base)
+    return total, seen
+
+
+def footprint(objects, shared=()):
+    """Deep size of each named object, counting none of the others or `shared`.
+
+    Args:
+        objects (dict): name -> object
+        shared: objects that belong to nobody in particular
+
+    Returns:
+        list: dicts with 'name' and 'bytes', largest first
+    """
+    excluded = shared_ids(shared)
+    rows = []
+    for name, obj in objects.items():
+        # Only the objects themselves are excluded, not what they reference,
+        # so memory two components share is charged to both
+        others = {id(other) for other_name, other in objects.items() if other_name != name}
+        rows.append({'name': name, 'bytes': deep_sizeof(obj, excluded | others)})
+    return sorted(rows, key=lambda row: row['bytes'], reverse=True)
+
+
+def student_footprint(students, session_states=(), shared=()):
+    """Memory per student: their stored record plus any session state they have open.
+
+    Args:
+        students: mapping of student name -> user record (e.g. a registry snapshot)
+        session_states: dicts of session_state values, matched to students by 'selected_user'
+        shared: objects not charged to any student (components, the registry itself)
+
+    Returns:
+        list: dicts with 'student', 'quizzes', 'record_bytes', 'session_bytes',
+        'bytes_per_quiz' and 'total_bytes', largest first
+    """
+    shared = shared_ids(shared)
+    sessions_by_student = {}
+    for state in session_states:
+        sessions_by_student.setdefault(state.get('selected_user'), []).append(state)
+
+    rows = []
+    for student, record in students.items():
+        record_bytes = deep_sizeof(record, shared)
+        session_bytes = sum(deep_sizeof(state, shared) for state in sessions_by_student.get(student, ()))
+        quizzes = len(record['quiz_history'])
+        rows.append({
+            'student': student,
+            'quizzes': quizzes,
+            'record_bytes': record_bytes,
+            'session_bytes': session_bytes,
+            'bytes_per_quiz': record_bytes // quizzes if quizzes else 0,
+            'total_bytes': record_bytes + session_bytes
+        })
+    return sorted(rows, key=lambda row: row['total_bytes'], reverse=True)
@@ -0,0 +1,78 @@
+import functools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.response_cache import profile_signature, topic_signature
+
+
+class TutorPrefetcher:
+    """Warms the chatbot's topic suggestions and conversation starters in the background.
+
+    warm(profile) fetches suggestions for a learner profile and then the
+    starters for every suggested topic in parallel, so they are already in
+    the chatbot's response cache when the student clicks. Requests already in
+    flight are shared instead of being sent twice. A result that was not
+    cached (the fallback list, e.g. while the API is down) is reused for
+    `retry_interval` seconds before it is fetched again.
+    """
+
+    def __init__(self, chatbot, max_workers=6, max_tracked=1024, retry_interval=60.0):
+        self.chatbot = chatbot
+        self.max_tracked = max_tracked
+        self.retry_interval = retry_interval
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='tutor-prefetch')
+        # cache key -> (Future of the most recent fetch for it, when it was started)
+        self._futures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def warm(self, student_profile):
+        """Start fetching suggestions (and their starters) for a profile; returns a Future"""
+        key = f"topics:{profile_signature(student_profile)}"
+        return self._submit(key, self._fetch_suggestions, student_profile)
+
+    def topic_suggestions(self, student_profile, refresh=False):
+        """Suggestions for a profile, waiting on a prefetch already in flight.
+
+        With refresh, new suggestions are fetched (and their starters prefetched)
+        instead of reusing finished or cached ones.
+        """
+        if not refresh:
+            return list(self.warm(student_profile).result())
+        key = f"topics:{profile_signature(student_profile)}"
+        fetch = functools.partial(self._fetch_suggestions, refresh=True)
+        return list(self._submit(key, fetch, student_profile, force=True).result())
+
+    def conversation_starters(self, topic):
+        """Starters for a topic, waiting on a prefetch already in flight"""
+        key = f"starters:{topic_signature(topic)}"
+        return list(self._submit(key, self.chatbot.generate_conversation_starters, topic).result())
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _fetch_suggestions(self, student_profile, refresh=False):
+        topics = self.chatbot.generate_topic_suggestions(student_profile, refresh=refresh)
+        for topic in topics:
+            self._submit(f"starters:{topic_signature(topic)}", self.chatbot.generate_conversation_starters, topic)
+        return topics
+
+    def _submit(self, key, fn, arg, force=False):
+        """Future for key, starting fn(arg) unless a usable fetch exists; force only shares one in flight"""
+        with self._lock:
+            future, started = self._futures.get(key, (None, None))
+            # Refetch once a finished result has left the response cache (expired,
+            # evicted, or never cached because the fallback list was returned), but
+            # not more than once per retry_interval, so an outage does not cost a
+            # request on every rerun
+            if future is None or (future.done() and (force or self._expired(key, started))):
+                future = self._executor.submit(fn, arg)
+                self._futures[key] = (future, time.monotonic())
+            self._futures.move_to_end(key)
+            while len(self._futures) > self.max_tracked:
+                self._futures.popitem(last=False)
+            return future
+
+    def _expired(self, key, started):
+        return key not in self.chatbot.response_cache and time.monotonic() - started >= self.retry_interval
@@ -0,0 +1,114 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def profile_signature(student_profile):
+    """Normalized key for the parts of a profile that topic suggestions depend on"""
+    if not student_profile:
+        return 'none'
+    strengths = sorted(s.strip().lower() for s in student_profile.get('strengths', []))
+    weaknesses = sorted(w.strip().lower() for w in student_profile.get('weaknesses', []))
+    learning_style = str(student_profile.get('learning_style', 'unknown')).strip().lower()
+    return json.dumps([strengths, weaknesses, learning_style])
+
+
+def topic_signature(topic):
+    """Normalized key for a conversation topic"""
+    return ' '.join(topic.split()).lower()
+
+
+class ResponseCache:
+    """Thread-safe LRU cache whose entries also expire after a TTL.
+
+    Keys must be strings and values JSON-serializable when a path is given;
+    the cache is then loaded from and written back to that file.
+    """
+
+    def __init__(self, max_entries=512, ttl_seconds=24 * 3600, path=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        if path and os.path.exists(path):
+            self._load()
+
+    def get(self, key):
+        """Return the cached value, or None on a miss or expired entry"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            if self.path:
+                self._save()
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[0] >= time.time()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self.path:
+                self._save()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'expirations': self.expirations,
+                'evictions': self.evictions
+            }
+
+    def _load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            # A missing or corrupt cache file just means a cold cache
+            return
+        now = time.time()
+        for key, (expires_at, value) in stored.items():
+            if expires_at >= now:
+                self._entries[key] = (expires_at, value)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _save(self):
+        # Write to a temporary file first so readers never see a partial file
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(dict(self._entries), f)
+        os.replace(tmp_path, self.path)
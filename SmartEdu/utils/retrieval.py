@@ -0,0 +1,113 @@
+import math
+import re
+import threading
+from collections import Counter, defaultdict, namedtuple
+
+# Words that say what kind of question it is rather than what it is about
+STOPWORDS = frozenset("""
+a an the is are was were be been am of to in on at for by with from as and or not no
+it its this that these those there here i me my we our you your he she they them
+what whats which who whom how why when where do does did can could would should will
+please tell explain find mean means meaning define definition about know understand help
+calculate solve work works get s t
+""".split())
+
+_TOKEN_PATTERN = re.compile(r"[^\W_]+|[√+×÷=%<>]")
+
+SearchHit = namedtuple('SearchHit', ['doc_id', 'score', 'confidence', 'payload', 'matched_terms'])
+
+
+def tokenize(text):
+    """Lowercased content words and math symbols, with simple plural folding"""
+    tokens = []
+    for token in _TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class BM25Index:
+    """Incremental in-memory inverted index ranked with Okapi BM25.
+
+    Besides the BM25 score, each hit has a confidence in [0, 1]: the share of
+    the query's IDF weight that the document matches. Query words the index
+    has never seen count against it, so a question that is only partly about
+    an indexed document gets a low confidence even if its BM25 score is high.
+    A query of one rare word has full confidence in any document containing
+    it, so hits also count the distinct query terms they matched.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        # term -> {doc_id: term frequency}
+        self.postings = defaultdict(dict)
+        self.doc_lengths = {}
+        self.payloads = {}
+        self.total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def add(self, doc_id, text, payload=None):
+        """Index a document, replacing any earlier version with the same id"""
+        with self._lock:
+            self._remove(doc_id)
+            counts = Counter(tokenize(text))
+            for term, tf in counts.items():
+                self.postings[term][doc_id] = tf
+            length = sum(counts.values())
+            self.doc_lengths[doc_id] = length
+            self.payloads[doc_id] = payload
+            self.total_length += length
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._remove(doc_id)
+
+    def idf(self, term):
+        df = len(self.postings.get(term, ()))
+        n = len(self.doc_lengths)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query, k=3):
+        """Top-k hits for a query, best first"""
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+
+        with self._lock:
+            if not self.doc_lengths:
+                return []
+            avg_length = self.total_length / len(self.doc_lengths)
+            idfs = {term: self.idf(term) for term in terms}
+            scores = defaultdict(float)
+            matched_idf = defaultdict(float)
+            matched_terms = defaultdict(int)
+            for term in terms:
+                for doc_id, tf in self.postings.get(term, {}).items():
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] += idfs[term] * tf * (self.k1 + 1) / (tf + norm)
+                    matched_idf[doc_id] += idfs[term]
+                    matched_terms[doc_id] += 1
+
+            total_idf = sum(idfs.values())
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+            return [
+                SearchHit(doc_id, score, matched_idf[doc_id] / total_idf, self.payloads[doc_id], matched_terms[doc_id])
+                for doc_id, score in ranked
+            ]
+
+    def _remove(self, doc_id):
+        if doc_id not in self.doc_lengths:
+            return
+        for term in list(self.postings):
+            docs = self.postings[term]
+            if docs.pop(doc_id, None) is not None and not docs:
+                del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(doc_id)
+        del self.payloads[doc_id]
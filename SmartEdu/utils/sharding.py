@@ -0,0 +1,441 @@
+"""Students partitioned across worker processes by consistent hashing.
+
+Each shard owns a slice of the students: their histories, sessions, learner
+profiles, review schedule and mastery. ShardedStore routes every call for a
+student (or quiz session) to its shard, and fans class-wide analytics out to
+all shards, merging their partial aggregates:
+
+    store = ShardedStore(4)                  # or make_store('sharded://4')
+    engine = QuizEngine(store)               # it implements the store interface
+    store.generate_class_analytics()
+    store.add_shard()                        # moves ~1/5 of the students
+
+Students map to shards on a hash ring with `vnodes` points per shard, so
+adding or removing a shard only moves the students whose owner changed:
+about 1/N of them, all to or from that shard.
+
+Quizzes cross process boundaries in the event log's record encoding (see
+utils.event_log), so every process must have the same question bank. The
+peer index stays global: neighbour distances need one standardization.
+"""
+import bisect
+import hashlib
+import itertools
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from utils.analytics import Analytics
+from utils.event_log import decode_event, encode_quiz, QUIZ
+
+
+def stable_hash(key):
+    """64-bit hash of a string that is the same in every process (unlike hash())"""
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """Consistent hashing of string keys onto named nodes"""
+
+    def __init__(self, nodes=(), vnodes=128):
+        self.vnodes = vnodes
+        self._nodes = []
+        self._points = []   # sorted hashes of every node's virtual points
+        self._owners = []   # node owning each point
+        for node in nodes:
+            self.add(node)
+
+    def __len__(self):
+        return len(self._nodes)
+
+    @property
+    def nodes(self):
+        return tuple(self._nodes)
+
+    def add(self, node):
+        if node in self._nodes:
+            raise ValueError(f"Node already on the ring: {node!r}")
+        self._nodes.append(node)
+        self._build()
+
+    def remove(self, node):
+        self._nodes.remove(node)
+        self._build()
+
+    def node_for(self, key):
+        """Owner of key: the node of the first point at or after its hash, wrapping around"""
+        if not self._points:
+            raise LookupError("Hash ring has no nodes")
+        index = bisect.bisect_left(self._points, stable_hash(key))
+        return self._owners[index % len(self._points)]
+
+    def _build(self):
+        points = sorted((stable_hash(f"{node}#{i}"), node) for node in self._nodes for i in range(self.vnodes))
+        self._points = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+
+def encode_history(student, quiz_history):
+    """Quizzes in a form that pickles without losing question ids"""
+    # CompactAnswers pickle as answer dicts, so they travel as log records instead
+    return [encode_quiz(student, quiz) if hasattr(quiz['answers'], 'question_ids') else quiz
+            for quiz in quiz_history]
+
+
+def decode_history(encoded, quiz_content):
+    return [decode_event(QUIZ, quiz, quiz_content)[1] if isinstance(quiz, bytes) else quiz
+            for quiz in encoded]
+
+
+class ShardWorker:
+    """Everything one shard owns; lives in the shard's worker process"""
+
+    def __init__(self):
+        from data.quiz_content import QuizContent
+        from models.knowledge_tracing import KnowledgeTracer
+        from models.learner_profiler import LearnerProfiler
+        from models.review_scheduler import ReviewScheduler
+        from utils.event_log import LearningState
+        from utils.student_registry import StudentRegistry
+
+        self.quiz_content = QuizContent()
+        self.registry = StudentRegistry()
+        self.review_scheduler = ReviewScheduler()
+        self.knowledge_tracer = KnowledgeTracer(self.quiz_content.get_available_topics())
+        self.state = LearningState(self.registry, self.review_scheduler, self.knowledge_tracer)
+        self.learner_profiler = LearnerProfiler()
+        self.analytics = Analytics()
+        self.profiles = {}   # student -> (record version, profile)
+        self.sessions = {}
+
+    # Store interface, with histories encoded
+
+    def ensure_user(self, student):
+        self.registry.ensure_user(student)
+
+    def list_students(self):
+        return self.registry.list_students()
+
+    def get_user_data(self, student):
+        record = self.registry.get_user_data(student)
+        if record is None:
+            return None
+        record = dict(record)
+        record['quiz_history'] = encode_history(student, record['quiz_history'])
+        record['performance_metrics'] = dict(record['performance_metrics'])
+        return record
+
+    def get_quiz_history(self, student):
+        return encode_history(student, self.registry.get_quiz_history(student))
+
+    def append_quizzes(self, student, encoded):
+        self.state.apply_quizzes({student: decode_history(encoded, self.quiz_content)})
+
+    def save_session(self, session_id, session):
+        self.sessions[session_id] = session
+
+    def load_session(self, session_id):
+        return self.sessions.get(session_id)
+
+    def delete_session(self, session_id):
+        self.sessions.pop(session_id, None)
+
+    def pop_session(self, session_id):
+        return self.sessions.pop(session_id, None)
+
+    # Derived state
+
+    def get_profile(self, student):
+        record = self.registry.get_user_data(student)
+        if record is None or not record['quiz_history']:
+            return None
+        cached = self.profiles.get(student)
+        if cached is None or cached[0] != record['version']:
+            cached = self.profiles[student] = (record['version'],
+                                               self.learner_profiler.get_learner_profile(record['quiz_history']))
+        return cached[1]
+
+    def mastery_of(self, student):
+        return self.knowledge_tracer.mastery_of(student)
+
+    def due_reviews(self, student, now=None, limit=None):
+        return self.review_scheduler.due(student, now, limit)
+
+    def class_partial(self):
+        return self.analytics.class_partial(self.registry.snapshot())
+
+    def stats(self):
+        return {'students': len(self.registry.snapshot()), 'sessions': len(self.sessions),
+                'review_cards': len(self.review_scheduler)}
+
+    # Rebalancing
+
+    def keys(self):
+        """(students, session ids) owned by this shard"""
+        return self.registry.list_students(), list(self.sessions)
+
+    def export(self, students, session_ids):
+        """Copies of some students' histories and some sessions, for adopt() on another shard"""
+        records = {student: self.get_quiz_history(student) for student in students}
+        sessions = {session_id: self.sessions[session_id] for session_id in session_ids if session_id in self.sessions}
+        return records, sessions
+
+    def adopt(self, records, sessions):
+        """Take over students from export(); their reviews and mastery are replayed from history"""
+        for student in records:
+            self.registry.ensure_user(student)
+        self.state.apply_quizzes({student: decode_history(encoded, self.quiz_content)
+                                  for student, encoded in records.items() if encoded})
+        self.sessions.update(sessions)
+
+    def drop(self, students, session_ids):
+        """Forget students and sessions that another shard has adopted"""
+        for student in students:
+            self.registry.pop_user(student)
+            self.review_scheduler.forget(student)
+            self.knowledge_tracer.forget(student)
+            self.profiles.pop(student, None)
+        for session_id in session_ids:
+            self.sessions.pop(session_id, None)
+
+
+# The ShardWorker of a worker process
+_worker = None
+
+
+def _start_worker():
+    global _worker
+    _worker = ShardWorker()
+
+
+def _call_worker(method, args):
+    return getattr(_worker, method)(*args)
+
+
+class _ProcessShard:
+    """A ShardWorker in its own process; calls return futures"""
+
+    def __init__(self):
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        # One process per shard, so its state persists from call to call
+        self.executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'),
+                                            initializer=_start_worker)
+
+    def call(self, method, *args):
+        return self.executor.submit(_call_worker, method, args)
+
+    def close(self):
+        self.executor.shutdown()
+
+
+class _InlineShard:
+    """A ShardWorker in this process, e.g. for tests or a single-core host"""
+
+    def __init__(self):
+        self.worker = ShardWorker()
+
+    def call(self, method, *args):
+        future = Future()
+        try:
+            future.set_result(getattr(self.worker, method)(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def close(self):
+        pass
+
+
+class _RebalanceGate:
+    """Lets routed calls run concurrently, but not while keys move between shards"""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._active = 0
+        self._moving = False
+
+    @contextmanager
+    def call(self):
+        with self._condition:
+            while self._moving:
+                self._condition.wait()
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._active -= 1
+                if not self._active:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def move(self):
+        with self._condition:
+            while self._moving:
+                self._condition.wait()
+            self._moving = True
+            while self._active:
+                self._condition.wait()
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._moving = False
+                self._condition.notify_all()
+
+
+class ShardedStore:
+    """Store interface (see utils.store) over students sharded across worker processes.
+
+    Args:
+        shards: number of shards to start with
+        processes: run each shard in its own process; False keeps them in this one
+        vnodes: hash ring points per shard; more spread students more evenly
+    """
+
+    def __init__(self, shards=4, processes=True, vnodes=128, quiz_content=None):
+        self.processes = processes
+        self.ring = HashRing(vnodes=vnodes)
+        self.analytics = Analytics()
+        self._quiz_content = quiz_content
+        self._shards = {}
+        self._names = itertools.count()
+        self._gate = _RebalanceGate()
+        for _ in range(shards):
+            self._start_shard()
+
+    @property
+    def quiz_content(self):
+        # Decodes histories coming back from the shards
+        if self._quiz_content is None:
+            from data.quiz_content import QuizContent
+
+            self._quiz_content = QuizContent()
+        return self._quiz_content
+
+    @property
+    def shard_names(self):
+        return self.ring.nodes
+
+    def shard_for(self, key):
+        return self.ring.node_for(key)
+
+    def _start_shard(self, name=None):
+        name = name if name is not None else f"shard-{next(self._names)}"
+        if name in self._shards:
+            raise ValueError(f"Shard already exists: {name!r}")
+        self._shards[name] = _ProcessShard() if self.processes else _InlineShard()
+        self.ring.add(name)
+        return name
+
+    def _call(self, key, method, *args):
+        with self._gate.call():
+            return self._shards[self.ring.node_for(key)].call(method, *args).result()
+
+    def _fan_out(self, method, *args):
+        """{shard: result} of calling every shard at once"""
+        with self._gate.call():
+            futures = {name: shard.call(method, *args) for name, shard in self._shards.items()}
+            return {name: future.result() for name, future in futures.items()}
+
+    # Store interface
+
+    def ensure_user(self, student):
+        self._call(student, 'ensure_user', student)
+
+    def list_students(self):
+        return sorted(student for students in self._fan_out('list_students').values() for student in students)
+
+    def get_user_data(self, student):
+        record = self._call(student, 'get_user_data', student)
+        if record is not None:
+            record['quiz_history'] = decode_history(record['quiz_history'], self.quiz_content)
+        return record
+
+    def get_quiz_history(self, student):
+        return decode_history(self._call(student, 'get_quiz_history', student), self.quiz_content)
+
+    def append_quiz(self, student, quiz_result):
+        self.append_quizzes(student, [quiz_result])
+
+    def append_quizzes(self, student, quiz_results):
+        self._call(student, 'append_quizzes', student, encode_history(student, quiz_results))
+
+    def save_session(self, session_id, session):
+        self._call(session_id, 'save_session', session_id, session)
+
+    def load_session(self, session_id):
+        return self._call(session_id, 'load_session', session_id)
+
+    def delete_session(self, session_id):
+        self._call(session_id, 'delete_session', session_id)
+
+    def pop_session(self, session_id):
+        return self._call(session_id, 'pop_session', session_id)
+
+    # Per-student derived state, computed on the owning shard
+
+    def get_profile(self, student):
+        return self._call(student, 'get_profile', student)
+
+    def mastery_of(self, student):
+        return self._call(student, 'mastery_of', student)
+
+    def due_reviews(self, student, now=None, limit=None):
+        return self._call(student, 'due_reviews', student, now, limit)
+
+    def generate_class_analytics(self):
+        """Analytics.generate_class_analytics over every shard's students"""
+        partials = list(self._fan_out('class_partial').values())
+        if not any(partial['total_students'] for partial in partials):
+            return {"error": "No student data available"}
+        return self.analytics.merge_class_partials(partials)
+
+    def stats(self):
+        return self._fan_out('stats')
+
+    # Resharding
+
+    def add_shard(self, name=None):
+        """Start a shard and move over the students it now owns; returns (name, students moved)"""
+        with self._gate.move():
+            name = self._start_shard(name)
+            return name, self._rebalance()
+
+    def remove_shard(self, name):
+        """Move a shard's students to their new owners and stop it; returns students moved"""
+        with self._gate.move():
+            if len(self._shards) == 1:
+                raise ValueError("Cannot remove the last shard")
+            self.ring.remove(name)
+            moved = self._rebalance()
+            self._shards.pop(name).close()
+            return moved
+
+    def _rebalance(self):
+        moved = 0
+        keys = {name: shard.call('keys') for name, shard in self._shards.items()}
+        for source, future in keys.items():
+            students, session_ids = future.result()
+            outgoing = {}
+            for student in students:
+                owner = self.ring.node_for(student)
+                if owner != source:
+                    outgoing.setdefault(owner, ([], []))[0].append(student)
+            for session_id in session_ids:
+                owner = self.ring.node_for(session_id)
+                if owner != source:
+                    outgoing.setdefault(owner, ([], []))[1].append(session_id)
+            for owner, (students, session_ids) in outgoing.items():
+                # Copied before being dropped, so a failure never loses a student
+                records, sessions = self._shards[source].call('export', students, session_ids).result()
+                self._shards[owner].call('adopt', records, sessions).result()
+                self._shards[source].call('drop', students, session_ids).result()
+                moved += len(students)
+        return moved
+
+    def close(self):
+        for shard in self._shards.values():
+            shard.close()
@@ -0,0 +1,127 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from utils.student_registry import StudentRegistry, new_user_record
+
+
+class SQLiteStore:
+    """Store backed by a SQLite file, shareable between service processes on one host"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS users (student TEXT PRIMARY KEY, data TEXT NOT NULL)')
+            conn.execute('CREATE TABLE IF NOT EXISTS quizzes (id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                         'student TEXT NOT NULL, result TEXT NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS quizzes_student ON quizzes (student, id)')
+            conn.execute('CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, data TEXT NOT NULL)')
+
+    def _connect(self):
+        # sqlite3 connections cannot be shared across threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def ensure_user(self, student):
+        with self._connect() as conn:
+            conn.execute('INSERT OR IGNORE INTO users (student, data) VALUES (?, ?)',
+                         (student, _dumps({k: v for k, v in new_user_record().items() if k != 'quiz_history'})))
+
+    def list_students(self):
+        rows = self._connect().execute('SELECT student FROM users ORDER BY student').fetchall()
+        return [row[0] for row in rows]
+
+    def get_user_data(self, student):
+        row = self._connect().execute('SELECT data FROM users WHERE student = ?', (student,)).fetchone()
+        if row is None:
+            return None
+        record = _loads(row[0])
+        record['quiz_history'] = self.get_quiz_history(student)
+        return record
+
+    def get_quiz_history(self, student):
+        rows = self._connect().execute('SELECT result FROM quizzes WHERE student = ? ORDER BY id',
+                                       (student,)).fetchall()
+        return [_loads(row[0]) for row in rows]
+
+    def append_quiz(self, student, quiz_result):
+        self.ensure_user(student)
+        with self._connect() as conn:
+            conn.execute('INSERT INTO quizzes (student, result) VALUES (?, ?)', (student, _dumps(quiz_result)))
+
+    def append_quizzes(self, student, quiz_results):
+        self.ensure_user(student)
+        with self._connect() as conn:
+            conn.executemany('INSERT INTO quizzes (student, result) VALUES (?, ?)',
+                             ((student, _dumps(quiz_result)) for quiz_result in quiz_results))
+
+    def save_session(self, session_id, session):
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO sessions (id, data) VALUES (?, ?)', (session_id, _dumps(session)))
+
+    def load_session(self, session_id):
+        row = self._connect().execute('SELECT data FROM sessions WHERE id = ?', (session_id,)).fetchone()
+        return _loads(row[0]) if row else None
+
+    def delete_session(self, session_id):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM sessions WHERE id = ?', (session_id,))
+
+    def pop_session(self, session_id):
+        """Remove and return a session; of several concurrent callers only one gets it"""
+        conn = self._connect()
+        row = conn.execute('SELECT data FROM sessions WHERE id = ?', (session_id,)).fetchone()
+        if row is None:
+            return None
+        with conn:
+            # Deleting only the row as read makes this a compare-and-delete across processes
+            deleted = conn.execute('DELETE FROM sessions WHERE id = ? AND data = ?', (session_id, row[0])).rowcount
+        return _loads(row[0]) if deleted else None
+
+
+def make_store(url=None):
+    """Build a store from a URL such as 'memory://', 'sqlite:///path/to/smartedu.db' or 'sharded://4'"""
+    url = url or os.environ.get('SMARTEDU_STORE', 'memory://')
+    if url.startswith('memory://'):
+        return StudentRegistry()
+    if url.startswith('sqlite:///'):
+        return SQLiteStore(url[len('sqlite:///'):])
+    if url.startswith('sharded://'):
+        # Students split across this many worker processes (see utils.sharding)
+        from utils.sharding import ShardedStore
+
+        return ShardedStore(int(url[len('sharded://'):] or 4))
+    raise ValueError(f"Unsupported store URL: {url}")
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if hasattr(value, 'to_dicts'):
+        # CompactAnswers
+        return value.to_dicts()
+    if hasattr(value, 'item'):
+        # numpy scalars
+        return value.item()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _decode_object(obj):
+    if '__datetime__' in obj and len(obj) == 1:
+        return datetime.fromisoformat(obj['__datetime__'])
+    return obj
+
+
+def _dumps(value):
+    return json.dumps(value, default=_encode_value)
+
+
+def _loads(text):
+    return json.loads(text, object_hook=_decode_object)
@@ -0,0 +1,242 @@
+import threading
+from collections.abc import Sequence
+from itertools import islice
+from types import MappingProxyType
+
+
+def new_user_record():
+    """Default per-student record, matching what the Student Portal creates"""
+    return {
+        'quiz_history': [],
+        'performance_metrics': {},
+        'learning_style': 'unknown',
+        'current_level': 'beginner'
+    }
+
+
+class QuizHistory(Sequence):
+    """Immutable quiz history that shares its storage with longer versions of itself.
+
+    A history is the first `length` items of a list. Appending extends that
+    list in place and returns a longer view of it, so recording a quiz copies
+    only the new quizzes while every earlier view keeps seeing exactly what it
+    saw before. Only the newest view of a list can append without copying,
+    which the registry guarantees by appending under the shard lock.
+    """
+
+    __slots__ = ('_items', '_length')
+
+    def __init__(self, quizzes=()):
+        self._items = list(quizzes)
+        self._length = len(self._items)
+
+    def appended(self, quizzes):
+        """A new history with quizzes added at the end"""
+        items = self._items
+        if len(items) != self._length:
+            # A longer view already owns the tail
+            items = items[:self._length]
+        items.extend(quizzes)
+        history = QuizHistory.__new__(QuizHistory)
+        history._items = items
+        history._length = len(items)
+        return history
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._length)
+            if step < 0:
+                return tuple(self)[index]
+            return tuple(self._items[start:stop:step])
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("quiz history index out of range")
+        return self._items[index]
+
+    def __iter__(self):
+        return islice(self._items, self._length)
+
+    def __eq__(self, other):
+        if isinstance(other, (QuizHistory, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"QuizHistory({self._length} quizzes)"
+
+    def __reduce__(self):
+        # Pickled as a plain tuple, without the tail other views may share
+        return tuple, (tuple(self),)
+
+
+def _freeze_record(record, version):
+    frozen = dict(record)
+    history = record['quiz_history']
+    frozen['quiz_history'] = history if isinstance(history, QuizHistory) else QuizHistory(history)
+    frozen['performance_metrics'] = MappingProxyType(dict(record['performance_metrics']))
+    frozen['version'] = version
+    return MappingProxyType(frozen)
+
+
+class _Shard:
+    __slots__ = ('lock', 'students')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Written only under the lock, one student at a time; records themselves are immutable
+        self.students = {}
+
+
+class RegistrySnapshot:
+    """Immutable view of every student record at (at least) a given version"""
+
+    def __init__(self, version, students):
+        self.version = version
+        self.students = MappingProxyType(students)
+
+    def __len__(self):
+        return len(self.students)
+
+    def __contains__(self, student):
+        return student in self.students
+
+    def __getitem__(self, student):
+        return self.students[student]
+
+    def __bool__(self):
+        return bool(self.students)
+
+    def keys(self):
+        return self.students.keys()
+
+    def items(self):
+        return self.students.items()
+
+
+class StudentRegistry:
+    """Process-wide, thread-safe registry of student records shared by every session.
+
+    Writes take the lock of the shard that owns the student and publish a new
+    immutable record for that student, so submissions for different students
+    only contend for the moment it takes to stamp a version and store the
+    record. Appending quizzes costs the same however long the history is (see
+    QuizHistory). Neither reading a student nor taking a snapshot locks.
+
+    Also implements the store interface used by QuizEngine (see utils.store).
+    """
+
+    def __init__(self, num_shards=16):
+        self._shards = tuple(_Shard() for _ in range(num_shards))
+        self._version = 0
+        self._version_lock = threading.Lock()
+        self._last_snapshot = None
+        self._sessions = {}
+        self._sessions_lock = threading.Lock()
+
+    @property
+    def version(self):
+        """Monotonically increasing; bumped after every write is visible"""
+        return self._version
+
+    def _shard_for(self, student):
+        return self._shards[hash(student) % len(self._shards)]
+
+    def _publish(self, shard, student, record):
+        """Store (or with record None, remove) a student; the caller holds shard.lock"""
+        # Versions are handed out and made visible in one step, so once the version
+        # reads N every write up to N is in its shard: a snapshot taken at N never
+        # misses one, though it may include newer ones
+        with self._version_lock:
+            version = self._version + 1
+            if record is None:
+                del shard.students[student]
+            else:
+                shard.students[student] = _freeze_record(record, version)
+            self._version = version
+
+    # Store interface
+
+    def ensure_user(self, student):
+        shard = self._shard_for(student)
+        if student in shard.students:
+            return
+        with shard.lock:
+            if student not in shard.students:
+                self._publish(shard, student, new_user_record())
+
+    def list_students(self):
+        return list(self.snapshot().keys())
+
+    def get_user_data(self, student):
+        return self._shard_for(student).students.get(student)
+
+    def get_quiz_history(self, student):
+        record = self.get_user_data(student)
+        return record['quiz_history'] if record else ()
+
+    def append_quiz(self, student, quiz_result):
+        self.append_quizzes(student, [quiz_result])
+
+    def append_quizzes(self, student, quiz_results):
+        """Append several quiz results for one student under a single lock acquisition"""
+        shard = self._shard_for(student)
+        with shard.lock:
+            record = shard.students.get(student)
+            updated = dict(record) if record is not None else new_user_record()
+            history = updated['quiz_history']
+            if not isinstance(history, QuizHistory):
+                history = QuizHistory(history)
+            updated['quiz_history'] = history.appended(quiz_results)
+            self._publish(shard, student, updated)
+
+    def pop_user(self, student):
+        """Remove a student, e.g. when they move to another shard; returns their record or None"""
+        shard = self._shard_for(student)
+        with shard.lock:
+            record = shard.students.get(student)
+            if record is not None:
+                self._publish(shard, student, None)
+            return record
+
+    def save_session(self, session_id, session):
+        with self._sessions_lock:
+            self._sessions[session_id] = session
+
+    def load_session(self, session_id):
+        with self._sessions_lock:
+            return self._sessions.get(session_id)
+
+    def delete_session(self, session_id):
+        with self._sessions_lock:
+            self._sessions.pop(session_id, None)
+
+    def pop_session(self, session_id):
+        """Remove and return a session; of several concurrent callers only one gets it"""
+        with self._sessions_lock:
+            return self._sessions.pop(session_id, None)
+
+    # Snapshots
+
+    def snapshot(self):
+        """Lock-free snapshot of all students, reused until the next write"""
+        version = self._version
+        last = self._last_snapshot
+        if last is not None and last.version == version:
+            return last
+
+        students = {}
+        for shard in self._shards:
+            # No shard lock: copying a dict of str keys never runs Python code, so it
+            # is one step no writer can interleave with (under the GIL, and under the
+            # dict's own lock on free-threaded builds). Every write up to `version`
+            # is already in its shard, and records are immutable once stored
+            students.update(shard.students)
+        snapshot = RegistrySnapshot(version, students)
+        self._last_snapshot = snapshot
+        return snapshot
@@ -0,0 +1,197 @@
+"""Lightweight span timing for hot paths.
+
+    from utils.tracing import tracer, traced
+
+    @traced('render.teacher_dashboard')
+    def teacher_dashboard(): ...
+
+    with tracer.span('analytics.class_charts'):
+        ...
+
+    quiz_content = tracer.instrument(QuizContent(), 'quiz_content')
+
+Durations are aggregated into fixed-bucket histograms per span name, which
+can be exported in the Prometheus text format. Tracing is off unless
+SMARTEDU_TRACING=1 (or tracer.enabled is set); when off a traced call costs
+one attribute check and span() returns a shared no-op context manager.
+"""
+import bisect
+import functools
+import inspect
+import os
+import threading
+import time
+
+# Upper bounds in seconds, as in Prometheus' default histogram buckets
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Counts of observations per bucket, plus their count, sum and max"""
+
+    __slots__ = ('bounds', 'counts', 'count', 'sum', 'max')
+
+    def __init__(self, bounds=DEFAULT_BUCKETS):
+        self.bounds = bounds
+        # One extra bucket for values above the last bound (+Inf)
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Estimate a quantile by interpolating within its bucket"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.bounds[index - 1] if index else 0.0
+                upper = self.bounds[index] if index < len(self.bounds) else self.max
+                # Never report more than was actually observed
+                return min(self.max, lower + (upper - lower) * (rank - seen) / bucket_count)
+            seen += bucket_count
+        return self.max
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'start')
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.tracer.record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Tracer:
+    def __init__(self, enabled=False, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = buckets
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def span(self, name):
+        """Context manager timing the enclosed block under `name`"""
+        return _Span(self, name) if self.enabled else _NOOP_SPAN
+
+    def record(self, name, seconds):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def wrap(self, fn, name):
+        """fn, timed under `name` whenever tracing is enabled"""
+        if inspect.isgeneratorfunction(fn):
+            # Time the whole iteration, not just creating the generator
+            @functools.wraps(fn)
+            def traced_generator(*args, **kwargs):
+                if not self.enabled:
+                    return (yield from fn(*args, **kwargs))
+                start = time.perf_counter()
+                try:
+                    return (yield from fn(*args, **kwargs))
+                finally:
+                    self.record(name, time.perf_counter() - start)
+            return traced_generator
+
+        @functools.wraps(fn)
+        def traced_call(*args, **kwargs):
+            if not self.enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.record(name, time.perf_counter() - start)
+        return traced_call
+
+    def instrument(self, obj, prefix):
+        """Trace every public method of an instance as '<prefix>.<method>'; returns obj"""
+        for attr in dir(type(obj)):
+            # Looked up on the class so properties (often lazy loaders) are not evaluated
+            if not attr.startswith('_') and inspect.isfunction(getattr(type(obj), attr)):
+                setattr(obj, attr, self.wrap(getattr(obj, attr), f"{prefix}.{attr}"))
+        return obj
+
+    def summary(self):
+        """Per-span count, total and latency percentiles in milliseconds, slowest total first"""
+        with self._lock:
+            rows = [{
+                'span': name,
+                'count': h.count,
+                'total_s': round(h.sum, 3),
+                'mean_ms': round(h.sum / h.count * 1000, 2),
+                'p50_ms': round(h.quantile(0.5) * 1000, 2),
+                'p95_ms': round(h.quantile(0.95) * 1000, 2),
+                'p99_ms': round(h.quantile(0.99) * 1000, 2),
+                'max_ms': round(h.max * 1000, 2)
+            } for name, h in self._histograms.items()]
+        return sorted(rows, key=lambda row: row['total_s'], reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def export_prometheus(self, metric='smartedu_span_duration_seconds'):
+        """All histograms in the Prometheus text exposition format"""
+        lines = [
+            f"# HELP {metric} Time spent in traced spans.",
+            f"# TYPE {metric} histogram"
+        ]
+        with self._lock:
+            for name, h in sorted(self._histograms.items()):
+                label = name.replace('\\', '\\\\').replace('"', '\\"')
+                cumulative = 0
+                for bound, bucket_count in zip(h.bounds, h.counts):
+                    cumulative += bucket_count
+                    lines.append(f'{metric}_bucket{{span="{label}",le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{span="{label}",le="+Inf"}} {h.count}')
+                lines.append(f'{metric}_sum{{span="{label}"}} {h.sum}')
+                lines.append(f'{metric}_count{{span="{label}"}} {h.count}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Write the export to a file, e.g. for node_exporter's textfile collector"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.export_prometheus())
+        os.replace(tmp_path, path)
+
+
+# Process-wide tracer shared by the app, the components and the service
+tracer = Tracer(enabled=os.environ.get('SMARTEDU_TRACING', '') not in ('', '0', 'false'))
+
+
+def traced(name):
+    """Decorator form of tracer.wrap for the shared tracer"""
+    def decorator(fn):
+        return tracer.wrap(fn, name)
+    return decorator